@@ -0,0 +1,232 @@
+"""Admission control: per-caller rate limits and per-route concurrency caps.
+
+Every request is charged against a token bucket for its client IP, and
+requests with a valid bearer token also against one for the user, so
+opening more accounts from one address does not buy more quota. Paths
+listed in ``settings.admission_route_rates`` also have a stricter bucket of
+their own per caller (the user, else the IP). Buckets use GCRA (the generic cell rate algorithm), so each
+one is a single timestamp: the theoretical arrival time of the next
+request. A caller over its rate gets 429 with ``Retry-After``.
+
+Paths in ``settings.admission_concurrency`` are capped at that many
+requests in flight per process; further requests queue for up to
+``settings.admission_queue_timeout_seconds`` and then get 503 with
+``Retry-After``, so a slow upstream sheds load instead of piling up work
+on the threadpool and the DB pool.
+
+Bucket state is per process ("memory") or shared between workers in
+Redis ("redis"; one Lua script per check), with "local" running the shared
+store code against the in-process LocalRedis stand-in.
+
+Behind a load balancer or reverse proxy, list its addresses in
+``settings.admission_trusted_proxies``. Otherwise every request appears to
+come from the proxy, and all anonymous clients share a single IP bucket
+(and a single ``/login`` bucket) for the whole site.
+"""
+import asyncio
+import ipaddress
+import json
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+import metrics
+import oauth2
+from cache import LOCAL_SCRIPTS, LocalRedis, TTLCache
+from config import settings
+
+
+def gcra(tat: Optional[float], now: float, interval: float, burst: int) -> Tuple[Optional[float], float]:
+    """One GCRA check: ``(new tat, 0)`` when admitted, ``(None, retry after)`` when not.
+
+    ``interval`` is the time per request (1 / rate); up to ``burst``
+    requests are admitted back to back from an idle bucket.
+    """
+    new_tat = max(tat or now, now) + interval
+    allow_at = new_tat - burst * interval
+    if now < allow_at:
+        return None, allow_at - now
+    return new_tat, 0.0
+
+
+class MemoryRateStore:
+    """Per-process buckets; idle ones expire, and the least recently used go first when full."""
+
+    def __init__(self, maxsize: int):
+        self._tats = TTLCache(maxsize=maxsize, ttl=0)
+
+    async def acquire(self, key: str, interval: float, burst: int) -> float:
+        now = time.monotonic()
+        tat, retry_after = gcra(self._tats.get(key), now, interval, burst)
+        if tat is not None:
+            self._tats.set(key, tat, ttl=tat - now)
+        return retry_after
+
+
+# GCRA on the shared store, in milliseconds of Redis server time so every
+# worker agrees on the clock. Returns the retry delay, "0" when admitted.
+GCRA_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + tonumber(time[2]) / 1000
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - burst * interval
+if now < allow_at then return tostring(allow_at - now) end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now))
+return '0'
+"""
+
+
+async def _gcra_local(redis: LocalRedis, keys: List[str], args: List) -> str:
+    now = time.time() * 1000
+    stored = await redis.get(keys[0])
+    tat, retry_after = gcra(float(stored) if stored is not None else None, now, float(args[0]), int(args[1]))
+    if tat is None:
+        return str(retry_after)
+    await redis.set(keys[0], str(tat), px=math.ceil(tat - now))
+    return "0"
+
+
+LOCAL_SCRIPTS[GCRA_SCRIPT] = _gcra_local
+
+
+class RedisRateStore:
+    def __init__(self, client, prefix: str = "rate:"):
+        self.prefix = prefix
+        self._script = client.register_script(GCRA_SCRIPT)
+
+    async def acquire(self, key: str, interval: float, burst: int) -> float:
+        retry_after_ms = await self._script(keys=[self.prefix + key], args=[interval * 1000, burst])
+        return float(retry_after_ms) / 1000
+
+
+def create_rate_store(kind: str):
+    """Build a bucket store by name: "memory", "redis" or "local" (LocalRedis)."""
+    if kind == "memory":
+        return MemoryRateStore(settings.admission_store_size)
+    if kind == "local":
+        return RedisRateStore(LocalRedis())
+    if kind == "redis":
+        import redis.asyncio as redis
+        return RedisRateStore(redis.from_url(settings.redis_url))
+    raise ValueError(f"Unknown rate store: {kind}")
+
+
+def _user(headers) -> Optional[str]:
+    """``user:<id>`` for a valid bearer token, else None."""
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            # Verified tokens are cached, so this is a dict lookup when warm
+            return f"user:{oauth2.verify_access_token(token, HTTPException(401)).id}"
+        except HTTPException:
+            pass
+    return None
+
+
+def _parse_networks(values: List[str]) -> list:
+    return [ipaddress.ip_network(value, strict=False) for value in values]
+
+
+def _trusted(address: str, networks: list) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def _client_ip(scope, headers, trusted_proxies: list) -> str:
+    """``ip:<address>`` of the client.
+
+    X-Forwarded-For is only read when the peer is a trusted proxy; the client
+    is then the nearest address in it that is not a trusted proxy itself, as
+    anything further left was supplied by the client.
+    """
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    forwarded = headers.get(b"x-forwarded-for")
+    if forwarded and _trusted(address, trusted_proxies):
+        hops = [hop.strip() for hop in forwarded.decode("latin-1").split(",") if hop.strip()]
+        for hop in reversed(hops):
+            address = hop
+            if not _trusted(hop, trusted_proxies):
+                break
+    return f"ip:{address}"
+
+
+def _retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware; rejected requests never reach routing or a DB session."""
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or create_rate_store(settings.admission_store)
+        self.exempt = set(settings.admission_exempt_paths)
+        self.user_limit = (1 / settings.admission_user_rate, settings.admission_user_burst)
+        self.ip_limit = (1 / settings.admission_ip_rate, settings.admission_ip_burst)
+        self.trusted_proxies = _parse_networks(settings.admission_trusted_proxies)
+        self.route_limits = {path: (1 / rate, burst) for path, (rate, burst) in settings.admission_route_rates.items()}
+        self.concurrency = dict(settings.admission_concurrency)
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path in self.exempt:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        ip = _client_ip(scope, headers, self.trusted_proxies)
+        user = _user(headers)
+        caller = user or ip
+        checks = [(ip, self.ip_limit, "other")]
+        if user is not None:
+            checks.append((user, self.user_limit, "other"))
+        if path in self.route_limits:
+            checks.append((f"{caller}:{path}", self.route_limits[path], path))
+        for key, (interval, burst), label in checks:
+            retry_after = await self.store.acquire(key, interval, burst)
+            if retry_after:
+                metrics.REQUESTS_REJECTED.inc(label, "rate")
+                await self._reject(send, 429, "Too many requests", retry_after)
+                return
+
+        limit = self.concurrency.get(path)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        slots = self._slots.get(path)
+        if slots is None:
+            slots = self._slots[path] = asyncio.Semaphore(limit)
+        if slots.locked():
+            try:
+                await asyncio.wait_for(slots.acquire(), settings.admission_queue_timeout_seconds)
+            except asyncio.TimeoutError:
+                metrics.REQUESTS_REJECTED.inc(path, "queue_timeout")
+                await self._reject(send, 503, "Server busy", settings.admission_queue_timeout_seconds)
+                return
+        else:
+            await slots.acquire()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            slots.release()
+
+    async def _reject(self, send, status_code: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode()
+        await send({"type": "http.response.start", "status": status_code, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", _retry_after(retry_after).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
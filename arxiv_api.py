@@ -0,0 +1,168 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from fastapi import Request
+
+import metrics
+from cache import TTLCache
+from config import settings
+
+if TYPE_CHECKING:
+    import httpx
+
+ARXIV_API = settings.arxiv_base_url
+
+# Upstream responses worth retrying with backoff
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Space calls to ``wait`` at least ``interval`` seconds apart.
+
+    arXiv asks API clients to make no more than one request every three
+    seconds; the client awaits this before every attempt, retries included.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._next_at = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            delay = self._next_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_at = time.monotonic() + self.interval
+
+    def hold(self, seconds: float):
+        """Admit nothing for ``seconds``, e.g. while upstream asks clients to back off."""
+        self._next_at = max(self._next_at, time.monotonic() + seconds)
+
+
+def retry_after_seconds(response: "httpx.Response") -> Optional[float]:
+    """The response's Retry-After as seconds from now (delta-seconds or an HTTP date)."""
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ArxivClient:
+    """Long-lived, pooled HTTP client for the arXiv export API.
+
+    One instance is created at application startup and shared by every
+    request, so searches reuse warm keep-alive connections. Pass a
+    ``transport`` (e.g. ``httpx.MockTransport``) to run without the network.
+    """
+
+    def __init__(self, transport: "httpx.AsyncBaseTransport" = None):
+        # Imported here so a cold start does not pay for httpx until first use
+        import httpx
+
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.arxiv_timeout_seconds,
+                connect=settings.arxiv_connect_timeout_seconds,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.arxiv_max_connections,
+                max_keepalive_connections=settings.arxiv_max_keepalive_connections,
+                keepalive_expiry=settings.arxiv_keepalive_expiry_seconds,
+            ),
+            transport=transport,
+        )
+        self.max_retries = settings.arxiv_max_retries
+        self.backoff_seconds = settings.arxiv_backoff_seconds
+        self.limiter = RateLimiter(settings.arxiv_min_interval_seconds)
+
+    async def _send(self, url: str, stream: bool, follow_redirects: bool = False, paced: bool = True,
+                    **kwargs) -> "httpx.Response":
+        """Send a GET with exponential backoff on transport errors and retryable statuses.
+
+        ``paced`` requests (the API) go through the shared limiter before
+        every attempt. A Retry-After on a 429 or 503 sets the next delay,
+        and with ``paced`` holds back every other request too; one longer
+        than ``arxiv_max_retry_after_seconds`` is returned instead of waited out.
+        """
+        import httpx
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            if paced:
+                await self.limiter.wait()
+            started = time.perf_counter()
+            delay = self.backoff_seconds * 2 ** attempt
+            try:
+                request = self.http.build_request("GET", url, **kwargs)
+                response = await self.http.send(request, stream=stream, follow_redirects=follow_redirects)
+            except httpx.TransportError:
+                metrics.observe_arxiv("error", time.perf_counter() - started)
+                if last_attempt:
+                    raise
+            else:
+                metrics.observe_arxiv(str(response.status_code), time.perf_counter() - started)
+                if last_attempt or response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                if response.status_code in (429, 503):
+                    retry_after = retry_after_seconds(response)
+                    if retry_after is not None:
+                        if retry_after > settings.arxiv_max_retry_after_seconds:
+                            return response
+                        delay = max(delay, retry_after)
+                await response.aclose()
+            if paced:
+                self.limiter.hold(delay)
+            else:
+                await asyncio.sleep(delay)
+
+    async def get(self, url: str = ARXIV_API, **kwargs) -> "httpx.Response":
+        return await self._send(url, stream=False, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, url: str = ARXIV_API, **kwargs) -> AsyncIterator["httpx.Response"]:
+        """Like get, but the body is left unread for incremental parsing."""
+        response = await self._send(url, stream=True, **kwargs)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+def get_arxiv_client(request: Request) -> ArxivClient:
+    """Dependency returning the shared client, created on first use under fast start."""
+    client = request.app.state.arxiv_client
+    if client is None:
+        client = request.app.state.arxiv_client = ArxivClient()
+    return client
+
+
+def create_query_cache() -> TTLCache:
+    return TTLCache(
+        maxsize=settings.arxiv_cache_size,
+        ttl=settings.arxiv_cache_ttl_seconds,
+        stale_ttl=settings.arxiv_cache_stale_seconds,
+    )
+
+
+def get_query_cache(request: Request) -> TTLCache:
+    """Dependency returning the shared arXiv query result cache."""
+    return request.app.state.arxiv_cache
+
+
+def query_cache_key(query: str, start: int, max_results: int):
+    """Normalize case and whitespace so equivalent queries share an entry."""
+    return (" ".join(query.lower().split()), start, max_results)
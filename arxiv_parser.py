@@ -0,0 +1,188 @@
+import re
+import xml.etree.ElementTree as ET
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Namespaced tags resolved once instead of per lookup
+ATOM = "{http://www.w3.org/2005/Atom}"
+ARXIV = "{http://arxiv.org/schemas/atom}"
+OPENSEARCH = "{http://a9.com/-/spec/opensearch/1.1/}"
+
+_ENTRY = ATOM + "entry"
+_ID = ATOM + "id"
+_TITLE = ATOM + "title"
+_SUMMARY = ATOM + "summary"
+_PUBLISHED = ATOM + "published"
+_UPDATED = ATOM + "updated"
+_AUTHOR = ATOM + "author"
+_NAME = ATOM + "name"
+_LINK = ATOM + "link"
+_CATEGORY = ATOM + "category"
+_DOI = ARXIV + "doi"
+_JOURNAL_REF = ARXIV + "journal_ref"
+_PRIMARY_CATEGORY = ARXIV + "primary_category"
+_TOTAL_RESULTS = OPENSEARCH + "totalResults"
+
+_ARXIV_ID = re.compile(r"/abs/(.+?)(?:v\d+)?$")
+_VERSION = re.compile(r"v\d+$")
+_WHITESPACE = re.compile(r"\s+")
+
+# DataCite DOIs minted by arXiv wrap the arXiv id: 10.48550/arXiv.2203.12345
+ARXIV_DOI_PREFIX = "10.48550/arxiv."
+_DOI_URL = re.compile(r"^(?:https?://)?(?:dx\.)?doi\.org/", re.IGNORECASE)
+_ARXIV_URL = re.compile(r"^(?:https?://)?(?:www\.|export\.)?arxiv\.org/(?:abs|pdf)/", re.IGNORECASE)
+# New-style (2203.12345) and old-style (hep-th/9901001, math.GT/0309136) ids
+_ARXIV_ID_FORMAT = re.compile(r"^(?:\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(?:v\d+)?$")
+
+
+def arxiv_id_from_url(url: str) -> str:
+    """Return the versionless arXiv id, e.g. '2203.12345', from an abs URL."""
+    match = _ARXIV_ID.search(url)
+    return match.group(1) if match else url
+
+
+def strip_version(arxiv_id: str) -> str:
+    """'2203.12345v2' -> '2203.12345'."""
+    return _VERSION.sub("", arxiv_id)
+
+
+def is_arxiv_id(value: str) -> bool:
+    """True for a bare arXiv id, new or old style, with or without a version."""
+    return bool(_ARXIV_ID_FORMAT.match(value))
+
+
+def normalize_identifier(identifier: str) -> Tuple[Optional[str], Optional[str]]:
+    """Classify a user-supplied identifier as ``(arxiv_id, doi)``.
+
+    arXiv DOIs (``10.48550/arXiv.<id>``), abs/pdf URLs and ``arXiv:`` prefixes
+    resolve to the versionless arXiv id; other DOIs are returned lower-cased
+    as ``(None, doi)``; anything unrecognised gives ``(None, None)``.
+    """
+    value = _DOI_URL.sub("", identifier.strip())
+    if value.lower().startswith("doi:"):
+        value = value[4:].strip()
+    if value.lower().startswith(ARXIV_DOI_PREFIX):
+        value = value[len(ARXIV_DOI_PREFIX):]
+    elif value.startswith("10."):
+        return None, value.lower()
+
+    value = _ARXIV_URL.sub("", value)
+    if value.lower().startswith("arxiv:"):
+        value = value[6:]
+    if value.endswith(".pdf"):
+        value = value[:-4]
+    if _ARXIV_ID_FORMAT.match(value):
+        return strip_version(value), None
+    return None, None
+
+
+def _entry_to_dict(entry: ET.Element) -> dict:
+    """Resolve every field of an entry in a single pass over its children."""
+    result = {
+        "id": "",
+        "arxiv_id": "",
+        "title": "",
+        "summary": "",
+        "authors": [],
+        "link": "",
+        "pdf_url": "",
+        "published": None,
+        "updated": None,
+        "doi": None,
+        "journal_ref": None,
+        "primary_category": None,
+        "categories": [],
+    }
+    authors = result["authors"]
+    categories = result["categories"]
+
+    for child in entry:
+        tag = child.tag
+        if tag == _AUTHOR:
+            for name in child:
+                if name.tag == _NAME and name.text:
+                    authors.append(name.text)
+        elif tag == _LINK:
+            rel = child.get("rel")
+            if rel == "alternate":
+                result["link"] = child.get("href", "")
+            elif rel == "related" and child.get("title") == "pdf":
+                result["pdf_url"] = child.get("href", "")
+        elif tag == _CATEGORY:
+            categories.append(child.get("term"))
+        elif tag == _ID:
+            result["id"] = child.text or ""
+            result["arxiv_id"] = arxiv_id_from_url(result["id"])
+        elif tag == _TITLE:
+            result["title"] = _WHITESPACE.sub(" ", (child.text or "").strip())
+        elif tag == _SUMMARY:
+            result["summary"] = (child.text or "").strip()
+        elif tag == _PUBLISHED:
+            result["published"] = child.text
+        elif tag == _UPDATED:
+            result["updated"] = child.text
+        elif tag == _DOI:
+            result["doi"] = child.text
+        elif tag == _JOURNAL_REF:
+            result["journal_ref"] = child.text
+        elif tag == _PRIMARY_CATEGORY:
+            result["primary_category"] = child.get("term")
+
+    return result
+
+
+class AtomFeedParser:
+    """Incremental parser for arXiv Atom responses.
+
+    Feed raw bytes as they arrive; each call returns the entries completed
+    so far. Finished entries are cleared as soon as they are converted, so
+    memory stays flat regardless of page size.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("end",))
+        self.total_results: Optional[int] = None
+
+    def feed(self, data: Union[bytes, str]) -> List[dict]:
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> List[dict]:
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> List[dict]:
+        entries = []
+        for _, elem in self._parser.read_events():
+            tag = elem.tag
+            if tag == _ENTRY:
+                entry = _entry_to_dict(elem)
+                # arXiv reports bad queries/ids as an entry under /api/errors
+                if "/abs/" in entry["id"]:
+                    entries.append(entry)
+                elem.clear()
+            elif tag == _TOTAL_RESULTS and elem.text:
+                self.total_results = int(elem.text)
+        return entries
+
+
+def iter_entries(chunks: Iterable[bytes], parser: AtomFeedParser = None) -> Iterator[dict]:
+    """Yield entry dicts from an iterable of response body chunks."""
+    parser = parser or AtomFeedParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+async def aiter_entries(chunks: AsyncIterable[bytes], parser: AtomFeedParser = None) -> AsyncIterator[dict]:
+    """Async variant of iter_entries for streamed httpx responses."""
+    parser = parser or AtomFeedParser()
+    async for chunk in chunks:
+        for entry in parser.feed(chunk):
+            yield entry
+    for entry in parser.close():
+        yield entry
+
+
+def parse_entries(content: Union[bytes, str]) -> List[dict]:
+    """Parse a complete response body."""
+    return list(iter_entries([content]))
@@ -0,0 +1,108 @@
+"""Micro-benchmark: arXiv Atom parsing.
+
+Compares the streaming parser in ``arxiv_parser`` with the previous
+ElementTree implementation of ``parse_arxiv_response`` and with feedparser
+(skipped when not installed), on the recorded payload in
+``tests/fixtures/arxiv_query.xml`` expanded to a full page of entries.
+
+    python benchmarks/bench_arxiv_parser.py --entries 2000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from arxiv_parser import iter_entries  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       "tests", "fixtures", "arxiv_query.xml")
+CHUNK_SIZE = 64 * 1024
+
+
+def build_payload(entries: int) -> bytes:
+    """Repeat the recorded entries until the page holds ``entries`` of them."""
+    with open(FIXTURE, "rb") as f:
+        recorded = f.read()
+    head, rest = recorded.split(b"<entry>", 1)
+    body, tail = (b"<entry>" + rest).rsplit(b"</feed>", 1)
+    recorded_entries = [b"<entry>" + e for e in body.split(b"<entry>")[1:]]
+    page = [recorded_entries[i % len(recorded_entries)] for i in range(entries)]
+    return head + b"".join(page) + b"</feed>" + tail
+
+
+def legacy_et_parse(xml_content):
+    """The ElementTree implementation previously in router/papers.py."""
+    root = ET.fromstring(xml_content)
+    results = []
+    for entry in root.findall('.//{http://www.w3.org/2005/Atom}entry'):
+        id_elem = entry.find('.//{http://www.w3.org/2005/Atom}id').text if entry.find('.//{http://www.w3.org/2005/Atom}id') is not None else ""
+        title = entry.find('.//{http://www.w3.org/2005/Atom}title').text.strip() if entry.find('.//{http://www.w3.org/2005/Atom}title') is not None else ""
+        summary = entry.find('.//{http://www.w3.org/2005/Atom}summary').text.strip() if entry.find('.//{http://www.w3.org/2005/Atom}summary') is not None else ""
+        authors = []
+        for author in entry.findall('.//{http://www.w3.org/2005/Atom}author/{http://www.w3.org/2005/Atom}name'):
+            authors.append(author.text)
+        link = ""
+        pdf_url = ""
+        for link_elem in entry.findall('.//{http://www.w3.org/2005/Atom}link'):
+            rel = link_elem.get('rel')
+            if rel == 'alternate':
+                link = link_elem.get('href', "")
+            elif rel == 'related' and link_elem.get('title') == 'pdf':
+                pdf_url = link_elem.get('href', "")
+        results.append({'id': id_elem, 'title': title, 'summary': summary,
+                        'authors': authors, 'link': link, 'pdf_url': pdf_url})
+    return results
+
+
+def streaming_parse(payload):
+    chunks = (payload[i:i + CHUNK_SIZE] for i in range(0, len(payload), CHUNK_SIZE))
+    return list(iter_entries(chunks))
+
+
+def feedparser_parse(payload):
+    import feedparser
+    return feedparser.parse(payload).entries
+
+
+def measure(name, fn, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(fn(payload))
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    print(f"{name:<12} entries={count:<6} best={best * 1000:8.1f} ms "
+          f"per-entry={best / count * 1e6:7.1f} us peak-mem={peak / 1024 / 1024:6.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = build_payload(args.entries)
+    print(f"payload: {len(payload) / 1024:.0f} KiB")
+
+    measure("streaming", streaming_parse, payload, args.repeat)
+    measure("legacy-et", legacy_et_parse, payload, args.repeat)
+    try:
+        import feedparser  # noqa: F401
+    except ImportError:
+        print("feedparser   not installed, skipped")
+    else:
+        measure("feedparser", feedparser_parse, payload, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
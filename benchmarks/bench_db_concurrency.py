@@ -0,0 +1,64 @@
+"""Benchmark: request throughput of the DB routes, sync vs async session path.
+
+Drives ``GET /posts/{id}`` and ``POST /posts/`` at high concurrency with
+``database_async`` off (sync engine, each call on the threadpool) and on
+(async engine + AsyncSession), and prints requests per second for each.
+
+    python benchmarks/bench_db_concurrency.py --concurrency 200 --requests 5000 \\
+        --database-url postgresql://user:pw@localhost/bench
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+from harness import Timer, configure_database, percentile
+
+
+async def run(app, concurrency, total):
+    import httpx
+
+    latencies = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.post("/posts/", json={"title": "seed", "content": "seed"})
+            queue = asyncio.Queue()
+            for i in range(total):
+                queue.put_nowait(i)
+
+            async def worker():
+                while not queue.empty():
+                    i = queue.get_nowait()
+                    with Timer() as t:
+                        if i % 5 == 0:
+                            response = await client.post("/posts/", json={"title": f"t{i}", "content": "body"})
+                        else:
+                            response = await client.get("/posts/1")
+                    response.raise_for_status()
+                    latencies.append(t.elapsed)
+
+            with Timer() as wall:
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / wall.elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--database-url", help="sync URL; defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    for label, use_async in (("sync", False), ("async", True)):
+        configure_database(url, use_async)
+        from main import app
+        rps, latencies = asyncio.run(run(app, args.concurrency, args.requests))
+        print(f"{label:<6} concurrency={args.concurrency} rps={rps:8.1f} "
+              f"p50={percentile(latencies, 50) * 1000:7.1f} ms p99={percentile(latencies, 99) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
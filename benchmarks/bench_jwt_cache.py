@@ -0,0 +1,36 @@
+"""Micro-benchmark: per-request bearer-token verification cost.
+
+Compares ``oauth2.decode_access_token`` (signature check and claim parsing
+on every call) with ``oauth2.verify_access_token`` served from the
+verified-token cache, for a pool of tokens reused across requests.
+
+    python benchmarks/bench_jwt_cache.py --requests 100000 --tokens 100
+"""
+import argparse
+import time
+
+import harness  # noqa: F401  (sets up import path and settings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--tokens", type=int, default=100)
+    args = parser.parse_args()
+
+    import oauth2
+
+    tokens = [oauth2.create_access_token({"user_id": i}) for i in range(args.tokens)]
+    error = Exception("invalid token")
+
+    for label, verify in (("uncached", oauth2.decode_access_token),
+                          ("cached", oauth2.verify_access_token)):
+        start = time.perf_counter()
+        for i in range(args.requests):
+            verify(tokens[i % len(tokens)], error)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<9} requests={args.requests} per-request={elapsed / args.requests * 1e6:7.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Load benchmark: a realistic request mix against local stand-ins.
+
+Runs the app in-process against a local database (a temporary SQLite file,
+or ``--database-url`` for e.g. an ephemeral Postgres container) and a mock
+arXiv server replaying the recorded Atom payloads. Concurrent clients
+then drive a weighted mix of login, ``/user/me``, posts CRUD and paper
+search. The report covers throughput, p50/p95/p99 latency per operation
+and DB queries per request; the query counts come from a sequential pass
+after the load, so they reflect the warm steady state.
+
+    python benchmarks/bench_load.py --requests 5000 --concurrency 50 --output report.json
+    python benchmarks/bench_load.py --baseline report.json --tolerance 0.15
+
+With ``--baseline`` the run is compared against a previous report, and the
+exit status is 1 if throughput drops, latency rises by more than
+``--tolerance``, or any operation issues more queries per request.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+from collections import defaultdict
+
+from harness import Timer, configure_database, percentile
+from mock_arxiv import MockArxivServer
+
+DEFAULT_MIX = ("login=2,me=30,post_list=10,post_read=20,post_create=8,post_update=5,"
+               "post_delete=3,search_arxiv=10,search_local=12")
+
+SEARCH_TERMS = ("transformer", "attention", "vision", "image recognition", "language model",
+                "neural network", "scale", "benchmark", "embedding", "retrieval")
+
+
+class Workload:
+    """State shared by the simulated clients: users, tokens and post ids."""
+
+    def __init__(self, client, users: int, seed_posts: int, rng: random.Random):
+        self.client = client
+        self.rng = rng
+        self.users = [(f"load{i}@example.com", "load-password") for i in range(users)]
+        self.tokens = []
+        self.seed_posts = seed_posts
+        self.created = 0
+        self.next_delete = seed_posts + 1
+
+    async def setup(self):
+        for email, password in self.users:
+            await self.client.post("/user/", json={"email": email, "password": password})
+            response = await self.client.post("/login", data={"username": email, "password": password})
+            response.raise_for_status()
+            self.tokens.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+        for i in range(self.seed_posts):
+            (await self.client.post("/posts/", json={"title": f"seed {i}", "content": "seed"})).raise_for_status()
+
+    def post_id(self) -> int:
+        return self.rng.randint(1, self.seed_posts)
+
+    # Each operation returns (response, expected status codes)
+
+    async def login(self):
+        email, password = self.rng.choice(self.users)
+        return await self.client.post("/login", data={"username": email, "password": password}), {200}
+
+    async def me(self):
+        return await self.client.get("/user/me", headers=self.rng.choice(self.tokens)), {200}
+
+    async def post_list(self):
+        return await self.client.get("/posts/", params={"limit": 20}), {200}
+
+    async def post_read(self):
+        return await self.client.get(f"/posts/{self.post_id()}"), {200}
+
+    async def post_create(self):
+        self.created += 1
+        return await self.client.post("/posts/", json={"title": "load", "content": "x" * 200}), {201}
+
+    async def post_update(self):
+        return await self.client.put(f"/posts/{self.post_id()}", json={"title": "updated", "content": "y"}), {200}
+
+    async def post_delete(self):
+        # Only posts created during the run; ids may not be committed yet
+        if self.next_delete > self.seed_posts + self.created:
+            return await self.post_create()
+        post_id, self.next_delete = self.next_delete, self.next_delete + 1
+        return await self.client.delete(f"/posts/{post_id}"), {204, 400}
+
+    async def search_arxiv(self):
+        query = self.rng.choice(SEARCH_TERMS)
+        return await self.client.post("/papers/fetch_arxiv_query/", json={"query": query}), {200}
+
+    async def search_local(self):
+        return await self.client.get("/papers/search", params={"q": self.rng.choice(SEARCH_TERMS)}), {200}
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, weight = part.split("=")
+        if not hasattr(Workload, name.strip()):
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def count_statements(database):
+    """Start counting statements on the active engine; returns the running list."""
+    from sqlalchemy import event
+
+    engine = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    seen = []
+    event.listen(engine, "before_cursor_execute", lambda *args: seen.append(1))
+    return seen
+
+
+async def run(app, args, mix):
+    import httpx
+
+    import database
+
+    rng = random.Random(args.seed)
+    names, weights = list(mix), list(mix.values())
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    queries = {}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            workload = Workload(client, args.users, args.seed_posts, rng)
+            await workload.setup()
+
+            remaining = [args.requests]
+
+            async def worker():
+                while remaining[0] > 0:
+                    remaining[0] -= 1
+                    name = rng.choices(names, weights)[0]
+                    with Timer() as t:
+                        response, expected = await getattr(workload, name)()
+                    latencies[name].append(t.elapsed)
+                    if response.status_code not in expected:
+                        errors[name] += 1
+
+            with Timer() as wall:
+                await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+            statements = count_statements(database)
+            for name in names:
+                statements.clear()
+                for _ in range(args.query_samples):
+                    await getattr(workload, name)()
+                queries[name] = len(statements) / args.query_samples
+
+    everything = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "overall": summarize(everything, sum(errors.values()), wall.elapsed),
+        "operations": {
+            name: dict(summarize(latencies[name], errors[name], wall.elapsed), queries_per_request=queries[name])
+            for name in names
+        },
+    }
+
+
+def summarize(samples, errors, elapsed) -> dict:
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": len(samples) / elapsed,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+def print_report(report):
+    print(f"{'operation':<14}{'requests':>9}{'errors':>8}{'rps':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+    rows = list(report["operations"].items()) + [("overall", report["overall"])]
+    for name, row in rows:
+        queries = f"{row['queries_per_request']:9.2f}" if "queries_per_request" in row else f"{'':>9}"
+        print(f"{name:<14}{row['requests']:>9}{row['errors']:>8}{row['throughput_rps']:>10.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{queries}")
+
+
+def compare(report, baseline, tolerance: float) -> list:
+    """Regressions against ``baseline``, as printable lines."""
+    regressions = []
+    pairs = [("overall", report["overall"], baseline["overall"])]
+    pairs += [(name, row, baseline["operations"][name])
+              for name, row in report["operations"].items() if name in baseline["operations"]]
+
+    for name, current, previous in pairs:
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} rps")
+        for key in ("p95_ms", "p99_ms"):
+            if current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {previous[key]:.1f} -> {current[key]:.1f}")
+        if current.get("queries_per_request", 0) > previous.get("queries_per_request", 0) + 1e-9:
+            regressions.append(f"{name}: queries/request {previous['queries_per_request']:.2f} "
+                               f"-> {current['queries_per_request']:.2f}")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="comma-separated operation=weight pairs")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed-posts", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the request mix")
+    parser.add_argument("--query-samples", type=int, default=5)
+    parser.add_argument("--mode", choices=("async", "sync"), default="async")
+    parser.add_argument("--bcrypt-rounds", type=int, help="override password_bcrypt_rounds")
+    parser.add_argument("--arxiv-latency-ms", type=float, default=50.0, help="mock upstream latency")
+    parser.add_argument("--database-url", help="sync URL; defaults to a temporary SQLite file")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    arxiv = MockArxivServer.from_fixtures(latency=args.arxiv_latency_ms / 1000)
+    # Settings are read at first import, so the overrides go in before the app loads
+    os.environ["ARXIV_BASE_URL"] = arxiv.start()
+    os.environ["ARXIV_MIN_INTERVAL_SECONDS"] = "0"
+    if args.bcrypt_rounds:
+        os.environ["PASSWORD_BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+
+    url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    configure_database(url, args.mode == "async")
+    from main import app
+
+    try:
+        results = asyncio.run(run(app, args, mix))
+    finally:
+        arxiv.stop()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": url.split(":", 1)[0],
+            "arxiv_requests": arxiv.requests,
+        },
+        **results,
+    }
+    report["config"]["mix"] = mix
+    report["config"]["database_url"] = report["environment"]["database"]
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Load test: health-check latency while a burst of logins is in flight.
+
+Runs concurrent ``POST /login`` traffic next to a steady stream of
+``GET /`` requests, once with bcrypt on the threadpool
+(``password_hash_workers=0``) and once on the dedicated process pool, and
+prints the health-check latency percentiles for each.
+
+    python benchmarks/bench_login_health.py --logins 400 --login-concurrency 100
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+from harness import Timer, configure_database, percentile
+
+
+async def run(app, logins, login_concurrency, health_interval):
+    import httpx
+
+    health = []
+    statuses = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await client.post("/user/", json={"email": "bench@example.com", "password": "bench"})
+            remaining = [logins]
+            done = asyncio.Event()
+
+            async def login_worker():
+                while remaining[0] > 0:
+                    remaining[0] -= 1
+                    response = await client.post("/login", data={"username": "bench@example.com",
+                                                                  "password": "bench"})
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            async def health_probe():
+                while not done.is_set():
+                    with Timer() as t:
+                        (await client.get("/")).raise_for_status()
+                    health.append(t.elapsed)
+                    await asyncio.sleep(health_interval)
+
+            probe = asyncio.ensure_future(health_probe())
+            with Timer() as wall:
+                await asyncio.gather(*(login_worker() for _ in range(login_concurrency)))
+            done.set()
+            await probe
+    return wall.elapsed, health, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--login-concurrency", type=int, default=100)
+    parser.add_argument("--health-interval", type=float, default=0.01)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--database-url", help="sync URL; defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    for label, workers in (("threadpool", 0), ("processes", args.workers)):
+        configure_database(url, use_async=True)
+        import utils
+        from main import app
+        utils.settings.password_hash_workers = workers
+        utils.settings.password_hash_max_pending = args.logins
+
+        elapsed, health, statuses = asyncio.run(run(app, args.logins, args.login_concurrency,
+                                                    args.health_interval))
+        print(f"{label:<10} logins={args.logins} in {elapsed:6.2f}s statuses={statuses} "
+              f"health n={len(health)} p50={percentile(health, 50) * 1000:7.1f} ms "
+              f"p99={percentile(health, 99) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
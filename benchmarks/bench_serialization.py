@@ -0,0 +1,74 @@
+"""Micro-benchmark: response serialization cost per page of search results.
+
+Times turning parsed arXiv entries into a response body for
+``POST /papers/fetch_arxiv_query/``:
+
+- validated: the previous path, SearchResult built field by field, then
+  response_model validation, jsonable_encoder and the stdlib encoder
+- validated+orjson: the same, with ORJSONResponse as the app-wide class
+- trusted: ``responses.trusted_json`` on the projected dicts, stdlib encoder
+- trusted+orjson: ``trusted_json`` with fast_json_responses enabled
+
+    python benchmarks/bench_serialization.py --results 100 --repeat 2000
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+import harness  # noqa: F401  (sets up import path and settings)
+from bench_arxiv_parser import build_payload
+
+
+async def run(args):
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    import paper_store
+    import responses
+    from arxiv_parser import parse_entries
+    from config import settings
+    from schemas import SearchResult
+
+    entries = parse_entries(build_payload(args.results))
+    field = create_response_field(name="Response_fetch_arxiv_query", type_=List[SearchResult])
+
+    def validated(response_class):
+        async def render():
+            results = [SearchResult(**entry) for entry in entries]
+            content = await serialize_response(field=field, response_content=results)
+            return response_class(content).body
+        return render
+
+    def trusted(fast):
+        async def render():
+            settings.fast_json_responses = fast
+            return responses.trusted_json([paper_store.entry_to_result(entry) for entry in entries]).body
+        return render
+
+    variants = (
+        ("validated", validated(JSONResponse)),
+        ("validated+orjson", validated(ORJSONResponse)),
+        ("trusted", trusted(False)),
+        ("trusted+orjson", trusted(True)),
+    )
+    for label, render in variants:
+        await render()  # warm up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            body = await render()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<17} results={args.results} per-response={elapsed / args.repeat * 1e6:9.1f} us "
+              f"bytes={len(body)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
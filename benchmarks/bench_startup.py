@@ -0,0 +1,88 @@
+"""Startup benchmark: import time, time to first response and RSS.
+
+Each sample is a fresh interpreter, as on a Lambda cold start. The child
+imports ``main``, runs the lifespan startup, and serves one request that
+reads from the database (``GET /posts/?limit=1``). The request goes
+straight through the ASGI interface, so no HTTP client is imported.
+``--fast-start`` modes are compared against the default startup.
+
+    python benchmarks/bench_startup.py --samples 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from harness import ROOT, configure_database
+
+CHILD = r"""
+import asyncio, json, resource, sys, time
+
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def first_response():
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": "/posts/", "raw_path": b"/posts/", "root_path": "",
+             "query_string": b"limit=1", "headers": [], "client": ("127.0.0.1", 1),
+             "server": ("bench", 80)}
+    async with main.app.router.lifespan_context(main.app):
+        await main.app(scope, receive, send)
+    return messages[0]["status"]
+
+status = asyncio.run(first_response())
+responded = time.perf_counter()
+
+print(json.dumps({
+    "status": status,
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": (responded - started) * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def sample(database_url: str, fast_start: bool) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url, FAST_START=str(fast_start).lower(),
+               PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, "-c", CHILD], env=env, cwd=ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    # The schema exists before any sample, as after "python manage.py create-schema"
+    configure_database(database_url, use_async=False)
+
+    for fast_start in (False, True):
+        runs = [sample(database_url, fast_start) for _ in range(args.samples)]
+        assert all(run["status"] == 200 for run in runs), runs
+        label = "fast-start" if fast_start else "default"
+        print(f"{label:<11} samples={args.samples} "
+              f"import={statistics.median(r['import_ms'] for r in runs):7.1f} ms "
+              f"first-response={statistics.median(r['first_response_ms'] for r in runs):7.1f} ms "
+              f"rss={statistics.median(r['rss_mb'] for r in runs):6.1f} MB "
+              f"modules={runs[0]['modules']}")
+
+
+if __name__ == "__main__":
+    main()
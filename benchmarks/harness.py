@@ -0,0 +1,56 @@
+"""Shared setup for the benchmark scripts.
+
+Runs the application in-process against a local database, driven through
+``httpx.ASGITransport`` so no server or network is involved.
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Settings has required fields; benchmarks never talk to a real deployment
+for _key, _value in {
+    "DATABASE_HOSTNAME": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_NAME": "bench",
+    "DATABASE_USERNAME": "bench",
+    "DATABASE_PASSWORD": "bench",
+    "SECRET_KEY": "bench-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    # A few clients at full speed from one address are exactly what admission
+    # control throttles; benchmarks measure the app, not the limiter
+    "ADMISSION_ENABLED": "false",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def configure_database(url: str, use_async: bool):
+    """Point the database module at ``url`` and create a fresh schema."""
+    import database
+    import models
+
+    database.settings.database_async = use_async
+    database.configure(url)
+
+    models.Base.metadata.drop_all(bind=database.engine)
+    models.Base.metadata.create_all(bind=database.engine)
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
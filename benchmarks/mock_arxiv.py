@@ -0,0 +1,80 @@
+"""Local stand-in for the arXiv export API.
+
+A minimal HTTP/1.1 server (keep-alive, no dependencies) that answers every
+GET with one of the recorded Atom payloads in ``tests/fixtures``. It runs on
+its own thread and event loop so its work does not count against the app
+under test.
+
+    server = MockArxivServer.from_fixtures(latency=0.05)
+    base_url = server.start()   # http://127.0.0.1:<port>/api/query
+    ...
+    server.stop()
+"""
+import asyncio
+import glob
+import os
+import threading
+from typing import List, Optional
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures")
+
+
+class MockArxivServer:
+    def __init__(self, payloads: List[bytes], latency: float = 0.0):
+        self.payloads = payloads
+        self.latency = latency
+        self.requests = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_fixtures(cls, latency: float = 0.0) -> "MockArxivServer":
+        payloads = []
+        for path in sorted(glob.glob(os.path.join(FIXTURES, "*.xml"))):
+            with open(path, "rb") as f:
+                payloads.append(f.read())
+        return cls(payloads, latency)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while await reader.readline():
+                # Headers up to the blank line; GET requests carry no body
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                payload = self.payloads[self.requests % len(self.payloads)]
+                self.requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                writer.write(b"HTTP/1.1 200 OK\r\n"
+                             b"Content-Type: application/atom+xml; charset=utf-8\r\n"
+                             b"Content-Length: %d\r\n\r\n" % len(payload) + payload)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def start(self, host: str = "127.0.0.1") -> str:
+        """Serve on an ephemeral port and return the API URL to point the app at."""
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, host, 0))
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name="mock-arxiv", daemon=True)
+        self._thread.start()
+        started.wait()
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}/api/query"
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
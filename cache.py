@@ -0,0 +1,226 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "stale_until")
+
+    def __init__(self, value, expires_at: float, stale_until: float):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class TTLCache:
+    """Bounded in-process LRU cache with per-entry TTL.
+
+    ``get_or_load`` coalesces concurrent misses for the same key into one
+    loader call (single-flight). When ``stale_ttl`` is set, an expired entry
+    is still served for that long while a background refresh runs.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0, stale_ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh entry or ``default``; expired entries are dropped."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if time.monotonic() >= entry.expires_at:
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        now = time.monotonic()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._data[key] = _Entry(value, expires_at, expires_at + self.stale_ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._data.get(key)
+        if entry is not None:
+            now = time.monotonic()
+            if now < entry.expires_at:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            if now < entry.stale_until:
+                # Serve the stale value and refresh it in the background
+                self._data.move_to_end(key)
+                self.stale_hits += 1
+                self._load(key, loader)
+                return entry.value
+            del self._data[key]
+
+        self.misses += 1
+        # Shield so a cancelled caller does not abort the shared load
+        return await asyncio.shield(self._load(key, loader))
+
+    def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        async def fill():
+            value = await loader()
+            self.set(key, value)
+            return value
+
+        task = asyncio.ensure_future(fill())
+        self._inflight[key] = task
+
+        def done(t: asyncio.Task):
+            self._inflight.pop(key, None)
+            # Mark the exception as retrieved for background refreshes
+            if not t.cancelled():
+                t.exception()
+
+        task.add_done_callback(done)
+        return task
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+        }
+
+
+class MemoryBackend:
+    """Per-process cache backend with the same async API as the shared one."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Any:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._cache.set(key, value, ttl)
+
+    async def delete(self, key: str):
+        self._cache.delete(key)
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+
+class RedisBackend:
+    """Cache backend shared between workers, over a ``redis.asyncio`` client.
+
+    Values are stored as JSON, so they must be JSON-serializable.
+    """
+
+    def __init__(self, client, prefix: str = "", ttl: float = 60.0):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Any:
+        raw = await self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        await self.client.set(self.prefix + key, json.dumps(value), px=max(1, int(ttl * 1000)))
+
+    async def delete(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+
+# Python equivalents of the Lua scripts run on the shared store, keyed by
+# script source; LocalRedis runs these in place of the Lua
+LOCAL_SCRIPTS: Dict[str, Callable[..., Awaitable[Any]]] = {}
+
+
+class LocalRedis:
+    """In-process stand-in for the subset of ``redis.asyncio.Redis`` used here.
+
+    Lets tests and single-process runs exercise the shared-store code path
+    without a Redis server.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+
+    def _live(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key: str):
+        return self._live(key)
+
+    async def set(self, key: str, value, ex: Optional[float] = None, px: Optional[int] = None):
+        if px is not None:
+            ex = px / 1000
+        if isinstance(value, str):
+            value = value.encode()
+        self._data[key] = (value, None if ex is None else time.monotonic() + ex)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def register_script(self, script: str):
+        """Like Redis.register_script, running the script's entry in LOCAL_SCRIPTS."""
+        twin = LOCAL_SCRIPTS[script]
+
+        async def run(keys=(), args=()):
+            return await twin(self, list(keys), list(args))
+        return run
+
+
+def create_backend(kind: str, prefix: str, maxsize: int, ttl: float, redis_url: Optional[str] = None):
+    """Build a cache backend by name: "memory", "redis" or "local" (LocalRedis)."""
+    if kind == "memory":
+        return MemoryBackend(maxsize=maxsize, ttl=ttl)
+    if kind == "local":
+        return RedisBackend(LocalRedis(), prefix=prefix, ttl=ttl)
+    if kind == "redis":
+        # Optional dependency, only needed when a shared store is configured
+        import redis.asyncio as redis
+        return RedisBackend(redis.from_url(redis_url), prefix=prefix, ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {kind}")
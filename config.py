@@ -1,3 +1,5 @@
+from typing import Dict, List, Optional, Tuple
+
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
@@ -9,6 +11,177 @@ class Settings(BaseSettings):
     secret_key: str
     algorithm: str
     access_token_expire_minutes: int
+
+    # Overrides the URL built from the database_* fields above
+    database_url: Optional[str] = None
+
+    # Use the async engine and AsyncSession; off falls back to the sync
+    # engine with each session call run on the threadpool
+    database_async: bool = True
+
+    # Connection pool; "null" opens a connection per checkout, for Lambda
+    # behind RDS Proxy where the proxy does the pooling
+    database_pool_mode: str = "queue"
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout_seconds: float = 30.0
+    database_pool_recycle_seconds: int = 1800
+    database_pool_pre_ping: bool = True
+    database_statement_timeout_ms: int = 0
+    stream_batch_size: int = 500
+
+    # Password hashing; workers=0 hashes on the threadpool instead of a
+    # process pool, pending caps queued hashes before failing fast with 503
+    password_bcrypt_rounds: int = 12
+    password_hash_workers: int = 2  # forced to 0 on Lambda, see lambda_handler
+    password_hash_max_pending: int = 64
+
+    # Verified-JWT cache entries (evicted at each token's exp)
+    token_cache_size: int = 10000
+
+    # Shared cache store (redis://...), used by caches configured as "redis"
+    redis_url: Optional[str] = None
+
+    # Authenticated-user cache: "memory" (per worker), "redis" or "local"
+    # (in-process stand-in for the shared store). Writes invalidate the entry
+    # in the store they go through, so with "memory" and several workers a
+    # profile change or deactivation reaches the other workers only after
+    # user_cache_ttl_seconds; use "redis" where that matters
+    user_cache_backend: str = "memory"
+    user_cache_size: int = 10000
+    user_cache_ttl_seconds: float = 60.0
+
+    # arXiv HTTP client
+    arxiv_base_url: str = "http://export.arxiv.org/api/query"
+    arxiv_timeout_seconds: float = 10.0
+    arxiv_connect_timeout_seconds: float = 5.0
+    arxiv_max_connections: int = 20
+    arxiv_max_keepalive_connections: int = 10
+    arxiv_keepalive_expiry_seconds: float = 30.0
+    arxiv_max_retries: int = 3
+    arxiv_backoff_seconds: float = 0.5
+    # Spacing of API requests (retries included), and the longest Retry-After
+    # waited out; a longer one is passed on to the caller as the error
+    arxiv_min_interval_seconds: float = 3.0
+    arxiv_max_retry_after_seconds: float = 60.0
+    arxiv_harvest_max_total: int = 50000
+    # Batch lookups: ids per id_list request, and per batch
+    arxiv_id_list_chunk_size: int = 100
+    arxiv_batch_max_ids: int = 500
+
+    # PDF proxy: downloads from arxiv_pdf_base_url are kept in pdf_cache_dir
+    # (defaults to a directory under the system temp dir), least recently
+    # used first out once they total more than pdf_cache_max_bytes. The bound
+    # is kept per process: workers sharing the directory may together hold up
+    # to workers x pdf_cache_max_bytes
+    arxiv_pdf_base_url: str = "https://arxiv.org/pdf"
+    pdf_cache_dir: Optional[str] = None
+    pdf_cache_max_bytes: int = 2 * 1024 ** 3
+    pdf_chunk_size: int = 64 * 1024
+
+    # arXiv query result cache
+    arxiv_cache_size: int = 512
+    arxiv_cache_ttl_seconds: float = 300.0
+    arxiv_cache_stale_seconds: float = 3600.0
+    local_search_min_results: int = 3
+
+    # LLM outputs: llm_workers background workers per process (0 = none; run
+    # "python manage.py run-workers" instead), each claiming up to
+    # llm_batch_size queued jobs at a time. llm_backend is "http" (posts
+    # batches to llm_backend_url), "package.module:factory", or "local", a
+    # deterministic stand-in for tests and demos whose text is stored as the
+    # real output. Unset, no workers run and POST /jobs/ answers 503
+    llm_backend: Optional[str] = None
+    llm_backend_url: Optional[str] = None
+    llm_backend_timeout_seconds: float = 120.0
+    llm_workers: int = 2
+    llm_batch_size: int = 16
+    llm_max_attempts: int = 3
+    llm_job_timeout_seconds: float = 600.0
+    # Idle workers and job event streams re-check the database this often
+    llm_poll_interval_seconds: float = 2.0
+
+    # Cold-start mode (Lambda): no schema DDL at startup (run "python manage.py
+    # create-schema" when deploying), arXiv client, PDF cache and hashing pool
+    # created on first use
+    fast_start: bool = False
+
+    # Lambda init phase: open a DB connection and the arXiv client up front
+    lambda_warmup: bool = True
+
+    # Request/DB/arXiv metrics on /metrics and a Server-Timing header on every response
+    metrics_enabled: bool = True
+
+    # Sampling profiler: requests sent with an X-Profile-Token header matching
+    # profiler_token, or still running after profiler_slow_ms (0 = off); the
+    # last profiler_ring_size profiles are served under /admin/profiles
+    profiler_token: Optional[str] = None
+    profiler_slow_ms: float = 0
+    profiler_interval_ms: float = 5.0
+    profiler_ring_size: int = 20
+
+    # Admission control (admission.py): per-second rate and burst for each
+    # user (by bearer token) or anonymous IP, stricter per-caller rates for
+    # the paths in admission_route_rates, and per-process caps on requests in
+    # flight for the paths in admission_concurrency, queueing for up to
+    # admission_queue_timeout_seconds before a 503. Bucket state is "memory",
+    # "redis" or "local" (in-process stand-in for the shared store)
+    admission_enabled: bool = True
+    admission_store: str = "memory"
+    admission_store_size: int = 100000
+    # Every request counts against its IP; authenticated ones also against the user
+    admission_user_rate: float = 20.0
+    admission_user_burst: int = 60
+    admission_ip_rate: float = 30.0
+    admission_ip_burst: int = 90
+    admission_route_rates: Dict[str, Tuple[float, int]] = {
+        "/login": (0.2, 10),
+        "/papers/fetch_arxiv_query/": (1.0, 10),
+        "/papers/batch": (0.2, 5),
+        "/jobs/": (0.5, 10),
+        "/reading-list/import": (0.1, 3),
+    }
+    admission_concurrency: Dict[str, int] = {
+        "/login": 16,
+        "/papers/fetch_arxiv_query/": 32,
+        "/papers/batch": 8,
+        "/papers/harvest/": 4,
+        "/reading-list/import": 4,
+    }
+    admission_queue_timeout_seconds: float = 1.0
+    # Addresses or CIDR ranges of the load balancers / reverse proxies in
+    # front of the app, whose X-Forwarded-For is believed. Set this behind an
+    # ALB or proxy: left empty there, every client has the proxy's IP and all
+    # anonymous traffic shares one bucket (one /login bucket for the site)
+    admission_trusted_proxies: List[str] = []
+    admission_exempt_paths: List[str] = ["/metrics", "/health/db"]
+
+    # Reading list import (reading_list.py): rows saved per batch, and per-row
+    # errors reported per import (the rest are only counted)
+    reading_list_import_batch_size: int = 1000
+    reading_list_import_max_errors: int = 1000
+
+    # HTTP caching (http_cache.py): Cache-Control for GET responses by route
+    # path, unless the route sets its own; strong ETags for complete bodies of
+    # up to etag_max_bytes, answering If-None-Match with 304; brotli (when
+    # installed) or gzip for compressible bodies of compression_min_bytes or more
+    cache_control: Dict[str, str] = {
+        "/posts/": "no-cache",
+        "/posts/{id}": "no-cache",
+        "/user/me": "private, no-cache",
+        "/papers/search": "public, max-age=60",
+        "/papers/{arxiv_id:path}": "public, max-age=3600",
+        "/papers/{arxiv_id:path}/pdf": "public, max-age=86400",
+        "/jobs/{job_id}": "no-cache",
+    }
+    etag_max_bytes: int = 1024 * 1024
+    compression_enabled: bool = True
+    compression_min_bytes: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    # Encode JSON responses with orjson (when installed) instead of the stdlib
+    fast_json_responses: bool = False
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,214 @@
+"""HTTP conditional caching and response compression.
+
+``HttpCacheMiddleware`` handles complete (single-message) responses to GET
+requests (HEAD gets the Cache-Control only):
+
+- adds a strong ETag hashed from the body, unless the route set one
+- answers a matching ``If-None-Match`` with 304 and no body
+- adds the ``Cache-Control`` configured for the route in
+  ``settings.cache_control``, unless the route set one
+- compresses compressible bodies of at least
+  ``settings.compression_min_bytes`` with brotli (when the optional
+  ``brotli`` package is installed) or gzip, per ``Accept-Encoding``
+
+Streamed responses (NDJSON listings, harvests) are compressed chunk by chunk
+with a sync flush, so clients still see each chunk as it is produced;
+server-sent events and already-compressed types pass through.
+
+Routes that can tell what a response would contain without building it
+(a row they have just read, the cached principal) call ``row_etag`` and
+``not_modified`` to answer 304 before serializing anything.
+"""
+import hashlib
+import zlib
+from typing import Optional
+
+from fastapi import Request, Response
+from starlette.datastructures import MutableHeaders
+
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/xml", "application/x-bibtex", "text/")
+# Must reach the client unbuffered
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+# Headers a 304 keeps (RFC 9110 15.4.5)
+NOT_MODIFIED_HEADERS = {"cache-control", "content-location", "date", "etag", "expires", "vary", "server-timing"}
+
+
+def body_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def row_etag(*values) -> str:
+    """Strong ETag from the values a response is built from, without serializing it."""
+    return body_etag(repr(values).encode())
+
+
+def _source_tag(tag: str) -> str:
+    """A tag without W/ and without the suffix of a compressed variant."""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for encoding in ("-gzip", "-br"):
+        if tag.endswith(encoding + '"'):
+            return tag[:-len(encoding) - 1] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison; tags of compressed variants match their source."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = _source_tag(etag)
+    return any(_source_tag(tag) == etag for tag in if_none_match.split(","))
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 for a matching If-None-Match, else None."""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported coding the client accepts: br, then gzip."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    for coding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def _compressible(headers: MutableHeaders) -> bool:
+    content_type = headers.get("content-type", "")
+    return "content-encoding" not in headers and content_type.startswith(COMPRESSIBLE_TYPES) \
+        and not content_type.startswith(UNCOMPRESSED_TYPES)
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.compression_brotli_quality)
+        else:
+            # wbits 31: gzip container
+            self._zlib = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def _add_vary(headers: MutableHeaders):
+    vary = headers.get("vary")
+    if vary is None:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class HttpCacheMiddleware:
+    """Pure ASGI middleware, so streamed responses are never buffered."""
+
+    def __init__(self, app):
+        self.app = app
+        self.policies = dict(settings.cache_control)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope["headers"])
+        # HEAD gets the policy but no tag: its empty body says nothing about the GET's
+        cacheable = scope["method"] in ("GET", "HEAD")
+        validated = scope["method"] == "GET"
+        if_none_match = request_headers.get(b"if-none-match", b"").decode("latin-1") if validated else ""
+        encoding = None
+        if settings.compression_enabled:
+            encoding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        held = None
+        compressor = None
+
+        def response_headers(start) -> MutableHeaders:
+            headers = MutableHeaders(raw=list(start.get("headers", [])))
+            policy = self.policies.get(getattr(scope.get("route"), "path", None))
+            if cacheable and policy and start["status"] in (200, 203, 206, 304) and "cache-control" not in headers:
+                headers["Cache-Control"] = policy
+            return headers
+
+        async def send_complete(start, body: bytes):
+            headers = response_headers(start)
+            status = start["status"]
+            compressible = settings.compression_enabled and _compressible(headers)
+            compress = compressible and encoding is not None and len(body) >= settings.compression_min_bytes
+            if compressible:
+                _add_vary(headers)
+            if validated and status == 200:
+                etag = headers.get("etag")
+                if etag is None and len(body) <= settings.etag_max_bytes:
+                    etag = body_etag(body)
+                if etag is not None:
+                    if compress and etag.endswith('"'):
+                        # A different representation needs its own strong tag
+                        etag = etag[:-1] + f'-{encoding}"'
+                    headers["ETag"] = etag
+                    if etag_matches(if_none_match, etag):
+                        kept = [(name, value) for name, value in headers.raw if name.decode() in NOT_MODIFIED_HEADERS]
+                        await send({"type": "http.response.start", "status": 304, "headers": kept})
+                        await send({"type": "http.response.body", "body": b""})
+                        return
+            if compress:
+                body = _Compressor(encoding).compress(body, final=True)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+            await send(dict(start, headers=headers.raw))
+            await send({"type": "http.response.body", "body": body})
+
+        async def send_wrapper(message):
+            nonlocal held, compressor
+            if message["type"] == "http.response.start":
+                # Held until the first body message shows whether the response is streamed
+                held = message
+                return
+            if held is not None and message["type"] == "http.response.body" and not message.get("more_body", False):
+                start, held = held, None
+                await send_complete(start, message.get("body", b""))
+                return
+            if held is not None:
+                start, held = held, None
+                headers = response_headers(start)
+                if settings.compression_enabled and _compressible(headers):
+                    _add_vary(headers)
+                    if encoding is not None and message["type"] == "http.response.body":
+                        compressor = _Compressor(encoding)
+                        headers["Content-Encoding"] = encoding
+                        del headers["content-length"]
+                        if "etag" in headers:
+                            del headers["etag"]
+                await send(dict(start, headers=headers.raw))
+            if compressor is not None and message["type"] == "http.response.body":
+                more_body = message.get("more_body", False)
+                message = dict(message, body=compressor.compress(message.get("body", b""), final=not more_body))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
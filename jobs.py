@@ -0,0 +1,364 @@
+"""Background generation of LLM outputs (summaries, critiques, key points).
+
+Generating an output takes seconds, so requests only enqueue an ``LLMJob``
+row; a pool of asyncio workers does the work and writes ``LLMOutput``:
+
+- a claim is one ``UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP
+  LOCKED)`` statement, so any number of workers and processes share the
+  queue without handing out a job twice (SQLite, which has no row locks,
+  gets the same guarantee from its single writer)
+- each claim takes up to ``llm_batch_size`` jobs; duplicates for the same
+  paper and output type share one generation, and the backend is called
+  once per output type with every paper in the batch
+- failures are retried up to ``llm_max_attempts``; a job left running by a
+  dead worker is claimable again after ``llm_job_timeout_seconds``, and
+  only its latest claim can then finish or fail it
+
+Workers and event streams in the same process are woken directly; jobs
+enqueued or finished by other processes are noticed on the next poll.
+"""
+import asyncio
+import importlib
+import logging
+import re
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, case, func, insert, or_, select, tuple_, update
+
+import models
+from config import settings
+from database import session_scope
+from paper_store import split_authors
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_TYPES = ("summary", "critique", "key_points")
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("done", "failed")
+
+JOB_COLUMNS = (
+    models.LLMJob.id, models.Paper.arxiv_id, models.LLMJob.output_type, models.LLMJob.status,
+    models.LLMJob.attempts, models.LLMJob.error, models.LLMJob.created_at, models.LLMJob.started_at,
+    models.LLMJob.finished_at, models.LLMOutput.content.label("output"),
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Backends: ``generate(output_type, papers)`` returns one text per paper, in
+# order; papers are dicts with arxiv_id, title, authors (a list) and abstract
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class LocalBackend:
+    """Deterministic stand-in that builds outputs from the abstract; no model involved."""
+
+    async def generate(self, output_type: str, papers: List[dict]) -> List[str]:
+        return [self._generate(output_type, paper) for paper in papers]
+
+    def _generate(self, output_type: str, paper: dict) -> str:
+        sentences = [s for s in _SENTENCE_END.split(" ".join((paper["abstract"] or "").split())) if s]
+        if output_type == "summary":
+            return " ".join(sentences[:2]) or paper["title"]
+        if output_type == "key_points":
+            return "\n".join(f"- {sentence}" for sentence in sentences[:5]) or f"- {paper['title']}"
+        authors = (paper["authors"][:1] or [""])[0] + (" et al." if len(paper["authors"]) > 1 else "")
+        return (f"{paper['title']} ({authors}) makes {len(sentences)} claims in its abstract. "
+                f"Strongest: {sentences[0] if sentences else 'none stated'} "
+                f"To check: whether the evaluation supports the final claim.")
+
+    async def aclose(self):
+        pass
+
+
+class HttpBackend:
+    """Posts each batch to a model server.
+
+    Request: ``{"output_type": ..., "papers": [...]}``; response:
+    ``{"outputs": [...]}`` with one text per paper.
+    """
+
+    def __init__(self, url: str, timeout: float):
+        import httpx
+
+        self.url = url
+        self.http = httpx.AsyncClient(timeout=timeout)
+
+    async def generate(self, output_type: str, papers: List[dict]) -> List[str]:
+        response = await self.http.post(self.url, json={"output_type": output_type, "papers": papers})
+        response.raise_for_status()
+        outputs = response.json()["outputs"]
+        if len(outputs) != len(papers):
+            raise ValueError(f"Backend returned {len(outputs)} outputs for {len(papers)} papers")
+        return outputs
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+def create_llm_backend(kind: Optional[str]):
+    """Build a backend by name: "local", "http", or "package.module:factory"."""
+    if kind is None:
+        raise ValueError("llm_backend is not set; configure a model backend to run LLM workers")
+    if kind == "local":
+        return LocalBackend()
+    if kind == "http":
+        if not settings.llm_backend_url:
+            raise ValueError("llm_backend_url is required for the http backend")
+        return HttpBackend(settings.llm_backend_url, settings.llm_backend_timeout_seconds)
+    if ":" in kind:
+        module, _, factory = kind.partition(":")
+        return getattr(importlib.import_module(module), factory)()
+    raise ValueError(f"Unknown LLM backend: {kind}")
+
+
+class JobSignals:
+    """In-process notice of job status changes, so event streams need not poll."""
+
+    def __init__(self):
+        self._events: Dict[int, asyncio.Event] = {}
+        self._waiting: Counter = Counter()
+
+    async def wait(self, job_id: int, timeout: float) -> bool:
+        """Wait for a change to ``job_id``; False on timeout."""
+        event = self._events.setdefault(job_id, asyncio.Event())
+        self._waiting[job_id] += 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiting[job_id] -= 1
+            if not self._waiting[job_id]:
+                del self._waiting[job_id]
+                if self._events.get(job_id) is event:
+                    del self._events[job_id]
+
+    def notify(self, job_ids: Iterable[int]):
+        for job_id in job_ids:
+            event = self._events.pop(job_id, None)
+            if event is not None:
+                event.set()
+
+
+signals = JobSignals()
+
+
+async def get_job(db, job_id: int) -> Optional[dict]:
+    row = (await db.execute(
+        select(*JOB_COLUMNS)
+        .join(models.Paper, models.Paper.id == models.LLMJob.paper_id)
+        .outerjoin(models.LLMOutput, models.LLMOutput.id == models.LLMJob.output_id)
+        .where(models.LLMJob.id == job_id)
+    )).first()
+    return dict(row._mapping) if row is not None else None
+
+
+async def enqueue(db, paper_id: int, output_type: str, user_id: Optional[int], regenerate: bool = False) -> int:
+    """Queue a job and return its id.
+
+    An active job for the same paper and output type is returned instead of
+    queueing another; without ``regenerate``, an existing output is returned
+    as an already finished job.
+    """
+    Job = models.LLMJob
+    active = (await db.execute(
+        select(Job.id).where(Job.paper_id == paper_id, Job.output_type == output_type,
+                             Job.status.in_(ACTIVE_STATUSES)).order_by(Job.id).limit(1)
+    )).scalar()
+    if active is not None:
+        return active
+
+    values = {"paper_id": paper_id, "output_type": output_type, "user_id": user_id}
+    if not regenerate:
+        output_id = (await db.execute(
+            select(func.max(models.LLMOutput.id))
+            .where(models.LLMOutput.paper_id == paper_id, models.LLMOutput.output_type == output_type)
+        )).scalar()
+        if output_id is not None:
+            values.update(status="done", output_id=output_id, finished_at=_now())
+
+    job_id = (await db.execute(insert(Job).values(**values).returning(Job.id))).scalar_one()
+    await db.commit()
+    return job_id
+
+
+def _owned(claims: Dict[int, int]):
+    """Jobs still running under the given ``{id: attempts}`` claims."""
+    Job = models.LLMJob
+    return and_(tuple_(Job.id, Job.attempts).in_(list(claims.items())), Job.status == "running")
+
+
+def _claimable(cutoff: datetime):
+    Job = models.LLMJob
+    return or_(Job.status == "queued", and_(Job.status == "running", Job.started_at < cutoff))
+
+
+async def claim(db, limit: int) -> List[dict]:
+    """Mark up to ``limit`` jobs running and return them, oldest first.
+
+    Each claim increments ``attempts``, so ``(id, attempts)`` identifies it:
+    a job reclaimed after ``llm_job_timeout_seconds`` no longer matches the
+    stale claim, and only the current one can finish it.
+    """
+    Job = models.LLMJob
+    cutoff = _now() - timedelta(seconds=settings.llm_job_timeout_seconds)
+    candidates = (select(Job.id).where(_claimable(cutoff)).order_by(Job.id).limit(limit)
+                  .with_for_update(skip_locked=True).scalar_subquery())
+    rows = (await db.execute(
+        update(Job)
+        .where(Job.id.in_(candidates), _claimable(cutoff))
+        .values(status="running", started_at=_now(), attempts=Job.attempts + 1)
+        .returning(Job.id, Job.paper_id, Job.output_type, Job.attempts)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    return sorted((dict(row._mapping) for row in rows), key=lambda job: job["id"])
+
+
+class WorkerPool:
+    """``workers`` asyncio tasks claiming and running batches of jobs."""
+
+    def __init__(self, backend, workers: int):
+        self.backend = backend
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+        self.batches = 0
+        self.completed = 0
+        self.errors = 0
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._run(i)) for i in range(self.workers)]
+
+    def wake(self):
+        """Claim now rather than at the next poll; called after an enqueue."""
+        self._wakeup.set()
+
+    async def join(self):
+        await asyncio.gather(*self._tasks)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.backend.aclose()
+
+    async def _run(self, worker: int):
+        while True:
+            # Cleared before claiming, so an enqueue during the claim is not missed
+            self._wakeup.clear()
+            try:
+                claimed = await self.run_once()
+            except Exception:
+                logger.exception("LLM worker %d failed to process a batch", worker)
+                claimed = 0
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.llm_poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_once(self) -> int:
+        """Claim and run one batch; returns the number of jobs claimed."""
+        async with session_scope() as db:
+            jobs = await claim(db, settings.llm_batch_size)
+            if not jobs:
+                return 0
+            signals.notify(job["id"] for job in jobs)
+
+            paper_ids = {job["paper_id"] for job in jobs}
+            rows = (await db.execute(
+                select(models.Paper.id, models.Paper.arxiv_id, models.Paper.title, models.Paper.authors,
+                       models.Paper.abstract).where(models.Paper.id.in_(paper_ids))
+            )).all()
+        papers = {row.id: dict(row._mapping, authors=split_authors(row.authors)) for row in rows}
+
+        claims = {job["id"]: job["attempts"] for job in jobs}
+        # (paper, output type) -> job ids; duplicates share one output
+        groups: Dict[tuple, List[int]] = defaultdict(list)
+        for job in jobs:
+            groups[(job["paper_id"], job["output_type"])].append(job["id"])
+        by_type: Dict[str, List[int]] = defaultdict(list)
+        for paper_id, output_type in groups:
+            by_type[output_type].append(paper_id)
+
+        await asyncio.gather(*(self._generate(output_type, [papers[paper_id] for paper_id in paper_ids],
+                                              groups, claims)
+                               for output_type, paper_ids in by_type.items()))
+        self.batches += 1
+        return len(jobs)
+
+    async def _generate(self, output_type: str, papers: List[dict], groups: Dict[tuple, List[int]],
+                        claims: Dict[int, int]):
+        job_ids = [job_id for paper in papers for job_id in groups[(paper["id"], output_type)]]
+        try:
+            outputs = await self.backend.generate(output_type, papers)
+        except Exception as e:
+            logger.exception("LLM backend failed on %d %s jobs", len(job_ids), output_type)
+            await self._fail({job_id: claims[job_id] for job_id in job_ids}, f"{type(e).__name__}: {e}")
+            return
+
+        Job = models.LLMJob
+        async with session_scope() as db:
+            # Finish the jobs this claim still owns first; the row locks keep a
+            # worker that reclaimed them from finishing them too
+            finished = set((await db.execute(
+                update(Job).where(_owned({job_id: claims[job_id] for job_id in job_ids}))
+                .values(status="done", error=None, finished_at=_now())
+                .returning(Job.id)
+                .execution_options(synchronize_session=False)
+            )).scalars().all())
+            owned = [(paper, content) for paper, content in zip(papers, outputs)
+                     if finished.intersection(groups[(paper["id"], output_type)])]
+            if owned:
+                created = (await db.execute(
+                    insert(models.LLMOutput)
+                    .values([{"paper_id": paper["id"], "output_type": output_type, "content": content}
+                             for paper, content in owned])
+                    .returning(models.LLMOutput.id, models.LLMOutput.paper_id)
+                )).all()
+                for output_id, paper_id in created:
+                    await db.execute(
+                        update(Job).where(Job.id.in_(finished.intersection(groups[(paper_id, output_type)])))
+                        .values(output_id=output_id)
+                        .execution_options(synchronize_session=False)
+                    )
+            await db.commit()
+        if len(finished) < len(job_ids):
+            logger.warning("%d %s jobs were reclaimed before they finished", len(job_ids) - len(finished), output_type)
+        self.completed += len(finished)
+        signals.notify(job_ids)
+
+    async def _fail(self, claims: Dict[int, int], error: str):
+        Job = models.LLMJob
+        exhausted = Job.attempts >= settings.llm_max_attempts
+        async with session_scope() as db:
+            # A job reclaimed or finished meanwhile is left alone
+            await db.execute(
+                update(Job).where(_owned(claims))
+                .values(status=case((exhausted, "failed"), else_="queued"), error=error,
+                        finished_at=case((exhausted, _now()), else_=None))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        self.errors += len(claims)
+        signals.notify(claims)
+        # Retries are claimable straight away; let an idle worker pick them up
+        self.wake()
+
+    def stats(self) -> Dict[str, int]:
+        return {"workers": len(self._tasks), "batches": self.batches,
+                "completed": self.completed, "errors": self.errors}
+
+
+def create_worker_pool() -> WorkerPool:
+    return WorkerPool(create_llm_backend(settings.llm_backend), settings.llm_workers)
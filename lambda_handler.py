@@ -0,0 +1,174 @@
+"""AWS Lambda entry point: ``lambda_handler.handler``.
+
+Translates API Gateway REST (payload v1), HTTP API (v2) and Function URL
+events to ASGI calls on an app built here with ``fast_start``, whatever
+``settings.fast_start`` says; ``main.app`` is never started. Everything
+per-process (the app, its lifespan startup, the DB engine and pool, the
+arXiv client, the caches and the event loop they are bound to) is set up
+once in the init phase, so warm invocations only translate the event and
+run the request.
+
+Password hashing runs inline: a process pool's workers would not survive
+the environment being frozen between invocations.
+
+Scheduled keep-warm pings (EventBridge rules, or ``{"warmer": true}``)
+return immediately without reaching the app.
+"""
+import asyncio
+import base64
+from typing import Dict, List, Tuple
+from urllib.parse import urlencode
+
+from sqlalchemy import text
+
+from config import settings
+from database import session_scope
+from main import create_app
+
+settings.password_hash_workers = 0
+app = create_app(fast_start=True)
+
+# Content types returned as text; anything else is base64-encoded
+TEXT_CONTENT_TYPES = ("text/", "application/json", "application/x-ndjson", "application/xml",
+                      "application/javascript", "application/problem+json")
+
+# One loop for the life of the execution environment: pooled connections
+# and the arXiv client stay bound to it between invocations
+_loop = asyncio.new_event_loop()
+
+
+async def _warm_up():
+    """Open a pooled DB connection and the arXiv client before the first request."""
+    from arxiv_api import ArxivClient
+
+    if app.state.arxiv_client is None:
+        app.state.arxiv_client = ArxivClient()
+    async with session_scope() as db:
+        await db.execute(text("SELECT 1"))
+
+
+def _start():
+    # Lambda freezes the environment rather than shutting it down, so the
+    # lifespan is entered here and never exited
+    _loop.run_until_complete(app.router.lifespan_context(app).__aenter__())
+    if settings.lambda_warmup:
+        _loop.run_until_complete(_warm_up())
+
+
+_start()
+
+
+def is_keep_warm(event: dict) -> bool:
+    return event.get("source") == "aws.events" or event.get("warmer") is True
+
+
+def _request_body(event: dict) -> bytes:
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        return base64.b64decode(body)
+    return body.encode()
+
+
+def event_to_scope(event: dict) -> dict:
+    """Build an ASGI HTTP scope from a v1 or v2 proxy event."""
+    headers: List[Tuple[bytes, bytes]] = []
+
+    if event.get("version") == "2.0":
+        http = event["requestContext"]["http"]
+        method, path, client_ip = http["method"], event["rawPath"], http.get("sourceIp")
+        query_string = event.get("rawQueryString", "").encode()
+        for name, value in (event.get("headers") or {}).items():
+            headers.append((name.lower().encode(), value.encode()))
+        if event.get("cookies"):
+            headers.append((b"cookie", "; ".join(event["cookies"]).encode()))
+    else:
+        method, path = event["httpMethod"], event["path"]
+        client_ip = event.get("requestContext", {}).get("identity", {}).get("sourceIp")
+        query = event.get("multiValueQueryStringParameters") or {
+            name: [value] for name, value in (event.get("queryStringParameters") or {}).items()
+        }
+        query_string = urlencode([(name, value) for name, values in query.items() for value in values]).encode()
+        multi_headers = event.get("multiValueHeaders") or {
+            name: [value] for name, value in (event.get("headers") or {}).items()
+        }
+        for name, values in multi_headers.items():
+            headers.extend((name.lower().encode(), value.encode()) for value in values)
+
+    host = next((value.decode() for name, value in headers if name == b"host"), "lambda")
+    scheme = next((value.decode() for name, value in headers if name == b"x-forwarded-proto"), "https")
+
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": scheme,
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string,
+        "headers": headers,
+        "client": (client_ip or "0.0.0.0", 0),
+        "server": (host, 443 if scheme == "https" else 80),
+    }
+
+
+async def run_asgi(scope: dict, body: bytes) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    """Run one request through the app, buffering the whole response."""
+    status = 500
+    response_headers: List[Tuple[bytes, bytes]] = []
+    chunks: List[bytes] = []
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Only reached by streaming responses watching for a disconnect
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.extend(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, response_headers, b"".join(chunks)
+
+
+def build_response(event: dict, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> dict:
+    """Shape the buffered ASGI response for the event's payload version."""
+    grouped: Dict[str, List[str]] = {}
+    for name, value in headers:
+        grouped.setdefault(name.decode().lower(), []).append(value.decode())
+
+    content_type = grouped.get("content-type", [""])[0]
+    # Compressed bodies are binary whatever their content type
+    is_text = (content_type.startswith(TEXT_CONTENT_TYPES) and "content-encoding" not in grouped) or not body
+    response = {
+        "statusCode": status,
+        "body": body.decode() if is_text else base64.b64encode(body).decode(),
+        "isBase64Encoded": not is_text,
+    }
+
+    if event.get("version") == "2.0":
+        cookies = grouped.pop("set-cookie", [])
+        response["headers"] = {name: ",".join(values) for name, values in grouped.items()}
+        if cookies:
+            response["cookies"] = cookies
+    else:
+        response["multiValueHeaders"] = grouped
+    return response
+
+
+def handler(event: dict, context=None) -> dict:
+    if is_keep_warm(event):
+        return {"warm": True}
+
+    scope = event_to_scope(event)
+    status, headers, body = _loop.run_until_complete(run_asgi(scope, _request_body(event)))
+    return build_response(event, status, headers, body)
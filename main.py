@@ -1,35 +1,111 @@
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from database import engine
+import admission
+from arxiv_api import ArxivClient, create_query_cache
+from config import settings
+import database
+import http_cache
+import jobs
+import metrics
+import oauth2
+import pdf_cache
+import profiling
+import responses
+import utils
 from models import Base
 
 from router.posts import router as posts_router
 from router.papers import router as papers_router
 from router.user import router as user_router
 from router.auth import router as auth_router
+from router.admin import router as admin_router
+from router.jobs import router as jobs_router
+from router.reading_list import router as reading_list_router
+
+def create_app(fast_start: Optional[bool] = None) -> FastAPI:
+    """Build the application.
+
+    With fast_start (defaults to settings.fast_start) startup does no DDL and
+    opens no connections: the schema is created by the deploy step, the
+    database is first touched by the first query, and the arXiv client, PDF
+    cache and hashing pool are created on first use.
+    """
+    if fast_start is None:
+        fast_start = settings.fast_start
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # One pooled arXiv client per process, reused across requests
+        app.state.arxiv_client = None if fast_start else ArxivClient()
+        app.state.arxiv_cache = create_query_cache()
+        app.state.user_cache = oauth2.create_user_cache()
+        app.state.pdf_cache = None if fast_start else pdf_cache.create_pdf_cache()
+        if not fast_start:
+            # Fast start leaves this to "python manage.py create-schema"
+            Base.metadata.create_all(bind=database.engine)
+            utils.start_password_pool()
+        # LLM workers run in the web process unless disabled or no backend is
+        # configured; never under fast start, where the process may be frozen
+        # between requests
+        app.state.llm_workers = None
+        if not fast_start and settings.llm_workers and settings.llm_backend:
+            app.state.llm_workers = jobs.create_worker_pool()
+            app.state.llm_workers.start()
+        yield
+        if app.state.llm_workers is not None:
+            await app.state.llm_workers.stop()
+        if app.state.pdf_cache is not None:
+            await app.state.pdf_cache.aclose()
+        if app.state.arxiv_client is not None:
+            await app.state.arxiv_client.aclose()
+        utils.shutdown_password_pool()
+
+    app = FastAPI(lifespan=lifespan, default_response_class=responses.default_response_class())
+
+    # Innermost of the middleware: rejections still get CORS headers and metrics
+    if settings.admission_enabled:
+        app.add_middleware(admission.AdmissionMiddleware)
+    app.add_middleware(http_cache.HttpCacheMiddleware)
 
-Base.metadata.create_all(bind=engine)
+    origins = ["*"]
 
-app = FastAPI()
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Server-Timing", "X-Next-Cursor", "X-Profile-Id", "Retry-After"],
+    )
+    app.add_middleware(profiling.ProfilingMiddleware)
+    if settings.metrics_enabled:
+        app.add_middleware(metrics.MetricsMiddleware)
 
-origins = ["*"]
+    app.include_router(posts_router)
+    app.include_router(papers_router)
+    app.include_router(user_router)
+    app.include_router(auth_router)
+    app.include_router(admin_router)
+    app.include_router(jobs_router)
+    app.include_router(reading_list_router)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    @app.get("/")
+    def root():
+        return {"message": "Welcome to the Research Paper Management API"}
 
-app.include_router(posts_router)
-app.include_router(papers_router)
-app.include_router(user_router)
-app.include_router(auth_router)
+    @app.get("/health/db")
+    def database_pool_status():
+        return database.pool_status()
 
-@app.get("/")
-def root():
-    return {"message": "Welcome to the Research Paper Management API"}
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
+    return app
 
+app = create_app()
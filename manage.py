@@ -0,0 +1,55 @@
+"""Deployment tasks that must not run at application startup.
+
+    python manage.py create-schema
+    python manage.py drop-schema
+    python manage.py run-workers --workers 4
+"""
+import argparse
+import asyncio
+
+import database
+from config import settings
+from models import Base
+
+
+def create_schema(args):
+    Base.metadata.create_all(bind=database.engine)
+    print(f"Schema created on {database.engine.url.render_as_string(hide_password=True)}")
+
+
+def drop_schema(args):
+    Base.metadata.drop_all(bind=database.engine)
+    print(f"Schema dropped on {database.engine.url.render_as_string(hide_password=True)}")
+
+
+def run_workers(args):
+    """LLM job workers outside the web process, e.g. alongside a Lambda deployment."""
+    import jobs
+
+    async def run():
+        pool = jobs.WorkerPool(jobs.create_llm_backend(settings.llm_backend), args.workers)
+        pool.start()
+        print(f"Running {args.workers} LLM workers with the {settings.llm_backend} backend")
+        try:
+            await pool.join()
+        finally:
+            await pool.stop()
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database and deployment tasks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create-schema", help="create missing tables and search indexes").set_defaults(func=create_schema)
+    commands.add_parser("drop-schema", help="drop every table").set_defaults(func=drop_schema)
+    workers = commands.add_parser("run-workers", help="process queued LLM jobs until interrupted")
+    workers.add_argument("--workers", type=int, default=settings.llm_workers or 1)
+    workers.set_defaults(func=run_workers)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
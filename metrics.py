@@ -0,0 +1,231 @@
+"""In-process metrics exposed in the Prometheus text format.
+
+Dependency-free counters, gauges and histograms, plus:
+
+- ``MetricsMiddleware``: per-route latency, in-flight requests and a
+  ``Server-Timing`` header with the request's DB and arXiv time
+- ``instrument_engine``: SQLAlchemy hooks counting and timing every
+  statement, both globally and against the current request
+- ``observe_arxiv``: outbound arXiv call timing by status
+
+Per-request totals live in a ``RequestStats`` held in a context variable;
+it is a mutable object so work done on the threadpool or in SQLAlchemy's
+greenlets (which see a copy of the context) adds to the same totals.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+# Seconds; covers sub-millisecond cache hits up to upstream timeouts
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield from self._samples(labels, value)
+
+    def _samples(self, labels, value) -> Iterable[str]:
+        yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), then sum
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def _samples(self, labels, state) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), state):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format_number(bound)
+            le_label = f'le="{le}"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le_label)} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_number(state[-1])}"
+        yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+REGISTRY: List[_Metric] = []
+
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency by route.",
+                             ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.", ("method",))
+REQUEST_DB_QUERIES = Histogram("http_request_db_queries", "SQL statements issued per HTTP request.",
+                               ("route",), QUERY_COUNT_BUCKETS)
+REQUEST_DB_DURATION = Histogram("http_request_db_seconds", "Time spent in SQL per HTTP request.", ("route",))
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "SQL statement execution time.")
+REQUESTS_REJECTED = Counter("http_requests_rejected_total", "Requests refused by admission control.",
+                            ("path", "reason"))
+ARXIV_REQUEST_DURATION = Histogram("arxiv_request_duration_seconds",
+                                   "arXiv API call latency to response headers, per attempt.", ("status",))
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.collect()) + "\n"
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "arxiv_calls", "arxiv_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.arxiv_calls = 0
+        self.arxiv_seconds = 0.0
+
+    def server_timing(self, total_seconds: float) -> str:
+        parts = [f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"']
+        if self.arxiv_calls:
+            parts.append(f'arxiv;dur={self.arxiv_seconds * 1000:.1f};desc="{self.arxiv_calls} calls"')
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def instrument_engine(engine):
+    """Time every statement on ``engine`` (a sync Engine, or AsyncEngine.sync_engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def finish_query(conn, cursor, statement, parameters, context, executemany):
+        _record_query(conn)
+
+    @event.listens_for(engine, "handle_error")
+    def failed_query(context):
+        if context.connection is not None:
+            _record_query(context.connection)
+
+
+def _record_query(conn):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    DB_QUERY_DURATION.observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def observe_arxiv(status: str, elapsed: float):
+    ARXIV_REQUEST_DURATION.observe(elapsed, status)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.arxiv_calls += 1
+        stats.arxiv_seconds += elapsed
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses pass through untouched."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = stats.server_timing(time.perf_counter() - started).encode()
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"server-timing", timing)])
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(method)
+            _request_stats.reset(token)
+            # The router stores the matched route in the scope; templates keep cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_DURATION.observe(time.perf_counter() - started, method, route, str(status))
+            REQUEST_DB_QUERIES.observe(stats.queries, route)
+            REQUEST_DB_DURATION.observe(stats.db_seconds, route)
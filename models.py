@@ -1,8 +1,9 @@
 from database import Base
 
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, TIMESTAMP, Table, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, TIMESTAMP, Table, Text, DDL, Index, event
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql.expression import text
+from sqlalchemy.sql import func
+from sqlalchemy.sql.expression import text, true
 
 # User model
 class User(Base):
@@ -12,52 +13,117 @@ class User(Base):
     email = Column(String, nullable=False, unique=True)
     password = Column(String, nullable=False)
     name = Column(String)
-    is_active = Column(Boolean, server_default='TRUE', nullable=False)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=text('now()'))
+    is_active = Column(Boolean, server_default=true(), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     
     # Relationships
-    # papers = relationship("UserPaper", back_populates="user")
-
-# # Research Paper model
-# class Paper(Base):
-#     __tablename__ = "papers"
-
-#     id = Column(Integer, primary_key=True, nullable=False)
-#     title = Column(String, nullable=False)
-#     authors = Column(String, nullable=False)
-#     abstract = Column(Text)
-#     url = Column(String)
-#     doi = Column(String, unique=True)
-#     publication_date = Column(TIMESTAMP(timezone=True))
-#     journal = Column(String)
-#     created_at = Column(TIMESTAMP(timezone=True), server_default=text('now()'))
+    papers = relationship("UserPaper", back_populates="user")
+
+# Post model
+class Post(Base):
+    __tablename__ = "posts"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    title = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+# Research Paper model
+class Paper(Base):
+    __tablename__ = "papers"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    arxiv_id = Column(String, nullable=False, unique=True)  # versionless, e.g. "2203.12345"
+    title = Column(String, nullable=False)
+    authors = Column(String, nullable=False)
+    abstract = Column(Text)
+    url = Column(String)
+    pdf_url = Column(String)
+    doi = Column(String, unique=True)
+    publication_date = Column(TIMESTAMP(timezone=True), index=True)
+    journal = Column(String)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     
-#     # Relationships
-#     users = relationship("UserPaper", back_populates="paper")
-#     llm_outputs = relationship("LLMOutput", back_populates="paper")
-
-# # Junction table for many-to-many relationship between users and papers
-# class UserPaper(Base):
-#     __tablename__ = "user_papers"
-
-#     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
-#     paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), primary_key=True)
-#     notes = Column(Text)
-#     saved_at = Column(TIMESTAMP(timezone=True), server_default=text('now()'))
+    # Relationships
+    users = relationship("UserPaper", back_populates="paper")
+    llm_outputs = relationship("LLMOutput", back_populates="paper")
+
+# Full-text search over title, abstract and authors: a GIN expression index
+# on Postgres, an external-content FTS5 table kept in sync by triggers on
+# SQLite (tests and Postgres-less runs). Queries live in paper_search.py.
+PAPER_SEARCH_DOCUMENT = "coalesce(title, '') || ' ' || coalesce(abstract, '') || ' ' || coalesce(authors, '')"
+
+_PAPER_SEARCH_DDL = {
+    "postgresql": [
+        f"CREATE INDEX IF NOT EXISTS ix_papers_search ON papers "
+        f"USING gin (to_tsvector('english', {PAPER_SEARCH_DOCUMENT}))",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5("
+        "title, abstract, authors, content='papers', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS papers_fts_ai AFTER INSERT ON papers BEGIN "
+        "INSERT INTO papers_fts(rowid, title, abstract, authors) "
+        "VALUES (new.id, new.title, new.abstract, new.authors); END",
+        "CREATE TRIGGER IF NOT EXISTS papers_fts_ad AFTER DELETE ON papers BEGIN "
+        "INSERT INTO papers_fts(papers_fts, rowid, title, abstract, authors) "
+        "VALUES ('delete', old.id, old.title, old.abstract, old.authors); END",
+        "CREATE TRIGGER IF NOT EXISTS papers_fts_au AFTER UPDATE ON papers BEGIN "
+        "INSERT INTO papers_fts(papers_fts, rowid, title, abstract, authors) "
+        "VALUES ('delete', old.id, old.title, old.abstract, old.authors); "
+        "INSERT INTO papers_fts(rowid, title, abstract, authors) "
+        "VALUES (new.id, new.title, new.abstract, new.authors); END",
+    ],
+}
+
+for _dialect, _statements in _PAPER_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Paper.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+event.listen(Paper.__table__, "before_drop", DDL("DROP TABLE IF EXISTS papers_fts").execute_if(dialect="sqlite"))
+
+# Junction table for many-to-many relationship between users and papers
+class UserPaper(Base):
+    __tablename__ = "user_papers"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), primary_key=True)
+    notes = Column(Text)
+    saved_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     
-#     # Relationships
-#     user = relationship("User", back_populates="papers")
-#     paper = relationship("Paper", back_populates="users")
+    # Relationships
+    user = relationship("User", back_populates="papers")
+    paper = relationship("Paper", back_populates="users")
 
-# # LLM outputs associated with papers
-# class LLMOutput(Base):
-#     __tablename__ = "llm_outputs"
+# LLM outputs associated with papers
+class LLMOutput(Base):
+    __tablename__ = "llm_outputs"
     
-#     id = Column(Integer, primary_key=True, nullable=False)
-#     paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False)
-#     output_type = Column(String, nullable=False)  # e.g., "summary", "critique", "key_points"
-#     content = Column(Text, nullable=False)
-#     created_at = Column(TIMESTAMP(timezone=True), server_default=text('now()'))
+    id = Column(Integer, primary_key=True, nullable=False)
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False)
+    output_type = Column(String, nullable=False)  # e.g., "summary", "critique", "key_points"
+    content = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     
-#     # Relationships
-#     paper = relationship("Paper", back_populates="llm_outputs")
\ No newline at end of file
+    # Relationships
+    paper = relationship("Paper", back_populates="llm_outputs")
+
+# Queued LLM output generation; claimed and run by the workers in jobs.py
+class LLMJob(Base):
+    __tablename__ = "llm_jobs"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False)
+    output_type = Column(String, nullable=False)
+    status = Column(String, nullable=False, server_default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, server_default="0")
+    error = Column(Text)
+    output_id = Column(Integer, ForeignKey("llm_outputs.id", ondelete="SET NULL"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(TIMESTAMP(timezone=True))
+    finished_at = Column(TIMESTAMP(timezone=True))
+
+    __table_args__ = (
+        # Claims scan queued jobs in id order; enqueue looks for active ones per paper
+        Index("ix_llm_jobs_status_id", "status", "id"),
+        Index("ix_llm_jobs_paper_output_type", "paper_id", "output_type"),
+    )
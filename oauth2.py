@@ -1,31 +1,43 @@
-from jose import JWTError, jwt
+import hashlib
+import time
 from datetime import datetime, timedelta
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from . import schemas, models, database
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import schemas, models, database
+from cache import TTLCache, create_backend
 from config import settings
 
-# Secret key and algorithm for JWT tokens
-SECRET_KEY = settings.secret_key
+# Algorithm for JWT tokens; the secret is read from settings on every use
+# so a rotated key takes effect (and drops the token cache) immediately
 ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 def create_access_token(data: dict):
+    from jose import jwt  # loaded on first use, off the cold-start import path
+    
     to_encode = data.copy()
     
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
     
     return encoded_jwt
 
-def verify_access_token(token: str, credentials_exception):
+# Verified tokens keyed by digest; each entry expires at the token's exp
+_token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=0)
+_token_cache_secret = settings.secret_key
+
+def decode_access_token(token: str, credentials_exception):
+    """Verify the signature and claims, returning (TokenData, exp timestamp)."""
+    from jose import JWTError, jwt
+    
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
         user_id = payload.get("user_id")
         
         if user_id is None:
@@ -36,9 +48,64 @@ def verify_access_token(token: str, credentials_exception):
     except JWTError:
         raise credentials_exception
         
+    return token_data, payload.get("exp")
+
+def verify_access_token(token: str, credentials_exception):
+    global _token_cache_secret
+    
+    if settings.secret_key != _token_cache_secret:
+        # Key rotated: nothing verified under the old key may be served
+        _token_cache.clear()
+        _token_cache_secret = settings.secret_key
+    
+    digest = hashlib.sha256(token.encode()).digest()
+    token_data = _token_cache.get(digest)
+    if token_data is not None:
+        return token_data
+    
+    token_data, exp = decode_access_token(token, credentials_exception)
+    
+    remaining = exp - time.time() if exp is not None else 0
+    if remaining > 0:
+        _token_cache.set(digest, token_data, ttl=remaining)
+    
     return token_data
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+# Authenticated-user cache, so resolving the caller costs no query when warm.
+# The password hash is never cached: routes that check it read it with
+# password_hash, so a cache entry can neither leak it nor serve a stale one.
+PRINCIPAL_FIELDS = ("id", "email", "name", "is_active", "created_at")
+
+def create_user_cache():
+    return create_backend(settings.user_cache_backend, prefix="user:",
+                          maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds,
+                          redis_url=settings.redis_url)
+
+def get_user_cache(request: Request):
+    return request.app.state.user_cache
+
+def _to_principal(user: models.User) -> dict:
+    principal = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+    if principal["created_at"] is not None:
+        principal["created_at"] = principal["created_at"].isoformat()
+    return principal
+
+def _from_principal(principal: dict) -> models.User:
+    data = dict(principal)
+    if data["created_at"] is not None:
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+    return models.User(**data)
+
+async def password_hash(db: AsyncSession, user_id: int):
+    """The stored hash for ``user_id``, read from the database; None if the user is gone."""
+    return (await db.execute(select(models.User.password).where(models.User.id == user_id))).scalar()
+
+async def invalidate_user(user_cache, user_id: int):
+    """Drop a cached principal; call after any write to the user row."""
+    await user_cache.delete(str(user_id))
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_db),
+                           user_cache = Depends(get_user_cache)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,6 +114,13 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     
     token_data = verify_access_token(token, credentials_exception)
     
-    user = db.query(models.User).filter(models.User.id == token_data.id).first()
+    principal = await user_cache.get(str(token_data.id))
+    if principal is not None:
+        return _from_principal(principal)
+    
+    user = await db.get(models.User, token_data.id)
+    if user is None:
+        raise credentials_exception
+    await user_cache.set(str(user.id), _to_principal(user))
     
-    return user
\ No newline at end of file
+    return user
@@ -0,0 +1,124 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+
+from config import settings
+from database import session_scope
+
+# Listing endpoints return one keyset page by default, or the whole result
+# streamed in server-side batches
+LIST_FORMATS = ("json", "ndjson", "json-array")
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json-array": "application/json",
+}
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque keyset cursor for the last row of a page."""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":"), default=_json_default).encode()).decode()
+
+
+def _cursor_value(value, python_type):
+    """``value`` as ``python_type``; ValueError if a cursor could not have held it."""
+    if python_type is datetime:
+        if not isinstance(value, str):
+            raise ValueError
+        return datetime.fromisoformat(value)
+    if isinstance(value, bool):
+        raise ValueError
+    if python_type is float and isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, python_type):
+        return value
+    raise ValueError
+
+
+def decode_cursor(cursor: Optional[str], types: Sequence[type]) -> Optional[List[Any]]:
+    """Values of a cursor from ``encode_cursor``, checked against the key types.
+
+    Anything else is a 400, never a query the database rejects.
+    """
+    if cursor is None:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return [_cursor_value(value, python_type) for value, python_type in zip(values, types)]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset_after(statement, key_columns: Sequence, cursor: Optional[str]):
+    """Restrict a select to rows after ``cursor``, in ascending key order."""
+    values = decode_cursor(cursor, [column.type.python_type for column in key_columns])
+    if values is not None:
+        statement = statement.where(tuple_(*key_columns) > tuple_(*values))
+    return statement.order_by(*key_columns)
+
+
+def keyset_select(statement, key_columns: Sequence, cursor: Optional[str], limit: int):
+    """One page after ``cursor``, plus a look-ahead row for ``keyset_page``."""
+    return keyset_after(statement, key_columns, cursor).limit(limit + 1)
+
+
+def keyset_page(rows: List, key_names: Sequence[str], limit: int) -> Tuple[List, Optional[str]]:
+    """Trim the look-ahead row and build the cursor for the next page."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], name) for name in key_names])
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(row) -> str:
+    return json.dumps(dict(row._mapping), default=_json_default)
+
+
+async def stream_batches(statement):
+    """Rows of a select in batches of ``stream_batch_size``, read from a server-side cursor."""
+    # Own session: the request-scoped one may be closed before the body is sent
+    async with session_scope() as db:
+        result = await db.stream(statement.execution_options(yield_per=settings.stream_batch_size))
+        try:
+            async for batch in result.partitions():
+                yield batch
+        finally:
+            await result.close()
+
+
+async def _stream_rows(statement, fmt: str):
+    first = True
+    if fmt == "json-array":
+        yield "["
+    async for batch in stream_batches(statement):
+        if fmt == "ndjson":
+            yield "".join(_dumps(row) + "\n" for row in batch)
+        else:
+            chunk = ",".join(_dumps(row) for row in batch)
+            yield chunk if first else "," + chunk
+            first = False
+    if fmt == "json-array":
+        yield "]"
+
+
+def stream_listing(statement, fmt: str) -> StreamingResponse:
+    """Stream every row of a column select as NDJSON or a JSON array.
+
+    Rows are read with ``yield_per`` and serialized batch by batch, so
+    memory stays flat whatever the table size. Select plain columns rather
+    than entities to skip ORM hydration.
+    """
+    return StreamingResponse(_stream_rows(statement, fmt), media_type=STREAM_MEDIA_TYPES[fmt])
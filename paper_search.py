@@ -0,0 +1,96 @@
+import html
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+from models import PAPER_SEARCH_DOCUMENT
+from pagination import decode_cursor, encode_cursor
+from paper_store import paper_to_result
+
+# Ranked so that higher is better on both backends, then by id for a stable
+# keyset order. The cursor carries (score, id) of the last row.
+_POSTGRES_SEARCH = text(f"""
+    SELECT ranked.*,
+           ts_headline('english', coalesce(ranked.abstract, ''), websearch_to_tsquery('english', :query),
+                       :headline_options) AS highlight
+    FROM (
+        SELECT papers.id, papers.title, papers.authors, papers.abstract, papers.url, papers.pdf_url,
+               ts_rank_cd(to_tsvector('english', {PAPER_SEARCH_DOCUMENT}), q) AS score
+        FROM papers, websearch_to_tsquery('english', :query) AS q
+        WHERE to_tsvector('english', {PAPER_SEARCH_DOCUMENT}) @@ q
+    ) AS ranked
+    WHERE CAST(:after_score AS double precision) IS NULL
+       OR ranked.score < :after_score
+       OR (ranked.score = :after_score AND ranked.id > :after_id)
+    ORDER BY ranked.score DESC, ranked.id
+    LIMIT :limit
+""")
+
+_SQLITE_SEARCH = text("""
+    SELECT * FROM (
+        SELECT papers.id, papers.title, papers.authors, papers.abstract, papers.url, papers.pdf_url,
+               -bm25(papers_fts) AS score,
+               snippet(papers_fts, 1, :mark_start, :mark_end, '...', 24) AS highlight
+        FROM papers_fts JOIN papers ON papers.id = papers_fts.rowid
+        WHERE papers_fts MATCH :query
+    ) AS ranked
+    WHERE :after_score IS NULL
+       OR ranked.score < :after_score
+       OR (ranked.score = :after_score AND ranked.id > :after_id)
+    ORDER BY ranked.score DESC, ranked.id
+    LIMIT :limit
+""")
+
+# Matches are delimited with control characters, which cannot occur in text
+# parsed from XML, so the highlight can be HTML-escaped before <b> goes in
+_MARK_START, _MARK_END = "\x02", "\x03"
+_HEADLINE_OPTIONS = f'MaxFragments=2, MaxWords=30, MinWords=10, StartSel="{_MARK_START}", StopSel="{_MARK_END}"'
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _highlight(snippet: Optional[str]) -> Optional[str]:
+    """Escape the abstract's own markup, then mark the matches with <b>."""
+    if snippet is None:
+        return None
+    return html.escape(snippet, quote=False).replace(_MARK_START, "<b>").replace(_MARK_END, "</b>")
+
+
+def _fts5_query(query: str) -> str:
+    """Quote each word so user input cannot hit FTS5 query syntax."""
+    return " ".join(f'"{word}"' for word in _WORD.findall(query))
+
+
+async def search_papers(db, query: str, limit: int = 20,
+                        cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """Ranked, highlighted full-text search over stored papers, one keyset page at a time."""
+    after_score, after_id = decode_cursor(cursor, (float, int)) or (None, None)
+
+    if db.get_bind().dialect.name == "sqlite":
+        statement, query = _SQLITE_SEARCH, _fts5_query(query)
+        if not query:
+            return [], None
+    else:
+        statement = _POSTGRES_SEARCH
+
+    result = await db.execute(statement, {
+        "query": query,
+        "after_score": after_score,
+        "after_id": after_id,
+        "limit": limit,
+        "mark_start": _MARK_START,
+        "mark_end": _MARK_END,
+        "headline_options": _HEADLINE_OPTIONS,
+    })
+    rows = result.all()
+
+    hits = []
+    for row in rows:
+        hit = paper_to_result(row)
+        hit["rank"] = row.score
+        hit["highlight"] = _highlight(row.highlight)
+        hits.append(hit)
+
+    next_cursor = encode_cursor([rows[-1].score, rows[-1].id]) if len(rows) == limit else None
+    return hits, next_cursor
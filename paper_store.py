@@ -0,0 +1,136 @@
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+import models
+from database import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Authors are stored as one string; names can contain ", " ("Smith, Jr.") but
+# never the unit separator, which is not even allowed in the XML they come from
+AUTHOR_SEPARATOR = "\x1f"
+
+# Rows per INSERT; keeps bound parameters well under driver limits
+UPSERT_CHUNK_SIZE = 1000
+
+# Columns refreshed when a paper is seen again
+UPDATE_COLUMNS = ("title", "authors", "abstract", "url", "pdf_url", "doi", "publication_date", "journal")
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def join_authors(authors: List[str]) -> str:
+    return AUTHOR_SEPARATOR.join(authors)
+
+
+def split_authors(authors: Optional[str]) -> List[str]:
+    return authors.split(AUTHOR_SEPARATOR) if authors else []
+
+
+def paper_values(entry: dict) -> dict:
+    """Map a parsed arXiv entry to Paper column values."""
+    return {
+        "arxiv_id": entry["arxiv_id"],
+        "title": entry["title"],
+        "authors": join_authors(entry["authors"]),
+        "abstract": entry["summary"],
+        "url": entry["link"] or entry["id"],
+        "pdf_url": entry["pdf_url"],
+        "doi": entry.get("doi"),
+        "publication_date": _parse_timestamp(entry.get("published")),
+        "journal": entry.get("journal_ref"),
+    }
+
+
+# Keys of schemas.SearchResult, the public shape of a paper
+RESULT_FIELDS = ("id", "title", "summary", "authors", "link", "pdf_url")
+
+
+def entry_to_result(entry: dict) -> dict:
+    """Project a parsed arXiv entry onto the SearchResult shape."""
+    return {field: entry[field] for field in RESULT_FIELDS}
+
+
+def paper_to_result(paper: models.Paper) -> dict:
+    """Map a stored Paper back to the SearchResult shape."""
+    return {
+        "id": paper.url,
+        "title": paper.title,
+        "summary": paper.abstract or "",
+        "authors": split_authors(paper.authors),
+        "link": paper.url,
+        "pdf_url": paper.pdf_url or "",
+    }
+
+
+async def upsert_papers(db, entries: Iterable[dict]):
+    """Insert or refresh papers with one multi-row INSERT ... ON CONFLICT per chunk.
+
+    Each chunk is committed on its own. A DOI already held by another paper
+    would fail the whole chunk on the unique constraint, so the chunk is
+    retried with such DOIs dropped from the incoming rows.
+    """
+    # A page can repeat an id; ON CONFLICT cannot touch the same row twice
+    rows = list({entry["arxiv_id"]: paper_values(entry) for entry in entries if entry.get("arxiv_id")}.values())
+    if not rows:
+        return
+
+    # Nor can one INSERT give two rows the same DOI; the first keeps it
+    seen_dois = set()
+    for row in rows:
+        if row["doi"] in seen_dois:
+            row["doi"] = None
+        elif row["doi"]:
+            seen_dois.add(row["doi"])
+
+    insert = dialect_insert(db)
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = rows[i:i + UPSERT_CHUNK_SIZE]
+        try:
+            await _upsert_chunk(db, insert, chunk)
+        except IntegrityError:
+            await db.rollback()
+            await _drop_conflicting_dois(db, chunk)
+            await _upsert_chunk(db, insert, chunk)
+
+
+async def _upsert_chunk(db, insert, rows: List[dict]):
+    stmt = insert(models.Paper).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Paper.arxiv_id],
+        set_={column: stmt.excluded[column] for column in UPDATE_COLUMNS},
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def _drop_conflicting_dois(db, rows: List[dict]):
+    """Clear the DOI of rows whose DOI is stored on a different paper."""
+    by_doi = {row["doi"]: row for row in rows if row["doi"]}
+    result = await db.execute(select(models.Paper.arxiv_id, models.Paper.doi)
+                              .where(models.Paper.doi.in_(list(by_doi))))
+    for arxiv_id, doi in result.all():
+        row = by_doi[doi]
+        if row["arxiv_id"] != arxiv_id:
+            logger.warning("DOI %s of %s is already stored on %s; not storing it again",
+                           doi, row["arxiv_id"], arxiv_id)
+            row["doi"] = None
+
+
+async def get_papers_by_arxiv_ids(db, arxiv_ids: List[str]) -> List[models.Paper]:
+    result = await db.execute(select(models.Paper).where(models.Paper.arxiv_id.in_(arxiv_ids)))
+    return result.scalars().all()
+
+
+async def get_papers_by_dois(db, dois: List[str]) -> List[models.Paper]:
+    """Match DOIs case-insensitively, as DOIs are."""
+    result = await db.execute(select(models.Paper).where(func.lower(models.Paper.doi).in_([doi.lower() for doi in dois])))
+    return result.scalars().all()
@@ -0,0 +1,406 @@
+"""Size-bounded on-disk cache and streaming proxy for arXiv PDFs.
+
+The first request for a PDF starts one download that writes the upstream
+body to a part file in ``settings.pdf_cache_dir``; every concurrent request
+for it streams from that file as it grows, so the body is never held in
+memory and arXiv is asked once. Completed files are renamed into place and
+evicted least recently used (by access time, so the order survives
+restarts) once the cache exceeds ``settings.pdf_cache_max_bytes``.
+
+The directory may be shared by the workers of one host. Part files carry
+the pid of the process downloading them, and only those of processes that
+have exited are cleared at startup. Each process enforces the byte bound
+over the files it has seen, so the directory can grow to roughly
+``pdf_cache_max_bytes`` per worker. Give each process its own
+``pdf_cache_dir`` where the bound must hold for the whole host.
+
+Cached files are served with ETag/Last-Modified, conditional requests and
+single byte ranges. Servers offering the ASGI ``http.response.zerocopy``
+extension get the file descriptor to ``sendfile``; otherwise the file is
+read in chunks on the threadpool.
+"""
+import asyncio
+import glob
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from arxiv_api import ArxivClient
+from config import settings
+
+PDF_MEDIA_TYPE = "application/pdf"
+ZEROCOPY = "http.response.zerocopy"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive ``(start, end)``.
+
+    Returns None for anything to be ignored (other units, multiple ranges,
+    malformed specs), in which case the whole file is served; raises
+    RangeNotSatisfiable when the range starts past the end.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first or last) or not (first + last).isdigit():
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def _etag(st: os.stat_result) -> str:
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class FileRangeResponse(Response):
+    """Sends ``count`` bytes of an open file from ``offset``, then closes it."""
+
+    def __init__(self, file, offset: int, count: int, status_code: int, headers: Dict[str, str]):
+        super().__init__(status_code=status_code, headers=headers, media_type=PDF_MEDIA_TYPE)
+        self.file = file
+        self.offset = offset
+        self.count = count
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if self.count and ZEROCOPY in scope.get("extensions", {}):
+                await send({"type": ZEROCOPY, "file": self.file, "offset": self.offset,
+                            "count": self.count, "more_body": False})
+                return
+            fd = self.file.fileno()
+            offset, end = self.offset, self.offset + self.count
+            while True:
+                chunk = b""
+                if offset < end:
+                    chunk = await run_in_threadpool(os.pread, fd, min(settings.pdf_chunk_size, end - offset), offset)
+                offset += len(chunk)
+                more_body = bool(chunk) and offset < end
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                if not more_body:
+                    return
+        finally:
+            self.file.close()
+
+
+class _Download:
+    """One upstream fetch, readable by any number of requests while it runs."""
+
+    def __init__(self, part_path: str):
+        self.part_path = part_path
+        self.written = 0
+        self.content_length: Optional[int] = None
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.ready = asyncio.Event()  # set once the upstream status is known
+        self.changed = asyncio.Condition()
+
+    async def notify(self):
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def wait_past(self, offset: int):
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.written > offset or self.done)
+
+
+def _part_owner(path: str) -> Optional[int]:
+    """Pid of the process writing a part file, from its ``<pid>-`` prefix."""
+    pid, _, _ = os.path.basename(path).partition("-")
+    return int(pid) if pid.isdigit() else None
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if pid is None or pid == os.getpid():
+        # Unprefixed files predate per-process names; our own pid is a previous process's
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PdfCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._files: "OrderedDict[str, int]" = OrderedDict()  # key -> size, least recently used first
+        self._inflight: Dict[str, _Download] = {}
+        # Download tasks outlive the request that started them; held here so
+        # they are not garbage-collected mid-flight, and cancelled by aclose
+        self._tasks: Set[asyncio.Task] = set()
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        for path in glob.glob(os.path.join(self.directory, "*.part")):
+            # Left behind by a download interrupted by a restart; a sibling
+            # worker's download in progress is left alone
+            if not _process_alive(_part_owner(path)):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, "*.pdf")):
+            st = os.stat(path)
+            entries.append((st.st_atime_ns, os.path.basename(path)[:-4].replace("_", "/"), st.st_size))
+        for _, key, size in sorted(entries):
+            self._files[key] = size
+            self.total_bytes += size
+
+    def path(self, key: str) -> str:
+        # Old-style ids contain a slash (hep-th/9901001)
+        return os.path.join(self.directory, key.replace("/", "_") + ".pdf")
+
+    def _open_cached(self, key: str):
+        """Open a cached file and mark it recently used; None if not cached."""
+        if key not in self._files:
+            return None
+        path = self.path(key)
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            self._forget(key)
+            return None
+        self._files.move_to_end(key)
+        self._touch(path, os.fstat(file.fileno()))
+        return file
+
+    def _touch(self, path: str, st: os.stat_result):
+        # Access time carries the LRU order across restarts; mtime feeds the ETag.
+        # Set explicitly: the filesystem may not update it on reads (noatime)
+        os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+
+    def _forget(self, key: str):
+        self.total_bytes -= self._files.pop(key, 0)
+
+    def _add(self, key: str, size: int):
+        self._forget(key)
+        self._touch(self.path(key), os.stat(self.path(key)))
+        self._files[key] = size
+        self.total_bytes += size
+        # The newest file stays even if it alone is over the limit
+        while self.total_bytes > self.max_bytes and len(self._files) > 1:
+            old_key, old_size = self._files.popitem(last=False)
+            self.total_bytes -= old_size
+            try:
+                os.unlink(self.path(old_key))
+            except FileNotFoundError:
+                pass
+            self.evictions += 1
+
+    def _download(self, client: ArxivClient, key: str) -> _Download:
+        download = self._inflight.get(key)
+        if download is not None:
+            self.coalesced += 1
+            return download
+
+        fd, part_path = tempfile.mkstemp(prefix=f"{os.getpid()}-", suffix=".part", dir=self.directory)
+        download = self._inflight[key] = _Download(part_path)
+
+        async def fetch():
+            import httpx
+
+            try:
+                with os.fdopen(fd, "wb", buffering=0) as out:
+                    # A reader is waiting on this download; the API request spacing does not apply
+                    async with client.stream(f"{settings.arxiv_pdf_base_url}/{key}", follow_redirects=True,
+                                             paced=False) as response:
+                        if response.status_code == 404:
+                            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                                detail=f"No PDF for {key} on arXiv")
+                        if response.status_code != 200 or \
+                                not response.headers.get("content-type", "").startswith(PDF_MEDIA_TYPE):
+                            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY,
+                                                detail="Error fetching the PDF from arXiv")
+                        length = response.headers.get("content-length")
+                        download.content_length = int(length) if length and length.isdigit() else None
+                        download.ready.set()
+                        async for chunk in response.aiter_bytes(settings.pdf_chunk_size):
+                            # Page-cache writes; cheaper inline than a threadpool hop per chunk
+                            out.write(chunk)
+                            download.written += len(chunk)
+                            await download.notify()
+                os.replace(part_path, self.path(key))
+                self._add(key, download.written)
+            except httpx.TransportError:
+                download.error = HTTPException(status_code=status.HTTP_502_BAD_GATEWAY,
+                                               detail="Error fetching the PDF from arXiv")
+            except BaseException as e:
+                download.error = e
+            finally:
+                if download.error is not None and os.path.exists(part_path):
+                    os.unlink(part_path)
+                self._inflight.pop(key, None)
+                download.done = True
+                download.ready.set()
+                await download.notify()
+
+        # Not tied to any one request: a client going away leaves the download to finish
+        task = asyncio.ensure_future(fetch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return download
+
+    async def aclose(self):
+        """Cancel downloads in progress; their part files are removed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _tail(self, download: _Download, file):
+        """Stream a part file as it is written, until the download completes."""
+        offset = 0
+        try:
+            while True:
+                if offset < download.written:
+                    chunk = os.pread(file.fileno(), min(settings.pdf_chunk_size, download.written - offset), offset)
+                    offset += len(chunk)
+                    yield chunk
+                elif download.done:
+                    if download.error is not None:
+                        # Headers are already sent; abort so the client sees a truncated body
+                        raise download.error
+                    return
+                else:
+                    await download.wait_past(offset)
+        finally:
+            file.close()
+
+    async def response(self, request: Request, client: ArxivClient, key: str) -> Response:
+        """Serve the PDF for ``key`` from the cache, downloading it on first use."""
+        file = self._open_cached(key)
+        if file is not None:
+            self.hits += 1
+            return self._file_response(request, file)
+
+        self.misses += 1
+        download = self._download(client, key)
+        await download.ready.wait()
+        if download.error is not None:
+            raise download.error
+
+        if not download.done and "range" not in request.headers:
+            # The part file is only renamed after the download completes, which
+            # cannot happen between the check above and this open
+            file = open(download.part_path, "rb")
+            headers = {"Accept-Ranges": "bytes"}
+            if download.content_length is not None:
+                headers["Content-Length"] = str(download.content_length)
+            return StreamingResponse(self._tail(download, file), media_type=PDF_MEDIA_TYPE, headers=headers)
+
+        # Ranges are served from the completed file
+        while not download.done:
+            await download.wait_past(download.written)
+        if download.error is not None:
+            raise download.error
+        file = self._open_cached(key)
+        if file is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="The PDF was evicted from the cache; retry")
+        return self._file_response(request, file)
+
+    def _file_response(self, request: Request, file) -> Response:
+        st = os.fstat(file.fileno())
+        etag = _etag(st)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+        }
+        if _not_modified(request, etag, st.st_mtime):
+            file.close()
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        size = st.st_size
+        byte_range = None
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        # A stale If-Range means the client's partial copy is outdated: send it all
+        if range_header and (if_range is None or if_range in (etag, headers["Last-Modified"])):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                file.close()
+                return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                                headers={"Content-Range": f"bytes */{size}"})
+
+        if byte_range is None:
+            headers["Content-Length"] = str(size)
+            return FileRangeResponse(file, 0, size, status.HTTP_200_OK, headers)
+        start, end = byte_range
+        headers["Content-Length"] = str(end - start + 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return FileRangeResponse(file, start, end - start + 1, status.HTTP_206_PARTIAL_CONTENT, headers)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "files": len(self._files),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+        }
+
+
+def create_pdf_cache() -> PdfCache:
+    directory = settings.pdf_cache_dir or os.path.join(tempfile.gettempdir(), "arxiv-pdf-cache")
+    return PdfCache(directory, settings.pdf_cache_max_bytes)
+
+
+def get_pdf_cache(request: Request) -> PdfCache:
+    """Dependency returning the shared PDF cache, created on first use under fast start."""
+    cache = request.app.state.pdf_cache
+    if cache is None:
+        cache = request.app.state.pdf_cache = create_pdf_cache()
+    return cache
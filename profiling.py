@@ -0,0 +1,208 @@
+"""Sampling profiler for individual requests.
+
+A request is profiled when it carries ``X-Profile-Token`` matching
+``settings.profiler_token``, or, with ``settings.profiler_slow_ms`` set,
+once it has been running that long (a loop timer starts sampling, so
+only requests that turn out slow pay for it). A daemon thread then
+samples the request every ``profiler_interval_ms``:
+
+- while its task is running, the event-loop thread's Python stack (route
+  code, pydantic validation, SQLAlchemy via its greenlets, arXiv parsing)
+- while it is suspended, the chain of coroutines it is awaiting, under
+  an ``<awaiting>`` root, so time spent waiting on the DB, arXiv or the
+  threadpool shows up too
+- while another task holds the loop, that task's stack under
+  ``<other task>``; this covers work the request waits on in background
+  tasks (e.g. a cache fill parsing an arXiv response) and neighbours
+  starving it
+
+The sampler tells these apart with ``asyncio.current_task(loop)``, which
+reports the loop's running task from any thread.
+
+Profiles are kept as collapsed stacks (``frame;frame;frame count`` lines,
+the input format of flamegraph.pl and speedscope) in a ring buffer of the
+last ``profiler_ring_size`` requests. With no token and no threshold the
+middleware is a pass-through.
+"""
+import asyncio
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional
+
+from config import settings
+
+PROFILE_HEADER = b"x-profile-token"
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame) -> List[str]:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+def _awaiting_stack(task: asyncio.Task) -> List[str]:
+    names = ["<awaiting>"]
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is not None:
+            names.append(_frame_name(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return names
+
+
+class ProfileSession:
+    """Samples for one request; filled from the sampler thread."""
+
+    def __init__(self, profile_id: int, scope: dict, trigger: str):
+        self.id = profile_id
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.trigger = trigger
+        self.task = asyncio.current_task()
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self.request_started = time.perf_counter()
+        self.sampling_started: Optional[float] = None
+        self.stacks: Counter = Counter()
+
+    def sample(self, frames: Dict[int, object]):
+        running = asyncio.current_task(self.loop)
+        frame = frames.get(self.thread_id)
+        if running is None or frame is None:
+            stack = _awaiting_stack(self.task)
+        elif running is self.task:
+            stack = _thread_stack(frame)
+        else:
+            # Another task holds the loop: background work this request waits
+            # on (cache fills, uploads) or a neighbour delaying it
+            stack = ["<other task>"] + _thread_stack(frame)
+        self.stacks[";".join(stack)] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profiler:
+    def __init__(self):
+        self.profiles: Deque[dict] = deque(maxlen=settings.profiler_ring_size)
+        self._active = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ids = itertools.count(1)
+
+    def session(self, scope: dict, trigger: str) -> ProfileSession:
+        return ProfileSession(next(self._ids), scope, trigger)
+
+    def start(self, session: ProfileSession):
+        session.sampling_started = time.perf_counter()
+        with self._lock:
+            self._active.add(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, session: ProfileSession, status: int, route: str) -> dict:
+        with self._lock:
+            self._active.discard(session)
+        now = time.perf_counter()
+        profile = {
+            "id": session.id,
+            "method": session.method,
+            "path": session.path,
+            "route": route,
+            "status": status,
+            "trigger": session.trigger,
+            "finished_at": time.time(),
+            "duration_ms": (now - session.request_started) * 1000,
+            "sampled_ms": (now - session.sampling_started) * 1000,
+            "samples": sum(session.stacks.values()),
+            "collapsed": session.collapsed(),
+        }
+        self.profiles.append(profile)
+        return profile
+
+    def get(self, profile_id: int) -> Optional[dict]:
+        return next((profile for profile in self.profiles if profile["id"] == profile_id), None)
+
+    def _run(self):
+        interval = settings.profiler_interval_ms / 1000
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                sessions = list(self._active)
+                if not sessions:
+                    self._wakeup.clear()
+                    continue
+            frames = sys._current_frames()
+            for session in sessions:
+                session.sample(frames)
+            del frames
+            time.sleep(interval)
+
+
+profiler = Profiler()
+
+
+def token_matches(token: Optional[str]) -> bool:
+    return bool(settings.profiler_token) and token is not None and \
+        hmac.compare_digest(token.encode(), settings.profiler_token.encode())
+
+
+class ProfilingMiddleware:
+    """Starts and stops request profiles; a pass-through when profiling is off."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        threshold_ms = settings.profiler_slow_ms
+        if scope["type"] != "http" or not (settings.profiler_token or threshold_ms):
+            await self.app(scope, receive, send)
+            return
+
+        token = next((value.decode() for name, value in scope["headers"] if name == PROFILE_HEADER), None)
+        requested = token_matches(token)
+        if not requested and not threshold_ms:
+            await self.app(scope, receive, send)
+            return
+
+        session = profiler.session(scope, "header" if requested else "slow")
+        timer = None
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if requested:
+                    headers = list(message.get("headers", [])) + [(b"x-profile-id", str(session.id).encode())]
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        if requested:
+            profiler.start(session)
+        else:
+            timer = session.loop.call_later(threshold_ms / 1000, profiler.start, session)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if session.sampling_started is not None:
+                profiler.stop(session, status, getattr(scope.get("route"), "path", "unmatched"))
@@ -0,0 +1,336 @@
+"""Bulk import and streaming export of a user's reading list (``UserPaper`` rows).
+
+Imports are read from the request body as it arrives, as NDJSON or CSV with
+a header row. Each row names a paper by ``identifier``, ``arxiv_id`` or
+``doi`` (anything ``normalize_identifier`` accepts), with optional ``notes``
+and ``saved_at``. Rows are saved in batches of
+``settings.reading_list_import_batch_size``: one lookup per identifier kind,
+then one multi-row ``INSERT ... ON CONFLICT`` per chunk, committed per
+batch. Rows that cannot be saved are reported with their line number.
+
+Exports stream the list in saved order as NDJSON, CSV (re-importable as is)
+or BibTeX, reading the rows from a server-side cursor batch by batch.
+"""
+import codecs
+import csv
+import io
+import json
+import re
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+
+import models
+from arxiv_parser import normalize_identifier
+from config import settings
+from database import dialect_insert
+from pagination import stream_batches, stream_listing
+from paper_store import UPSERT_CHUNK_SIZE, split_authors
+
+IMPORT_FORMATS = ("ndjson", "csv")
+EXPORT_FORMATS = ("ndjson", "csv", "bibtex")
+
+EXPORT_MEDIA_TYPES = {
+    # Starlette adds the charset to text/ types
+    "csv": "text/csv",
+    "bibtex": "application/x-bibtex; charset=utf-8",
+}
+EXPORT_EXTENSIONS = {"ndjson": "ndjson", "csv": "csv", "bibtex": "bib"}
+
+EXPORT_COLUMNS = (
+    models.Paper.arxiv_id, models.Paper.doi, models.Paper.title, models.Paper.authors,
+    models.Paper.publication_date, models.Paper.journal, models.Paper.url,
+    models.UserPaper.notes, models.UserPaper.saved_at,
+)
+
+# (line, row, error): a parsed row, or the reason the line could not be parsed
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+# Fetches papers missing from the store; returns an error per id that failed
+FetchMissing = Callable[[List[str]], Awaitable[Dict[str, str]]]
+
+
+async def aiter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines, without line endings or a UTF-8 BOM."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def _ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[ParsedRow]:
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, row, None
+
+
+async def _csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[ParsedRow]:
+    header = None
+    record, start, number = [], 0, 0
+    async for line in lines:
+        number += 1
+        if not record:
+            if not line.strip():
+                continue
+            start = number
+        record.append(line)
+        text = "\n".join(record)
+        # An odd number of quotes means a quoted field continues on the next line
+        if text.count('"') % 2:
+            continue
+        record = []
+        fields = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in fields]
+            continue
+        yield start, dict(zip(header, fields)), None
+    if record:
+        yield start, None, "Unterminated quoted field"
+
+
+def aiter_rows(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[ParsedRow]:
+    lines = aiter_lines(chunks)
+    return _csv_rows(lines) if fmt == "csv" else _ndjson_rows(lines)
+
+
+def _parse_saved_at(value) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    if not isinstance(value, str):
+        raise ValueError
+    saved_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return saved_at if saved_at.tzinfo else saved_at.replace(tzinfo=timezone.utc)
+
+
+def _row_fields(row: dict) -> Tuple[Optional[str], Optional[str], Optional[datetime]]:
+    """``(identifier, notes, saved_at)`` of a row; ValueError says what is wrong with it."""
+    identifier = row.get("identifier") or row.get("arxiv_id") or row.get("doi")
+    if not isinstance(identifier, str) or not identifier.strip():
+        raise ValueError("Missing identifier, arxiv_id or doi")
+    notes = row.get("notes") or None
+    if notes is not None and not isinstance(notes, str):
+        raise ValueError("notes must be a string")
+    try:
+        saved_at = _parse_saved_at(row.get("saved_at"))
+    except ValueError:
+        raise ValueError("saved_at must be an ISO 8601 timestamp")
+    return identifier, notes, saved_at
+
+
+async def _resolve(db, arxiv_ids: List[str], dois: List[str]) -> Dict[str, int]:
+    """Paper ids by arXiv id and by lower-cased DOI."""
+    found = {}
+    if arxiv_ids:
+        rows = await db.execute(select(models.Paper.arxiv_id, models.Paper.id)
+                                .where(models.Paper.arxiv_id.in_(arxiv_ids)))
+        found.update(rows.all())
+    if dois:
+        doi = func.lower(models.Paper.doi)
+        rows = await db.execute(select(doi, models.Paper.id).where(doi.in_(dois)))
+        found.update(rows.all())
+    return found
+
+
+class ImportSummary:
+    def __init__(self):
+        self.received = 0
+        self.saved = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def fail(self, line: int, identifier: Optional[str], error: str):
+        self.failed += 1
+        if len(self.errors) < settings.reading_list_import_max_errors:
+            self.errors.append({"line": line, "identifier": identifier, "error": error})
+
+    def as_dict(self) -> dict:
+        return {"received": self.received, "saved": self.saved, "skipped": self.skipped,
+                "failed": self.failed, "errors": self.errors}
+
+
+async def _save_batch(db, user_id: int, batch: List[tuple], overwrite: bool,
+                      fetch_missing: Optional[FetchMissing], summary: ImportSummary):
+    parsed = [(line, identifier, notes, saved_at, normalize_identifier(identifier))
+              for line, identifier, notes, saved_at in batch]
+    arxiv_ids = list(dict.fromkeys(ids[0] for *_, ids in parsed if ids[0]))
+    dois = list(dict.fromkeys(ids[1] for *_, ids in parsed if ids[1]))
+    found = await _resolve(db, arxiv_ids, dois)
+
+    fetch_errors = {}
+    missing = [arxiv_id for arxiv_id in arxiv_ids if arxiv_id not in found]
+    if missing and fetch_missing is not None:
+        # Release the connection while waiting on arXiv
+        await db.rollback()
+        fetch_errors = await fetch_missing(missing)
+        found.update(await _resolve(db, missing, []))
+
+    now = datetime.now(timezone.utc)
+    values = {}  # paper id -> row; a paper repeated in the batch keeps its last row
+    matched = 0
+    for line, identifier, notes, saved_at, (arxiv_id, doi) in parsed:
+        key = arxiv_id or doi
+        if key in found:
+            matched += 1
+            values[found[key]] = {"user_id": user_id, "paper_id": found[key], "notes": notes,
+                                  "saved_at": saved_at or now}
+        elif key is None:
+            summary.fail(line, identifier, "Not an arXiv id or DOI")
+        elif arxiv_id is None:
+            summary.fail(line, identifier, "DOI not found in the local store")
+        elif fetch_missing is None:
+            summary.fail(line, identifier, "Paper is not stored; look it up under /papers first")
+        else:
+            summary.fail(line, identifier, fetch_errors.get(arxiv_id, "Not found on arXiv"))
+
+    rows = list(values.values())
+    saved = 0
+    insert = dialect_insert(db)
+    UserPaper = models.UserPaper
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(UserPaper).values(rows[i:i + UPSERT_CHUNK_SIZE])
+        index_elements = [UserPaper.user_id, UserPaper.paper_id]
+        if overwrite:
+            # Only notes change; a row without notes keeps the saved ones
+            stmt = stmt.on_conflict_do_update(index_elements=index_elements,
+                                              set_={"notes": func.coalesce(stmt.excluded.notes, UserPaper.notes)})
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+        saved += len((await db.execute(stmt.returning(UserPaper.paper_id))).all())
+    await db.commit()
+
+    summary.saved += saved
+    # Already on the list (and not overwritten), or repeated in the batch
+    summary.skipped += matched - saved
+
+
+async def import_reading_list(db, user_id: int, rows: AsyncIterator[ParsedRow], overwrite: bool = False,
+                              fetch_missing: Optional[FetchMissing] = None) -> dict:
+    """Save parsed rows to ``user_id``'s reading list, one batch at a time.
+
+    Papers already on the list are left alone, or get the row's notes with
+    ``overwrite``. Without ``fetch_missing`` only papers already in the
+    store can be saved.
+    """
+    summary = ImportSummary()
+    batch = []
+    async for line, row, error in rows:
+        summary.received += 1
+        if error is None:
+            try:
+                batch.append((line, *_row_fields(row)))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            summary.fail(line, None, error)
+        if len(batch) >= settings.reading_list_import_batch_size:
+            await _save_batch(db, user_id, batch, overwrite, fetch_missing, summary)
+            batch = []
+    if batch:
+        await _save_batch(db, user_id, batch, overwrite, fetch_missing, summary)
+    return summary.as_dict()
+
+
+def export_statement(user_id: int):
+    return (select(*EXPORT_COLUMNS)
+            .join(models.Paper, models.Paper.id == models.UserPaper.paper_id)
+            .where(models.UserPaper.user_id == user_id)
+            .order_by(models.UserPaper.saved_at, models.UserPaper.paper_id))
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def _csv_lines(statement):
+    names = [column.key for column in EXPORT_COLUMNS]
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(names)
+    async for batch in stream_batches(statement):
+        writer.writerows([_csv_value(value) for value in row] for row in batch)
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+    # The header alone, for an empty list
+    if out.getvalue():
+        yield out.getvalue()
+
+
+_BIBTEX_SPECIAL = re.compile(r"(?<!\\)([&%#])")
+_BIBTEX_KEY_UNSAFE = re.compile(r"[^A-Za-z0-9.:-]")
+# Read verbatim by biblatex and the url/doi packages; an escape would end up in the link
+_BIBTEX_VERBATIM_FIELDS = {"url", "doi", "eprint"}
+
+
+def _bibtex_value(value: str, verbatim: bool = False) -> str:
+    value = " ".join(value.split())
+    if not verbatim:
+        value = _BIBTEX_SPECIAL.sub(r"\\\1", value)
+    # Braces delimit the field; drop them rather than emit an unbalanced entry
+    depth = 0
+    for char in value:
+        depth += {"{": 1, "}": -1}.get(char, 0)
+        if depth < 0:
+            break
+    if depth:
+        value = value.replace("{", "").replace("}", "")
+    return value
+
+
+def bibtex_entry(row) -> str:
+    authors = split_authors(row.authors)
+    year = str(row.publication_date.year) if row.publication_date else ""
+    surname = re.sub(r"[^a-z]", "", authors[0].split()[-1].lower()) if authors and authors[0].split() else ""
+    key = f"{surname}{year}_{_BIBTEX_KEY_UNSAFE.sub('_', row.arxiv_id)}"
+    fields = [
+        ("title", row.title),
+        ("author", " and ".join(authors)),
+        ("year", year),
+        ("journal", row.journal),
+        ("doi", row.doi),
+        ("eprint", row.arxiv_id),
+        ("archivePrefix", "arXiv"),
+        ("url", row.url),
+        ("note", row.notes),
+    ]
+    body = ",\n".join(f"  {name} = {{{_bibtex_value(value, name in _BIBTEX_VERBATIM_FIELDS)}}}"
+                      for name, value in fields if value)
+    return f"@{'article' if row.journal else 'misc'}{{{key},\n{body}\n}}\n\n"
+
+
+async def _bibtex_entries(statement):
+    async for batch in stream_batches(statement):
+        yield "".join(bibtex_entry(row) for row in batch)
+
+
+def export_reading_list(user_id: int, fmt: str) -> StreamingResponse:
+    """Stream ``user_id``'s reading list as NDJSON, CSV or BibTeX."""
+    statement = export_statement(user_id)
+    if fmt == "ndjson":
+        response = stream_listing(statement, fmt)
+    elif fmt == "csv":
+        response = StreamingResponse(_csv_lines(statement), media_type=EXPORT_MEDIA_TYPES[fmt])
+    else:
+        response = StreamingResponse(_bibtex_entries(statement), media_type=EXPORT_MEDIA_TYPES[fmt])
+    response.headers["Content-Disposition"] = f'attachment; filename="reading-list.{EXPORT_EXTENSIONS[fmt]}"'
+    return response
@@ -0,0 +1,32 @@
+from typing import Any, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from config import settings
+
+try:
+    import orjson
+except ImportError:  # optional; only needed with fast_json_responses
+    orjson = None
+
+
+def fast_json_enabled() -> bool:
+    return settings.fast_json_responses and orjson is not None
+
+
+def default_response_class():
+    """The app-wide response class: ORJSONResponse when fast JSON is enabled."""
+    return ORJSONResponse if fast_json_enabled() else JSONResponse
+
+
+def trusted_json(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None):
+    """Encode content the app built itself, skipping response_model validation.
+
+    Only for plain dicts/lists already in the declared response shape (parsed
+    arXiv entries, rows projected by the store helpers); the route's
+    response_model then documents the payload without re-checking it.
+    """
+    if fast_json_enabled():
+        return ORJSONResponse(content, status_code=status_code, headers=headers)
+    return JSONResponse(jsonable_encoder(content), status_code=status_code, headers=headers)
@@ -0,0 +1,31 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from profiling import profiler, token_matches
+
+router = APIRouter(
+    prefix='/admin',
+    tags=['Admin']
+)
+
+def require_profiler_token(x_profile_token: Optional[str] = Header(None)):
+    if not token_matches(x_profile_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+
+@router.get('/profiles', dependencies=[Depends(require_profiler_token)])
+def list_profiles():
+    """Recent request profiles, newest first, without their stacks"""
+    return [{key: value for key, value in profile.items() if key != "collapsed"}
+            for profile in reversed(profiler.profiles)]
+
+@router.get('/profiles/{profile_id}', response_class=PlainTextResponse,
+            dependencies=[Depends(require_profiler_token)])
+def download_profile(profile_id: int):
+    """Collapsed stacks for flamegraph.pl or speedscope"""
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Profile {profile_id} is no longer in the buffer")
+    return PlainTextResponse(profile["collapsed"], headers={
+        "Content-Disposition": f'attachment; filename="profile-{profile_id}.collapsed"'
+    })
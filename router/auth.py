@@ -1,18 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from .. import models, schemas, utils, oauth2
-from ..database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import models, schemas, utils, oauth2
+from database import get_db
 
 router = APIRouter(
     tags=["Authentication"]
 )
 
 @router.post("/login", response_model=schemas.Token)
-def login(user_credentials: OAuth2PasswordRequestForm = Depends(), 
-          db: Session = Depends(get_db)):
+async def login(user_credentials: OAuth2PasswordRequestForm = Depends(), 
+                db: AsyncSession = Depends(get_db),
+                user_cache = Depends(oauth2.get_user_cache)):
     
-    user = db.query(models.User).filter(models.User.email == user_credentials.username).first()
+    result = await db.execute(select(models.User).filter(models.User.email == user_credentials.username))
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(
@@ -20,13 +23,20 @@ def login(user_credentials: OAuth2PasswordRequestForm = Depends(),
             detail="Invalid credentials"
         )
     
-    if not utils.verify_password(user_credentials.password, user.password):
+    verified, new_hash = await utils.verify_password_async(user_credentials.password, user.password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid credentials"
         )
     
+    # Transparently upgrade hashes made with an older cost factor
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
+        await oauth2.invalidate_user(user_cache, user.id)
+    
     # Create access token
     access_token = oauth2.create_access_token(data={"user_id": user.id})
     
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": access_token, "token_type": "bearer"}
@@ -0,0 +1,85 @@
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+import jobs
+import models
+import oauth2
+import schemas
+from arxiv_parser import normalize_identifier
+from config import settings
+from database import get_db, session_scope
+
+router = APIRouter(
+    prefix='/jobs',
+    tags=['Jobs']
+)
+
+# Reads are open: EventSource cannot send an Authorization header, and the
+# outputs are about public papers. Enqueueing spends backend time, so it is not.
+
+@router.post('/', status_code=status.HTTP_202_ACCEPTED, response_model=schemas.JobOut)
+async def enqueue_job(job: schemas.JobCreate, request: Request, response: Response,
+                      db: AsyncSession = Depends(get_db),
+                      current_user: models.User = Depends(oauth2.get_current_user)):
+    """Queue generation of a summary, critique or key points for a stored paper"""
+    if settings.llm_backend is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="LLM generation is not configured")
+    arxiv_id, _ = normalize_identifier(job.arxiv_id)
+    paper_id = None
+    if arxiv_id is not None:
+        paper_id = (await db.execute(select(models.Paper.id).where(models.Paper.arxiv_id == arxiv_id))).scalar()
+    if paper_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Paper {job.arxiv_id} is not stored; look it up under /papers first")
+
+    job_id = await jobs.enqueue(db, paper_id, job.output_type, current_user.id, job.regenerate)
+    workers = request.app.state.llm_workers
+    if workers is not None:
+        workers.wake()
+
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return await jobs.get_job(db, job_id)
+
+@router.get('/{job_id}', response_model=schemas.JobOut)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Poll a job; ``output`` is set once it is done"""
+    job = await jobs.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} does not exist")
+    return job
+
+async def job_events(request: Request, job_id: int, job: dict):
+    """One SSE event per status change, named after the status, until the job finishes"""
+    last = None
+    while True:
+        if job != last:
+            yield f"event: {job['status']}\ndata: {json.dumps(jsonable_encoder(job))}\n\n"
+            last = job
+        elif await request.is_disconnected():
+            return
+        else:
+            # Keeps proxies from closing an idle stream
+            yield ": keep-alive\n\n"
+        if job["status"] in jobs.FINISHED_STATUSES:
+            return
+
+        await jobs.signals.wait(job_id, settings.llm_poll_interval_seconds)
+        # A short session per check; the stream itself holds no connection
+        async with session_scope() as db:
+            job = await jobs.get_job(db, job_id)
+
+@router.get('/{job_id}/events')
+async def stream_job_events(job_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Server-sent events for a job, ending with a ``done`` or ``failed`` event"""
+    job = await jobs.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} does not exist")
+    await db.rollback()
+
+    return StreamingResponse(job_events(request, job_id, job), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,114 +1,259 @@
-from typing import List
-from fastapi import HTTPException, Depends
-from sqlalchemy.orm import Session
+import asyncio
+import json
+import logging
+from typing import List, Optional
+from fastapi import HTTPException, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 import models
 from schemas import * 
 from fastapi import APIRouter
-from database import get_db
-import httpx
-import ast
+from database import get_db, session_scope
+from arxiv_api import ARXIV_API, ArxivClient, get_arxiv_client, get_query_cache, query_cache_key
+from cache import TTLCache
+from arxiv_parser import AtomFeedParser, aiter_entries, is_arxiv_id, normalize_identifier, strip_version
+from config import settings
 import xml.etree.ElementTree as ET
-from .. import schemas, oauth2
+import schemas, oauth2
+import paper_store
+from responses import trusted_json
+from paper_search import search_papers
+from pdf_cache import PdfCache, get_pdf_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix='/papers',
     tags=['Papers']
 )
 
-def parse_arxiv_response(xml_content):
-    """Parse the XML response from arXiv"""
-    # Parse XML
+async def fetch_arxiv_entries(client: ArxivClient, params: dict, parser: AtomFeedParser = None):
+    """Fetch and parse one arXiv API response, then upsert the entries into the paper store"""
+    import httpx  # already loaded by the client; kept off the import path for cold starts
+    
     try:
-        root = ET.fromstring(xml_content)
+        async with client.stream(ARXIV_API, params=params) as response:
+            if response.status_code != 200:
+                raise HTTPException(status_code=response.status_code,
+                                   detail="Error fetching data from arXiv")
+            
+            # Parse the XML response incrementally as it arrives
+            entries = [entry async for entry in aiter_entries(response.aiter_bytes(), parser)]
+    except httpx.TransportError:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY,
+                            detail="Error fetching data from arXiv")
     except ET.ParseError as e:
         raise HTTPException(status_code=500, detail=f"XML parsing error: {str(e)}")
     
-    results = []
-    
-    # XML namespaces used in arXiv response
-    namespaces = {
-        'atom': 'http://www.w3.org/2005/Atom',
-        'arxiv': 'http://arxiv.org/schemas/atom'
-    }
-    
-    # Find all entry elements
-    for entry in root.findall('.//{http://www.w3.org/2005/Atom}entry'):
-        # Extract basic info
-        id_elem = entry.find('.//{http://www.w3.org/2005/Atom}id').text if entry.find('.//{http://www.w3.org/2005/Atom}id') is not None else ""
-        title = entry.find('.//{http://www.w3.org/2005/Atom}title').text.strip() if entry.find('.//{http://www.w3.org/2005/Atom}title') is not None else ""
-        summary = entry.find('.//{http://www.w3.org/2005/Atom}summary').text.strip() if entry.find('.//{http://www.w3.org/2005/Atom}summary') is not None else ""
-        
-        # Extract authors
-        authors = []
-        for author in entry.findall('.//{http://www.w3.org/2005/Atom}author/{http://www.w3.org/2005/Atom}name'):
-            authors.append(author.text)
-        
-        # Extract links
-        link = ""
-        pdf_url = ""
-        for link_elem in entry.findall('.//{http://www.w3.org/2005/Atom}link'):
-            rel = link_elem.get('rel')
-            if rel == 'alternate':
-                link = link_elem.get('href', "")
-            elif rel == 'related' and link_elem.get('title') == 'pdf':
-                pdf_url = link_elem.get('href', "")
-        
-        results.append({
-            'id': id_elem,
-            'title': title,
-            'summary': summary,
-            'authors': authors,
-            'link': link,
-            'pdf_url': pdf_url
-        })
+    # The store is a read-through copy; failing to write it must not fail the fetch
+    try:
+        async with session_scope() as db:
+            await paper_store.upsert_papers(db, entries)
+    except SQLAlchemyError:
+        logger.exception("Failed to upsert %d arXiv entries", len(entries))
     
-    return results
+    return entries
 
-async def fetch_arxiv_papers_async(query: str, max_results: int = 3):
+async def fetch_arxiv_papers_async(client: ArxivClient, query: str, max_results: int = 3, start: int = 0,
+                                   parser: AtomFeedParser = None):
     """Fetch papers from arXiv API"""
-    base_url = "http://export.arxiv.org/api/query"
     params = {
         "search_query": f"all:{query}",
-        "start": 0,
+        "start": start,
         "max_results": max_results,
         "sortBy": "submittedDate",
         "sortOrder": "descending"
     }
+    return await fetch_arxiv_entries(client, params, parser)
+
+async def search_arxiv_cached(client: ArxivClient, cache: TTLCache, query: str,
+                              max_results: int = 3, start: int = 0) -> List[dict]:
+    """Serve a search from the query cache, going upstream once per key on a miss.
+
+    Results are SearchResult-shaped dicts shared by every caller; do not mutate them.
+    """
+    async def load():
+        result = await fetch_arxiv_papers_async(client, query, max_results=max_results, start=start)
+        return [paper_store.entry_to_result(item) for item in result]
+
+    return await cache.get_or_load(query_cache_key(query, start, max_results), load)
+
+@router.post('/fetch_arxiv_query/', response_model=List[SearchResult])
+async def fetch_arxiv_query_result(search_query: SearchQuery,
+                                   client: ArxivClient = Depends(get_arxiv_client),
+                                   cache: TTLCache = Depends(get_query_cache)):
+    results = await search_arxiv_cached(client, cache, search_query.query,
+                                        max_results=search_query.max_results, start=search_query.start)
+    return trusted_json(results)
+
+async def harvest_pages(request: Request, client: ArxivClient, harvest: HarvestQuery):
+    """Walk arXiv result pages, yielding one NDJSON line per page as it is parsed"""
+    start = harvest.start
+    end = harvest.start + harvest.total
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(base_url, params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code,
-                               detail="Error fetching data from arXiv")
+    while start < end:
+        # Stop spending upstream quota once the client has gone away
+        if await request.is_disconnected():
+            return
+        
+        # Spaced by the client's limiter, like every arXiv API request
+        page_size = min(harvest.page_size, end - start)
+        parser = AtomFeedParser()
+        try:
+            entries = await fetch_arxiv_papers_async(client, harvest.query, max_results=page_size,
+                                                     start=start, parser=parser)
+        except HTTPException as e:
+            # Headers are already sent; report the failure and where to resume from
+            yield json.dumps({"start": start, "error": e.detail}) + "\n"
+            return
         
-        # Parse the XML response
-        return parse_arxiv_response(response.text)
+        yield json.dumps({
+            "start": start,
+            "next_start": start + len(entries),
+            "total_results": parser.total_results,
+            "results": [paper_store.entry_to_result(entry) for entry in entries],
+        }) + "\n"
+        
+        if len(entries) < page_size:
+            return
+        start += len(entries)
 
-@router.post('/fetch_arxiv_query/', response_model=List[SearchResult])
-async def fetch_arxiv_query_result(search_query: SearchQuery):
-    query = search_query.query
-    result = await fetch_arxiv_papers_async(query, max_results=3)
+@router.post('/harvest/')
+async def harvest_arxiv(harvest: HarvestQuery, request: Request,
+                        client: ArxivClient = Depends(get_arxiv_client)):
+    if harvest.total > settings.arxiv_harvest_max_total:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"total may not exceed {settings.arxiv_harvest_max_total}")
+    
+    return StreamingResponse(harvest_pages(request, client, harvest), media_type="application/x-ndjson")
+
+@router.get('/cache/stats')
+def arxiv_cache_stats(cache: TTLCache = Depends(get_query_cache)):
+    return cache.stats()
+
+@router.get('/search', response_model=LocalSearchPage)
+async def search_local_papers(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=100),
+                              cursor: Optional[str] = None, db: AsyncSession = Depends(get_db),
+                              client: ArxivClient = Depends(get_arxiv_client),
+                              cache: TTLCache = Depends(get_query_cache)):
+    """Ranked full-text search over stored papers; a thin first page falls back to arXiv"""
+    hits, next_cursor = await search_papers(db, q, limit=limit, cursor=cursor)
+    if cursor is None and len(hits) < min(limit, settings.local_search_min_results):
+        # The arXiv results are upserted, so the next local search finds them.
+        # Release the connection while waiting on arXiv; the upsert takes its own
+        await db.rollback()
+        results = await search_arxiv_cached(client, cache, q, limit, 0)
+        return trusted_json({"results": results, "next_cursor": None, "source": "arxiv"})
+    return trusted_json({"results": hits, "next_cursor": next_cursor, "source": "local"})
+
+async def fetch_arxiv_id_chunk(client: ArxivClient, arxiv_ids: List[str]):
+    return await fetch_arxiv_entries(client, {"id_list": ",".join(arxiv_ids), "max_results": len(arxiv_ids)})
+
+async def lookup_papers(client: ArxivClient, db: AsyncSession, identifiers: List[str]) -> List[dict]:
+    """Resolve identifiers from the local store, then arXiv in concurrent id_list chunks.
+
+    Returns one item per identifier, in input order, with misses reported per item.
+    """
+    parsed = [normalize_identifier(identifier) for identifier in identifiers]
+    arxiv_ids = list(dict.fromkeys(arxiv_id for arxiv_id, _ in parsed if arxiv_id))
+    dois = list(dict.fromkeys(doi for _, doi in parsed if doi))
+    
+    found = {}  # arxiv_id or lower-cased DOI -> (source, result)
+    if arxiv_ids:
+        for paper in await paper_store.get_papers_by_arxiv_ids(db, arxiv_ids):
+            found[paper.arxiv_id] = ("local", paper_store.paper_to_result(paper))
+    if dois:
+        for paper in await paper_store.get_papers_by_dois(db, dois):
+            found[paper.doi.lower()] = ("local", paper_store.paper_to_result(paper))
+    # Release the connection while waiting on arXiv
+    await db.rollback()
     
-    search_results = []
-    for item in result:
-        search_result = SearchResult(
-            id=item['id'],
-            title=item['title'],
-            summary=item['summary'],
-            authors=item['authors'],
-            link=item['link'],
-            pdf_url=item['pdf_url']
-        )
-        search_results.append(search_result)
+    missing = [arxiv_id for arxiv_id in arxiv_ids if arxiv_id not in found]
+    size = settings.arxiv_id_list_chunk_size
+    chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+    outcomes = await asyncio.gather(*(fetch_arxiv_id_chunk(client, chunk) for chunk in chunks),
+                                    return_exceptions=True)
+    
+    errors = {}
+    for chunk, outcome in zip(chunks, outcomes):
+        if isinstance(outcome, HTTPException):
+            # One failed chunk only fails its own items
+            errors.update(dict.fromkeys(chunk, outcome.detail))
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            requested = set(chunk)
+            for entry in outcome:
+                if entry["arxiv_id"] in requested:
+                    found[entry["arxiv_id"]] = ("arxiv", paper_store.entry_to_result(entry))
+    
+    results = []
+    for identifier, (arxiv_id, doi) in zip(identifiers, parsed):
+        key = arxiv_id or doi
+        item = {"identifier": identifier, "arxiv_id": arxiv_id, "found": key in found,
+                "source": None, "paper": None, "error": None}
+        if key in found:
+            item["source"], item["paper"] = found[key]
+        elif key is None:
+            item["error"] = "Not an arXiv id or DOI"
+        elif arxiv_id is None:
+            item["error"] = "DOI not found in the local store"
+        else:
+            item["error"] = errors.get(arxiv_id, "Not found on arXiv")
+        results.append(item)
+    return results
+
+@router.post('/batch', response_model=BatchLookupResults)
+async def batch_lookup(lookup: BatchLookup, db: AsyncSession = Depends(get_db),
+                       client: ArxivClient = Depends(get_arxiv_client)):
+    """Look up many arXiv ids or DOIs at once; results follow the input order"""
+    if len(lookup.identifiers) > settings.arxiv_batch_max_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {settings.arxiv_batch_max_ids} identifiers per batch")
+    
+    return trusted_json({"results": await lookup_papers(client, db, lookup.identifiers)})
+
+@router.get('/pdf-cache/stats')
+def pdf_cache_stats(cache: PdfCache = Depends(get_pdf_cache)):
+    return cache.stats()
+
+@router.get('/{arxiv_id:path}/pdf', response_class=Response,
+            responses={200: {"content": {"application/pdf": {}}}, 206: {"description": "Partial content"}})
+async def get_paper_pdf(arxiv_id: str, request: Request,
+                        client: ArxivClient = Depends(get_arxiv_client),
+                        cache: PdfCache = Depends(get_pdf_cache)):
+    """Proxy the paper's PDF through the on-disk cache, with Range and conditional request support"""
+    if not is_arxiv_id(arxiv_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"{arxiv_id} is not an arXiv id")
+    # Versioned ids are cached separately; an unversioned id is the latest version when first fetched
+    return await cache.response(request, client, arxiv_id)
+
+# Declared last: the path converter would otherwise shadow the routes above
+@router.get('/{arxiv_id:path}', response_model=SearchResult)
+async def get_paper(arxiv_id: str, db: AsyncSession = Depends(get_db),
+                    client: ArxivClient = Depends(get_arxiv_client)):
+    """Serve a paper from the local store, fetching it from arXiv on first use"""
+    arxiv_id = strip_version(arxiv_id)
+    papers = await paper_store.get_papers_by_arxiv_ids(db, [arxiv_id])
+    if papers:
+        return trusted_json(paper_store.paper_to_result(papers[0]))
+    # Release the connection while waiting on arXiv; the upsert takes its own
+    await db.rollback()
     
-    return search_results
+    entries = await fetch_arxiv_entries(client, {"id_list": arxiv_id, "max_results": 1})
+    if not entries:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Paper {arxiv_id} was not found")
+    return trusted_json(paper_store.entry_to_result(entries[0]))
     
 
 # User saved papers CRUD
 
 # User should be able to add and delete papers to their readinglist. 
 # @router.post('/save/', status_code=status.HTTP_201_CREATED)
-# def save_paper(paper: schemas.PaperCreate, db: Session = Depends(get_db), 
+# def save_paper(paper: schemas.PaperCreate, db: AsyncSession = Depends(get_db), 
 #                current_user: models.User = Depends(oauth2.get_current_user)):
     
\ No newline at end of file
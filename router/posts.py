@@ -1,64 +1,90 @@
-from typing import List
-from fastapi import HTTPException, Depends
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import HTTPException, Depends, Query, Request, Response
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 import models
 import schemas
 from fastapi import APIRouter
 from database import get_db
+from http_cache import not_modified, row_etag
+from pagination import LIST_FORMATS, keyset_after, keyset_page, keyset_select, stream_listing
 
 router = APIRouter(
     prefix='/posts',
     tags=['Posts']
 )
 
-@router.get('/', response_model=List[schemas.CreatePost])
-def test_posts(db: Session = Depends(get_db)):
+# Writes return these with RETURNING instead of reading the row back
+POST_COLUMNS = (models.Post.id, models.Post.title, models.Post.content)
 
-    post = db.query(models.Post).all()
+@router.get('/', response_model=List[schemas.PostOut])
+async def test_posts(response: Response, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                     format: str = Query("json", regex=f"^({'|'.join(LIST_FORMATS)})$"),
+                     db: AsyncSession = Depends(get_db)):
+    """One page of posts in id order; X-Next-Cursor points at the next page.
+
+    format=ndjson or format=json-array streams every post after ``cursor``
+    instead, with the same fields.
+    """
+    columns = select(*POST_COLUMNS)
+
+    if format != "json":
+        return stream_listing(keyset_after(columns, [models.Post.id], cursor), format)
+
+    rows = (await db.execute(keyset_select(columns, [models.Post.id], cursor, limit))).all()
+    post, next_cursor = keyset_page(rows, ["id"], limit)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
 
     return  post
 
 @router.post('/', status_code=status.HTTP_201_CREATED, response_model=List[schemas.CreatePost])
-def test_posts_sent(post_post:schemas.CreatePost, db:Session = Depends(get_db)):
+async def test_posts_sent(post_post:schemas.CreatePost, db:AsyncSession = Depends(get_db)):
 
-    new_post = models.Post(**post_post.dict())
-    db.add(new_post)
-    db.commit()
-    db.refresh(new_post)
+    result = await db.execute(insert(models.Post).values(**post_post.dict()).returning(*POST_COLUMNS))
+    new_post = result.one()
+    await db.commit()
 
     return [new_post]
 
 @router.get('/{id}', response_model=schemas.CreatePost, status_code=status.HTTP_200_OK)
-def get_test_one_post(id:int ,db:Session = Depends(get_db)):
+async def get_test_one_post(id:int, request: Request, response: Response, db:AsyncSession = Depends(get_db)):
 
-    idv_post = db.query(models.Post).filter(models.Post.id == id).first()
+    idv_post = await db.get(models.Post, id)
 
     if idv_post is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"The id: {id} you requested for does not exist")
+
+    # Tagged from the row, so a poll that matches skips serialization
+    etag = row_etag(idv_post.id, idv_post.title, idv_post.content)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers["ETag"] = etag
     return idv_post
 
 @router.delete('/{id}', status_code=status.HTTP_204_NO_CONTENT)
-def delete_test_post(id:int, db:Session = Depends(get_db)):
-
-    deleted_post = db.query(models.Post).filter(models.Post.id == id)
+async def delete_test_post(id:int, db:AsyncSession = Depends(get_db)):
 
+    result = await db.execute(delete(models.Post).where(models.Post.id == id).returning(models.Post.id))
+    deleted_post = result.first()
 
-    if deleted_post.first() is None:
+    if deleted_post is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail=f"The id: {id} you requested for does not exist")
-    deleted_post.delete(synchronize_session=False)
-    db.commit()
+    await db.commit()
 
 @router.put('/{id}', response_model=schemas.CreatePost)
-def update_test_post(update_post:schemas.PostBase, id:int, db:Session = Depends(get_db)):
+async def update_test_post(update_post:schemas.PostBase, id:int, db:AsyncSession = Depends(get_db)):
 
-    updated_post =  db.query(models.Post).filter(models.Post.id == id)
+    result = await db.execute(update(models.Post).where(models.Post.id == id)
+                              .values(**update_post.dict()).returning(*POST_COLUMNS))
+    updated_post = result.first()
 
-    if updated_post.first() is None:
+    if updated_post is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"The id:{id} does not exist")
-    updated_post.update(update_post.dict(), synchronize_session=False)
-    db.commit()
+    await db.commit()
 
 
-    return  updated_post.first()
\ No newline at end of file
+    return  updated_post
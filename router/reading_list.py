@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+import oauth2
+import reading_list
+import schemas
+from arxiv_api import ArxivClient, get_arxiv_client
+from config import settings
+from database import get_db
+from router.papers import fetch_arxiv_id_chunk
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix='/reading-list',
+    tags=['Reading list']
+)
+
+@router.post('/import', response_model=schemas.ReadingListImportResult)
+async def import_reading_list(request: Request,
+                              format: Optional[str] = Query(None, regex=f"^({'|'.join(reading_list.IMPORT_FORMATS)})$"),
+                              on_conflict: str = Query("skip", regex="^(skip|update)$"),
+                              fetch_missing: bool = True,
+                              db: AsyncSession = Depends(get_db),
+                              client: ArxivClient = Depends(get_arxiv_client),
+                              current_user: models.User = Depends(oauth2.get_current_user)):
+    """Save papers from an NDJSON or CSV body, read and saved in batches as it arrives.
+
+    The format defaults to CSV for a text/csv body, NDJSON otherwise. Papers
+    already on the list are skipped, or get the row's notes with
+    ``on_conflict=update``; arXiv papers not yet stored are fetched from
+    arXiv unless ``fetch_missing`` is off.
+    """
+    if format is None:
+        format = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "ndjson"
+
+    async def fetch(arxiv_ids: List[str]) -> Dict[str, str]:
+        size = settings.arxiv_id_list_chunk_size
+        chunks = [arxiv_ids[i:i + size] for i in range(0, len(arxiv_ids), size)]
+        outcomes = await asyncio.gather(*(fetch_arxiv_id_chunk(client, chunk) for chunk in chunks),
+                                        return_exceptions=True)
+        errors = {}
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, HTTPException):
+                errors.update(dict.fromkeys(chunk, outcome.detail))
+            elif isinstance(outcome, Exception):
+                # Rows already saved stay saved; this chunk's rows are reported as failed
+                logger.error("Fetching %d arXiv ids for an import failed", len(chunk), exc_info=outcome)
+                errors.update(dict.fromkeys(chunk, "Error fetching from arXiv"))
+            elif isinstance(outcome, BaseException):
+                raise outcome
+        return errors
+
+    return await reading_list.import_reading_list(
+        db, current_user.id, reading_list.aiter_rows(request.stream(), format),
+        overwrite=on_conflict == "update", fetch_missing=fetch if fetch_missing else None)
+
+@router.get('/export')
+async def export_reading_list(format: str = Query("ndjson", regex=f"^({'|'.join(reading_list.EXPORT_FORMATS)})$"),
+                              current_user: models.User = Depends(oauth2.get_current_user)):
+    """Stream the whole reading list in saved order as NDJSON, CSV or BibTeX"""
+    return reading_list.export_reading_list(current_user.id, format)
@@ -1,99 +1,124 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from .. import models, schemas, utils, oauth2
-from ..database import get_db
+import models, schemas, utils, oauth2
+from database import dialect_insert, get_db
+from http_cache import not_modified, row_etag
+from responses import trusted_json
 
 router = APIRouter(
     prefix='/user',
     tags=['User']
 )
 
+# Writes return these with RETURNING instead of reading the row back
+USER_OUT_COLUMNS = (models.User.id, models.User.email, models.User.name, models.User.created_at)
+
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.UserOut)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    
+    # Hash the password
+    hashed_password = await utils.hash_password_async(user.password)
+    user.password = hashed_password
     
-    # Check if user already exists
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+    # Create new user; the unique email constraint decides duplicates, no pre-check race
+    insert = dialect_insert(db)
+    result = await db.execute(
+        insert(models.User).values(**user.dict())
+        .on_conflict_do_nothing(index_elements=[models.User.email])
+        .returning(*USER_OUT_COLUMNS)
+    )
+    new_user = result.first()
 
-    if existing_user:   
+    if new_user is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User with this email already exists"
         )
-    
-    # Hash the password
-    hashed_password = utils.hash_password(user.password)
-    user.password = hashed_password
-    
-    # Create new user
-    new_user = models.User(**user.dict())
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     
     return new_user
 
 @router.get("/me", response_model=schemas.UserOut)
-def get_current_user(current_user: models.User = Depends(oauth2.get_current_user)):
-    return current_user
+async def get_current_user(request: Request, current_user: models.User = Depends(oauth2.get_current_user)):
+    values = [getattr(current_user, column.key) for column in USER_OUT_COLUMNS]
+    # The principal usually comes from the user cache; a matching poll costs no query and no encoding
+    etag = row_etag(*values)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    return trusted_json({column.key: value for column, value in zip(USER_OUT_COLUMNS, values)},
+                        headers={"ETag": etag})
 
 @router.put("/me", response_model=schemas.UserOut)
-def update_user(updated_info: schemas.UserBase, 
-                db: Session = Depends(get_db),
-                current_user: models.User = Depends(oauth2.get_current_user)):
-    
-    user_query = db.query(models.User).filter(models.User.id == current_user.id)
+async def update_user(updated_info: schemas.UserBase, 
+                      db: AsyncSession = Depends(get_db),
+                      current_user: models.User = Depends(oauth2.get_current_user),
+                      user_cache = Depends(oauth2.get_user_cache)):
     
-    if updated_info.email != current_user.email:
-        # Check if new email already exists
-        existing_email = db.query(models.User).filter(models.User.email == updated_info.email).first()
-        if existing_email:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-    
-    user_query.update(updated_info.dict(), synchronize_session=False)
-    db.commit()
+    try:
+        result = await db.execute(
+            update(models.User).where(models.User.id == current_user.id)
+            .values(**updated_info.dict()).returning(*USER_OUT_COLUMNS)
+        )
+        updated_user = result.one()
+        await db.commit()
+    except IntegrityError:
+        # The new email belongs to another account
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    await oauth2.invalidate_user(user_cache, current_user.id)
     
-    return user_query.first()
+    return updated_user
 
 @router.put("/me/password")
-def change_password(password_data: dict, 
-                    db: Session = Depends(get_db),
-                    current_user: models.User = Depends(oauth2.get_current_user)):
+async def change_password(password_data: dict, 
+                          db: AsyncSession = Depends(get_db),
+                          current_user: models.User = Depends(oauth2.get_current_user),
+                          user_cache = Depends(oauth2.get_user_cache)):
     
-    # Verify current password
-    if not utils.verify_password(password_data["current_password"], current_user.password):
+    # Verify current password against the stored hash; the cached principal has none
+    stored_hash = await oauth2.password_hash(db, current_user.id)
+    verified = stored_hash is not None and \
+        (await utils.verify_password_async(password_data["current_password"], stored_hash))[0]
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password"
         )
     
     # Hash new password
-    hashed_password = utils.hash_password(password_data["new_password"])
+    hashed_password = await utils.hash_password_async(password_data["new_password"])
     
     # Update password
-    user_query = db.query(models.User).filter(models.User.id == current_user.id)
-    user_query.update({"password": hashed_password}, synchronize_session=False)
-    db.commit()
+    await db.execute(update(models.User).where(models.User.id == current_user.id).values(password=hashed_password))
+    await db.commit()
+    await oauth2.invalidate_user(user_cache, current_user.id)
     
     return {"message": "Password updated successfully"}
 
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
-def delete_account(password: str,
-                   db: Session = Depends(get_db),
-                   current_user: models.User = Depends(oauth2.get_current_user)):
+async def delete_account(password: str,
+                         db: AsyncSession = Depends(get_db),
+                         current_user: models.User = Depends(oauth2.get_current_user),
+                         user_cache = Depends(oauth2.get_user_cache)):
     
-    # Verify password before deletion
-    if not utils.verify_password(password, current_user.password):
+    # Verify password before deletion, against the stored hash
+    stored_hash = await oauth2.password_hash(db, current_user.id)
+    verified = stored_hash is not None and (await utils.verify_password_async(password, stored_hash))[0]
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password"
         )
     
-    user_query = db.query(models.User).filter(models.User.id == current_user.id)
-    user_query.delete(synchronize_session=False)
-    db.commit()
+    await db.execute(delete(models.User).where(models.User.id == current_user.id))
+    await db.commit()
+    await oauth2.invalidate_user(user_cache, current_user.id)
     
     return
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import datetime
+from user_schema import UserBase, UserCreate, UserLogin, UserOut, Token, TokenData
 
 class PostBase(BaseModel):
     content: str
@@ -13,6 +14,9 @@ class CreatePost(PostBase):
     class Config:
         orm_mode = True
 
+class PostOut(PostBase):
+    id: int
+
 
 class PaperBase(BaseModel):
     id: str
@@ -25,6 +29,14 @@ class PaperBase(BaseModel):
 
 class SearchQuery(BaseModel):
     query: str
+    start: int = Field(0, ge=0)
+    max_results: int = Field(3, ge=1, le=100)
+
+class HarvestQuery(BaseModel):
+    query: str
+    total: int = Field(..., gt=0)
+    start: int = Field(0, ge=0)  # resume offset
+    page_size: int = Field(100, ge=1, le=2000)
 
 class SearchResult(BaseModel):
     id: str
@@ -37,6 +49,59 @@ class SearchResult(BaseModel):
 class SearchResults(BaseModel):
     results: List[SearchResult]
 
+class BatchLookup(BaseModel):
+    # arXiv ids, arXiv DOIs/URLs, or other DOIs (matched against the local store)
+    identifiers: List[str] = Field(..., min_items=1)
+
+class BatchLookupItem(BaseModel):
+    identifier: str
+    arxiv_id: Optional[str] = None
+    found: bool
+    source: Optional[str] = None  # "local" or "arxiv"
+    paper: Optional[SearchResult] = None
+    error: Optional[str] = None
+
+class BatchLookupResults(BaseModel):
+    results: List[BatchLookupItem]
+
+class LocalSearchHit(SearchResult):
+    rank: Optional[float] = None
+    highlight: Optional[str] = None
+
+class LocalSearchPage(BaseModel):
+    results: List[LocalSearchHit]
+    next_cursor: Optional[str] = None
+    source: str  # "local" or "arxiv"
+
+class JobCreate(BaseModel):
+    arxiv_id: str
+    output_type: Literal["summary", "critique", "key_points"]
+    regenerate: bool = False  # otherwise an existing output is returned as a finished job
+
+class JobOut(BaseModel):
+    id: int
+    arxiv_id: str
+    output_type: str
+    status: str  # queued, running, done or failed
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    output: Optional[str] = None
+
+class ReadingListImportError(BaseModel):
+    line: int
+    identifier: Optional[str] = None
+    error: str
+
+class ReadingListImportResult(BaseModel):
+    received: int
+    saved: int
+    skipped: int  # already on the list, or repeated in the import
+    failed: int
+    errors: List[ReadingListImportError]  # the first reading_list_import_max_errors failures
+
 class PaperCreate(PaperBase):
     notes: Optional[str] = None
 
@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Tests run against a throwaway SQLite file, never a real deployment
+for _key, _value in {
+    "DATABASE_HOSTNAME": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_NAME": "test",
+    "DATABASE_USERNAME": "test",
+    "DATABASE_PASSWORD": "test",
+    "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "PASSWORD_BCRYPT_ROUNDS": "4",
+    "PASSWORD_HASH_WORKERS": "0",
+    # Mock upstreams need no request spacing; pacing tests set their own
+    "ARXIV_MIN_INTERVAL_SECONDS": "0",
+    # Tests drive LLM workers explicitly, with the stand-in backend
+    "LLM_WORKERS": "0",
+    "LLM_BACKEND": "local",
+    # The suite logs in far more often than any client should; admission
+    # control is tested on its own app in test_admission.py
+    "ADMISSION_ENABLED": "false",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import database
+from config import settings
+
+
+@pytest.fixture(scope="session")
+def client():
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def statements():
+    """SQL statements sent to the database while the test runs."""
+    engine = database.async_engine.sync_engine if settings.database_async else database.engine
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Headers for a fresh user, with the principal already cached."""
+    email = f"user{os.urandom(4).hex()}@example.com"
+    client.post("/user/", json={"email": email, "password": "secret"})
+    token = client.post("/login", data={"username": email, "password": "secret"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/user/me", headers=headers)
+    return headers
+
+
+@pytest.fixture
+def one_connection_pool(client):
+    """Rebuild the engines with a single pooled connection and a short checkout timeout."""
+    pool = {"database_pool_size": 1, "database_max_overflow": 0, "database_pool_timeout_seconds": 1.0}
+    saved = {name: getattr(settings, name) for name in pool}
+    for name, value in pool.items():
+        setattr(settings, name, value)
+    database.configure()
+    yield
+    for name, value in saved.items():
+        setattr(settings, name, value)
+    database.configure()
@@ -0,0 +1,152 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import admission
+import metrics
+import oauth2
+from cache import LocalRedis
+from config import settings
+
+
+def make_app(monkeypatch, store="memory", **overrides):
+    overrides = dict(dict(admission_ip_rate=1.0, admission_ip_burst=3, admission_user_rate=1.0, admission_user_burst=5,
+                          admission_route_rates={}, admission_concurrency={}), **overrides)
+    for name, value in overrides.items():
+        monkeypatch.setattr(settings, name, value)
+
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.2)
+        return {"ok": True}
+
+    @app.get("/metrics")
+    async def exempt():
+        return {"ok": True}
+
+    rate_store = admission.RedisRateStore(LocalRedis()) if store == "local" else admission.MemoryRateStore(1000)
+    app.add_middleware(admission.AdmissionMiddleware, store=rate_store)
+    return app
+
+
+def _bearer(user_id):
+    return {"Authorization": f"Bearer {oauth2.create_access_token({'user_id': user_id})}"}
+
+
+@pytest.mark.parametrize("store", ["memory", "local"])
+def test_anonymous_burst_then_429(monkeypatch, store):
+    client = TestClient(make_app(monkeypatch, store))
+
+    statuses = [client.get("/ping").status_code for _ in range(4)]
+    rejected = client.get("/ping")
+
+    assert statuses == [200, 200, 200, 429]
+    assert rejected.json() == {"detail": "Too many requests"}
+    assert rejected.headers["retry-after"] == "1"
+    assert client.get("/metrics").status_code == 200
+    assert 'http_requests_rejected_total{path="other",reason="rate"}' in metrics.render()
+
+
+def test_users_have_their_own_buckets(monkeypatch):
+    client = TestClient(make_app(monkeypatch, admission_ip_burst=100))
+
+    first = [client.get("/ping", headers=_bearer(1)).status_code for _ in range(6)]
+    second = client.get("/ping", headers=_bearer(2)).status_code
+
+    assert first == [200] * 5 + [429]
+    assert second == 200
+
+
+def test_every_request_is_charged_to_its_ip(monkeypatch):
+    client = TestClient(make_app(monkeypatch))
+
+    # Fresh accounts from one address share its bucket, as do invalid tokens
+    statuses = [client.get("/ping", headers=_bearer(user_id)).status_code for user_id in range(10, 13)]
+    statuses.append(client.get("/ping", headers={"Authorization": "Bearer nope"}).status_code)
+
+    assert statuses == [200, 200, 200, 429]
+
+
+def test_forwarded_for_is_read_from_trusted_proxies_only(monkeypatch):
+    app = make_app(monkeypatch, admission_ip_burst=1, admission_trusted_proxies=["10.0.0.0/8"])
+
+    async def get(peer, forwarded):
+        transport = httpx.ASGITransport(app=app, client=(peer, 1234))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return (await http.get("/ping", headers={"X-Forwarded-For": forwarded})).status_code
+
+    async def requests():
+        return [
+            # Behind the proxy chain each client has its own bucket; the spoofed
+            # leftmost hop is ignored
+            await get("10.0.0.1", "203.0.113.1"),
+            await get("10.0.0.1", "203.0.113.2, 10.0.0.2"),
+            await get("10.0.0.1", "198.51.100.9, 203.0.113.1"),
+            # An untrusted peer is charged as itself whatever it forwards
+            await get("192.0.2.7", "203.0.113.3"),
+            await get("192.0.2.7", "203.0.113.4"),
+        ]
+
+    assert asyncio.run(requests()) == [200, 200, 429, 200, 429]
+
+
+def test_configured_routes_on_the_app(monkeypatch):
+    import main
+
+    monkeypatch.setattr(settings, "admission_enabled", True)
+    with TestClient(main.create_app()) as client:
+        logins = [client.post("/login", data={"username": "nobody@example.com", "password": "x"}).status_code
+                  for _ in range(11)]
+        exempt = client.get("/metrics").status_code
+        other = client.get("/").status_code
+
+    # /login allows a burst of 10 per caller; the rest of the site is unaffected
+    assert logins == [403] * 10 + [429]
+    assert exempt == 200
+    assert other == 200
+
+
+def test_route_rates_are_stricter(monkeypatch):
+    client = TestClient(make_app(monkeypatch, admission_route_rates={"/slow": (0.5, 1)}))
+
+    assert client.get("/slow").status_code == 200
+    limited = client.get("/slow")
+    assert limited.status_code == 429
+    assert limited.headers["retry-after"] == "2"
+    assert client.get("/ping").status_code == 200
+
+
+def test_route_concurrency_sheds_after_the_queue_deadline(monkeypatch):
+    app = make_app(monkeypatch, admission_ip_burst=100, admission_concurrency={"/slow": 2},
+                   admission_queue_timeout_seconds=0.05)
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(http.get("/slow") for _ in range(3)))
+
+    responses = asyncio.run(burst())
+
+    assert sorted(response.status_code for response in responses) == [200, 200, 503]
+    shed = next(response for response in responses if response.status_code == 503)
+    assert shed.headers["retry-after"] == "1"
+
+
+def test_gcra_admits_the_steady_rate():
+    tat, now, admitted = None, 0, 0
+    for _ in range(100):
+        new_tat, retry_after = admission.gcra(tat, now, interval=100, burst=1)
+        if new_tat is not None:
+            tat, admitted = new_tat, admitted + 1
+        now += 50
+
+    assert admitted == 50
@@ -0,0 +1,59 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from arxiv_parser import AtomFeedParser, iter_entries, parse_entries
+
+with open(os.path.join(os.path.dirname(__file__), "fixtures", "arxiv_query.xml"), "rb") as _f:
+    FEED = _f.read()
+
+ERROR_FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <opensearch:totalResults xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">1</opensearch:totalResults>
+  <entry>
+    <id>http://arxiv.org/api/errors#incorrect_id_format_for_1234.bad</id>
+    <title>Error</title>
+    <summary>incorrect id format for 1234.bad</summary>
+  </entry>
+</feed>
+"""
+
+
+def test_fixture_entries_are_fully_parsed():
+    parser = AtomFeedParser()
+    entries = list(iter_entries([FEED], parser))
+
+    assert parser.total_results == 48213
+    assert [entry["arxiv_id"] for entry in entries] == ["2503.10622", "1706.03762", "2010.11929"]
+    first, _, last = entries
+    assert first["title"] == "Transformers without Normalization"
+    assert first["authors"][:2] == ["Jiachen Zhu", "Xinlei Chen"]
+    assert first["summary"].startswith("Normalization layers are ubiquitous")
+    assert (first["pdf_url"], first["primary_category"]) == ("http://arxiv.org/pdf/2503.10622v1", "cs.LG")
+    assert (last["doi"], last["journal_ref"]) == ("10.48550/arXiv.2010.11929", "ICLR 2021")
+
+
+def test_chunked_input_matches_a_whole_parse():
+    chunks = [FEED[i:i + 97] for i in range(0, len(FEED), 97)]
+
+    assert list(iter_entries(chunks)) == parse_entries(FEED)
+
+
+def test_error_entries_are_dropped():
+    parser = AtomFeedParser()
+
+    assert list(iter_entries([ERROR_FEED], parser)) == []
+    assert parser.total_results == 1
+
+
+def test_truncated_feed_yields_complete_entries_then_fails():
+    cut = FEED.index(b"<entry>", FEED.index(b"</entry>")) + 40
+    parser = AtomFeedParser()
+
+    entries = parser.feed(FEED[:cut])
+
+    assert [entry["arxiv_id"] for entry in entries] == ["2503.10622"]
+    assert parser.total_results == 48213
+    with pytest.raises(ET.ParseError):
+        parser.close()
@@ -0,0 +1,96 @@
+import os
+
+import httpx
+import pytest
+from sqlalchemy import delete
+
+import models
+import paper_store
+from arxiv_api import ArxivClient
+from config import settings
+from database import session_scope
+
+with open(os.path.join(os.path.dirname(__file__), "fixtures", "arxiv_query.xml"), "rb") as _f:
+    FEED = _f.read()
+
+FEED_IDS = ["2503.10622", "1706.03762", "2010.11929"]
+LOCAL_ID = "2408.00001"
+
+
+@pytest.fixture
+def upstream(client, monkeypatch):
+    """arXiv answering every id_list with the fixture feed, except chunks naming 2408.00099."""
+    requests = []
+
+    def handler(request):
+        id_list = request.url.params["id_list"].split(",")
+        requests.append(id_list)
+        if "2408.00099" in id_list:
+            return httpx.Response(503)
+        return httpx.Response(200, content=FEED)
+
+    async def seed():
+        async with session_scope() as db:
+            # Papers from the feed must start out unknown; other tests store them
+            await db.execute(delete(models.Paper).where(models.Paper.arxiv_id.in_(FEED_IDS)))
+            await db.commit()
+            await paper_store.upsert_papers(db, [{
+                "id": f"http://arxiv.org/abs/{LOCAL_ID}v1", "arxiv_id": LOCAL_ID, "title": "Stored locally",
+                "summary": "", "authors": ["Ada Lovelace"], "link": f"http://arxiv.org/abs/{LOCAL_ID}v1",
+                "pdf_url": "", "doi": "10.1000/batch.1"}])
+
+    client.portal.call(seed)
+    monkeypatch.setattr(settings, "arxiv_id_list_chunk_size", 2)
+    monkeypatch.setattr(settings, "arxiv_max_retries", 0)
+    saved = client.app.state.arxiv_client
+    client.app.state.arxiv_client = ArxivClient(transport=httpx.MockTransport(handler))
+    yield requests
+    client.app.state.arxiv_client = saved
+
+
+def _batch(client, identifiers):
+    response = client.post("/papers/batch", json={"identifiers": identifiers})
+    assert response.status_code == 200
+    return response.json()["results"]
+
+
+def test_batch_results_follow_the_input_order(client, upstream):
+    identifiers = ["2408.00099", "2408.00097", "2010.11929", "10.1000/BATCH.1", "not an id",
+                   "arXiv:1706.03762v7", LOCAL_ID, "10.9999/missing", "2408.00098"]
+
+    results = _batch(client, identifiers)
+
+    assert [item["identifier"] for item in results] == identifiers
+    assert [(item["found"], item["source"], item["error"]) for item in results] == [
+        # The chunk holding these two failed; only its own items fail
+        (False, None, "Error fetching data from arXiv"),
+        (False, None, "Error fetching data from arXiv"),
+        (True, "arxiv", None),
+        (True, "local", None),
+        (False, None, "Not an arXiv id or DOI"),
+        (True, "arxiv", None),
+        (True, "local", None),
+        (False, None, "DOI not found in the local store"),
+        (False, None, "Not found on arXiv"),
+    ]
+    assert results[2]["paper"]["title"] == "An Image is Worth 16x16 Words: Transformers for Image Recognition at Scale"
+    assert results[3]["paper"] == results[6]["paper"]
+    assert sorted(upstream) == [["2010.11929", "1706.03762"], ["2408.00098"], ["2408.00099", "2408.00097"]]
+
+
+def test_local_hits_skip_arxiv_and_fetched_papers_are_stored(client, upstream):
+    first = _batch(client, ["2010.11929", LOCAL_ID])
+    again = _batch(client, ["2010.11929", LOCAL_ID, "10.48550/arXiv.2010.11929"])
+
+    assert [item["source"] for item in first] == ["arxiv", "local"]
+    assert [item["source"] for item in again] == ["local", "local", "local"]
+    assert again[0]["paper"] == again[2]["paper"]
+    assert upstream == [["2010.11929"]]
+
+
+def test_batch_size_is_capped(client, monkeypatch):
+    monkeypatch.setattr(settings, "arxiv_batch_max_ids", 2)
+
+    response = client.post("/papers/batch", json={"identifiers": ["2010.11929"] * 3})
+
+    assert response.status_code == 400
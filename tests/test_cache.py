@@ -0,0 +1,137 @@
+import asyncio
+import types
+
+import pytest
+
+import cache
+from cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+class Loader:
+    """Counts its calls; each returns the next value once ``release`` is set."""
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return f"value {self.calls}"
+
+
+def test_concurrent_misses_share_one_load(clock):
+    async def scenario():
+        ttl_cache, loader = TTLCache(ttl=10), Loader()
+        waiters = [asyncio.ensure_future(ttl_cache.get_or_load("k", loader)) for _ in range(5)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        return ttl_cache, loader, await asyncio.gather(*waiters)
+
+    ttl_cache, loader, values = asyncio.run(scenario())
+
+    assert loader.calls == 1
+    assert values == ["value 1"] * 5
+    stats = ttl_cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["inflight"], stats["size"]) == (5, 4, 0, 1)
+
+
+def test_stale_entry_is_served_while_it_refreshes(clock):
+    async def scenario():
+        ttl_cache, loader = TTLCache(ttl=10, stale_ttl=60), Loader()
+        loader.release.set()
+        first = await ttl_cache.get_or_load("k", loader)
+
+        clock.now += 30
+        loader.release.clear()
+        stale = await ttl_cache.get_or_load("k", loader)
+        again = await ttl_cache.get_or_load("k", loader)
+        inflight = ttl_cache.stats()["inflight"]
+        loader.release.set()
+        await asyncio.sleep(0)
+        fresh = await ttl_cache.get_or_load("k", loader)
+        return ttl_cache, loader, (first, stale, again, inflight, fresh)
+
+    ttl_cache, loader, (first, stale, again, inflight, fresh) = asyncio.run(scenario())
+
+    assert (first, stale, again, fresh) == ("value 1", "value 1", "value 1", "value 2")
+    assert inflight == 1
+    assert loader.calls == 2
+    assert ttl_cache.stats()["stale_hits"] == 2 and ttl_cache.stats()["coalesced"] == 1
+
+
+def test_past_the_stale_window_callers_wait_for_the_load(clock):
+    async def scenario():
+        ttl_cache, loader = TTLCache(ttl=10, stale_ttl=60), Loader()
+        loader.release.set()
+        await ttl_cache.get_or_load("k", loader)
+        clock.now += 71
+        return await ttl_cache.get_or_load("k", loader)
+
+    assert asyncio.run(scenario()) == "value 2"
+
+
+def test_failed_load_is_not_cached_or_left_in_flight(clock):
+    async def scenario():
+        ttl_cache, loader = TTLCache(ttl=10), Loader(fail=True)
+        loader.release.set()
+        outcomes = await asyncio.gather(*(ttl_cache.get_or_load("k", loader) for _ in range(3)),
+                                        return_exceptions=True)
+        stats = ttl_cache.stats()
+        loader.fail = False
+        return outcomes, stats, await ttl_cache.get_or_load("k", loader)
+
+    outcomes, stats, retried = asyncio.run(scenario())
+
+    assert [str(outcome) for outcome in outcomes] == ["upstream down"] * 3
+    assert (stats["inflight"], stats["size"]) == (0, 0)
+    assert retried == "value 2"
+
+
+def test_failed_background_refresh_keeps_the_stale_value(clock):
+    async def scenario():
+        ttl_cache, loader = TTLCache(ttl=10, stale_ttl=60), Loader()
+        loader.release.set()
+        await ttl_cache.get_or_load("k", loader)
+        clock.now += 30
+        loader.fail = True
+        stale = await ttl_cache.get_or_load("k", loader)
+        await asyncio.sleep(0)
+        return ttl_cache, stale, await ttl_cache.get_or_load("k", loader)
+
+    ttl_cache, stale, still = asyncio.run(scenario())
+
+    assert stale == still == "value 1"
+    assert ttl_cache.stats()["inflight"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    ttl_cache = TTLCache(maxsize=2, ttl=10)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    assert ttl_cache.get("a") == 1
+    ttl_cache.set("c", 3)
+
+    assert (ttl_cache.get("a"), ttl_cache.get("b"), ttl_cache.get("c")) == (1, None, 3)
+    clock.now += 10
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.stats() == {"size": 1, "maxsize": 2, "hits": 3, "stale_hits": 0, "misses": 2,
+                                 "coalesced": 0, "evictions": 1, "inflight": 0}
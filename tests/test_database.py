@@ -0,0 +1,55 @@
+import json
+
+import pytest
+from sqlalchemy import exc, insert, select
+
+import database
+import models
+from config import settings
+
+
+def test_sync_session_path(client, monkeypatch):
+    monkeypatch.setattr(settings, "database_async", False)
+
+    async def write_and_read():
+        async with database.session_scope() as db:
+            assert isinstance(db, database.ThreadedSession)
+            post_id = (await db.execute(insert(models.Post).values(title="sync", content="scope")
+                                        .returning(models.Post.id))).scalar()
+            await db.commit()
+
+        sessions = database.get_db()
+        db = await sessions.__anext__()
+        try:
+            return post_id, (await db.execute(select(models.Post.title).where(models.Post.id == post_id))).scalar()
+        finally:
+            await sessions.aclose()
+
+    post_id, title = client.portal.call(write_and_read)
+    created = client.post("/posts/", json={"title": "sync route", "content": "c"})
+    listed = client.get("/posts/", params={"format": "ndjson"})
+
+    assert title == "sync"
+    assert created.status_code == 201
+    assert [json.loads(line)["title"] for line in listed.text.splitlines()][-1] == "sync route"
+
+
+def test_pool_status_counts_checkouts_and_timeouts(client, one_connection_pool):
+    before = client.get("/health/db").json()["sync"]
+
+    held = database.engine.connect()
+    try:
+        busy = client.get("/health/db").json()["sync"]
+        with pytest.raises(exc.TimeoutError):
+            database.engine.connect()
+        starved = client.get("/health/db").json()["sync"]
+    finally:
+        held.close()
+    after = client.get("/health/db").json()
+
+    assert (before["pool"], before["size"], before["checked_out"], before["timeouts"]) == ("TimedQueuePool", 1, 0, 0)
+    assert (busy["checked_out"], busy["checkouts"]) == (1, before["checkouts"] + 1)
+    assert (starved["timeouts"], starved["checkouts"]) == (1, before["checkouts"] + 2)
+    assert starved["wait_max_ms"] >= 900
+    assert after["sync"]["checked_out"] == 0
+    assert ("async" in after) == settings.database_async
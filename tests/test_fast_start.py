@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import database
+import utils
+from conftest import ROOT
+from main import create_app
+
+
+def test_fast_start_serves_before_deferred_setup(client):
+    ddl = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("CREATE"):
+            ddl.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", record)
+    try:
+        app = create_app(fast_start=True)
+        with TestClient(app) as fast:
+            deferred = (app.state.arxiv_client, app.state.pdf_cache, app.state.llm_workers, utils._executor)
+            posts = fast.get("/posts/", params={"limit": 1})
+            still_deferred = (app.state.arxiv_client, app.state.pdf_cache)
+            # The first request that needs them creates them
+            pdf_stats = fast.get("/papers/pdf-cache/stats")
+            pdf_cache = app.state.pdf_cache
+    finally:
+        event.remove(database.engine, "before_cursor_execute", record)
+
+    assert deferred == (None, None, None, None)
+    assert posts.status_code == 200
+    assert still_deferred == (None, None)
+    assert pdf_stats.status_code == 200 and pdf_cache is not None
+    assert ddl == []
+
+
+def test_manage_creates_and_drops_the_schema(tmp_path):
+    path = tmp_path / "manage.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+
+    def manage(command):
+        subprocess.run([sys.executable, "manage.py", command], cwd=ROOT, env=env, check=True, capture_output=True)
+        with sqlite3.connect(path) as conn:
+            return {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    created = manage("create-schema")
+    dropped = manage("drop-schema")
+
+    assert {"users", "posts", "papers", "user_papers", "llm_jobs", "papers_fts"} <= created
+    assert not {"users", "posts", "papers"} & dropped
@@ -0,0 +1,82 @@
+import json
+import os
+import time
+
+import httpx
+import pytest
+
+from arxiv_api import ArxivClient
+from config import settings
+
+with open(os.path.join(os.path.dirname(__file__), "fixtures", "arxiv_query.xml"), "rb") as _f:
+    FEED = _f.read()
+
+
+class Upstream:
+    """Mock arXiv API answering with queued responses and recording when each request came."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.times = []
+        self.starts = []
+
+    def __call__(self, request):
+        self.times.append(time.monotonic())
+        self.starts.append(request.url.params["start"])
+        return self.responses.pop(0) if self.responses else httpx.Response(500)
+
+
+@pytest.fixture
+def upstream(client, monkeypatch):
+    monkeypatch.setattr(settings, "arxiv_min_interval_seconds", 0.2)
+    monkeypatch.setattr(settings, "arxiv_backoff_seconds", 0.01)
+    monkeypatch.setattr(settings, "arxiv_max_retries", 2)
+    saved = client.app.state.arxiv_client
+    mock = Upstream()
+    client.app.state.arxiv_client = ArxivClient(transport=httpx.MockTransport(mock))
+    yield mock
+    client.app.state.arxiv_client = saved
+
+
+def _harvest(client, **params):
+    body = dict({"query": "transformers", "total": 6, "page_size": 3}, **params)
+    response = client.post("/papers/harvest/", json=body)
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_harvest_is_paced_and_reports_where_to_resume(client, upstream):
+    upstream.responses = [
+        httpx.Response(200, content=FEED),
+        # arXiv asking for a pause, then failing for good
+        httpx.Response(503, headers={"Retry-After": "1"}),
+    ]
+
+    lines = _harvest(client)
+
+    assert [(line["start"], line.get("next_start")) for line in lines] == [(0, 3), (3, None)]
+    assert len(lines[0]["results"]) == 3
+    assert lines[0]["total_results"] > 3
+    assert lines[1]["error"] == "Error fetching data from arXiv"
+    gaps = [b - a for a, b in zip(upstream.times, upstream.times[1:])]
+    assert len(upstream.times) == 4  # one page, then three attempts at the next
+    assert all(gap >= 0.19 for gap in gaps)
+    assert gaps[1] >= 0.99  # the retry honoured Retry-After
+
+
+def test_harvest_resumes_from_next_start(client, upstream):
+    upstream.responses = [httpx.Response(200, content=FEED)]
+
+    lines = _harvest(client, start=3, total=3)
+
+    assert upstream.starts == ["3"]
+    assert (lines[0]["start"], lines[0]["next_start"]) == (3, 6)
+
+
+def test_long_retry_after_is_not_waited_out(client, upstream, monkeypatch):
+    monkeypatch.setattr(settings, "arxiv_max_retry_after_seconds", 5)
+    upstream.responses = [httpx.Response(429, headers={"Retry-After": "120"})]
+
+    lines = _harvest(client)
+
+    assert len(upstream.times) == 1
+    assert lines == [{"start": 0, "error": "Error fetching data from arXiv"}]
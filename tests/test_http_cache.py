@@ -0,0 +1,106 @@
+import json
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import http_cache
+
+
+def _post(client, title="cached", content="body"):
+    client.post("/posts/", json={"title": title, "content": content})
+    return json.loads(client.get("/posts/", params={"format": "ndjson"}).text.splitlines()[-1])["id"]
+
+
+def test_post_etag_and_304(client):
+    post_id = _post(client)
+
+    first = client.get(f"/posts/{post_id}")
+    etag = first.headers["etag"]
+    repeat = client.get(f"/posts/{post_id}", headers={"If-None-Match": etag})
+    client.put(f"/posts/{post_id}", json={"title": "changed", "content": "body"})
+    changed = client.get(f"/posts/{post_id}", headers={"If-None-Match": etag})
+
+    assert first.headers["cache-control"] == "no-cache"
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["etag"] == etag
+    assert repeat.headers["cache-control"] == "no-cache"
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_head_gets_no_tag_of_its_own():
+    async def document(request):
+        return JSONResponse({"body": "x" * 2000})
+
+    app = Starlette(routes=[Route("/document", document)])
+    app.add_middleware(http_cache.HttpCacheMiddleware)
+    client = TestClient(app)
+
+    get = client.get("/document")
+    head = client.head("/document")
+    # The tag of an empty body, which is all a HEAD response carries
+    empty = client.head("/document", headers={"If-None-Match": http_cache.body_etag(b"")})
+
+    assert "etag" in get.headers
+    assert head.status_code == 200
+    assert "etag" not in head.headers
+    assert empty.status_code == 200
+
+
+def test_me_polls_get_304(client, auth_headers):
+    etag = client.get("/user/me", headers=auth_headers).headers["etag"]
+
+    repeat = client.get("/user/me", headers=dict(auth_headers, **{"If-None-Match": etag}))
+
+    assert repeat.status_code == 304
+    assert repeat.headers["cache-control"] == "private, no-cache"
+
+
+def test_large_bodies_are_compressed(client):
+    for i in range(30):
+        _post(client, title=f"compress {i}", content="lorem ipsum " * 20)
+
+    response = client.get("/posts/", params={"limit": 30}, headers={"Accept-Encoding": "gzip"})
+    etag = response.headers["etag"]
+    repeat = client.get("/posts/", params={"limit": 30}, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    small = client.get("/posts/", params={"limit": 1}, headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert etag.endswith('-gzip"')
+    assert len(response.json()) == 30
+    assert repeat.status_code == 304
+    # The 304 names the representation the client stored
+    assert repeat.headers["etag"] == etag
+    assert repeat.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in small.headers
+
+
+def test_streamed_listing_is_compressed(client):
+    for i in range(5):
+        _post(client, title=f"stream {i}", content="x" * 300)
+
+    response = client.get("/posts/", params={"format": "ndjson"}, headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert all(json.loads(line)["id"] for line in response.text.splitlines())
+
+
+def test_choose_encoding():
+    assert http_cache.choose_encoding("gzip, deflate") == "gzip"
+    assert http_cache.choose_encoding("gzip;q=0, identity") is None
+    assert http_cache.choose_encoding("*") in ("br", "gzip")
+    assert http_cache.choose_encoding("") is None
+
+
+def test_etag_matches():
+    assert http_cache.etag_matches('"a", "b"', '"b"')
+    assert http_cache.etag_matches('W/"b"', '"b"')
+    assert http_cache.etag_matches('"b-gzip"', '"b"')
+    assert http_cache.etag_matches("*", '"b"')
+    assert not http_cache.etag_matches('"c"', '"b"')
+    assert not http_cache.etag_matches(None, '"b"')
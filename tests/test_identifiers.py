@@ -0,0 +1,19 @@
+import pytest
+
+from arxiv_parser import normalize_identifier
+
+
+@pytest.mark.parametrize("identifier, expected", [
+    ("2203.12345", ("2203.12345", None)),
+    ("2203.12345v3", ("2203.12345", None)),
+    ("arXiv:1706.03762v7", ("1706.03762", None)),
+    ("10.48550/arXiv.2203.12345", ("2203.12345", None)),
+    ("https://doi.org/10.48550/ARXIV.1706.03762", ("1706.03762", None)),
+    ("https://arxiv.org/abs/hep-th/9901001v2", ("hep-th/9901001", None)),
+    ("https://arxiv.org/pdf/2010.11929.pdf", ("2010.11929", None)),
+    ("doi:10.1145/3065386", (None, "10.1145/3065386")),
+    ("10.1038/NATURE14539", (None, "10.1038/nature14539")),
+    ("not an id", (None, None)),
+])
+def test_normalize_identifier(identifier, expected):
+    assert normalize_identifier(identifier) == expected
@@ -0,0 +1,215 @@
+import json
+
+import pytest
+
+from sqlalchemy import func, insert, select
+
+import jobs
+import models
+import paper_store
+from database import session_scope
+
+ABSTRACT = ("We introduce a model. It is fast. It is accurate. "
+            "It scales to large inputs. It needs little data. It is open source.")
+
+
+def _entry(arxiv_id):
+    return {"id": f"http://arxiv.org/abs/{arxiv_id}v1", "arxiv_id": arxiv_id, "title": f"Paper {arxiv_id}",
+            "summary": ABSTRACT, "authors": ["Ada Lovelace", "Alan Turing"], "link": "", "pdf_url": ""}
+
+
+class CountingBackend(jobs.LocalBackend):
+    def __init__(self):
+        self.calls = []
+
+    async def generate(self, output_type, papers):
+        self.calls.append((output_type, [paper["arxiv_id"] for paper in papers]))
+        return await super().generate(output_type, papers)
+
+
+@pytest.fixture
+def papers(client):
+    ids = [f"2401.{n:05d}" for n in range(1, 4)]
+
+    async def seed():
+        async with session_scope() as db:
+            await paper_store.upsert_papers(db, [_entry(arxiv_id) for arxiv_id in ids])
+
+    client.portal.call(seed)
+    return ids
+
+
+@pytest.fixture
+def workers(client):
+    """A running worker pool on the app's event loop."""
+    backend = CountingBackend()
+
+    async def start():
+        pool = jobs.WorkerPool(backend, 2)
+        pool.start()
+        return pool
+
+    pool = client.app.state.llm_workers = client.portal.call(start)
+    yield backend
+    client.portal.call(pool.stop)
+    client.app.state.llm_workers = None
+
+
+def _wait_until_finished(client, job_id):
+    lines = []
+    with client.stream("GET", f"/jobs/{job_id}/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for line in response.iter_lines():
+            lines.append(line)
+    return lines
+
+
+def test_local_backend_is_deterministic():
+    backend = jobs.LocalBackend()
+    paper = {"arxiv_id": "1", "title": "T", "authors": ["Lovelace, Ada", "Turing, Alan"],
+             "abstract": ABSTRACT}
+
+    summary = backend._generate("summary", paper)
+    key_points = backend._generate("key_points", paper)
+
+    assert summary == "We introduce a model. It is fast."
+    assert key_points.count("\n- ") == 4
+    assert backend._generate("critique", paper).startswith("T (Lovelace, Ada et al.) makes 6 claims")
+    assert backend._generate("critique", paper) == backend._generate("critique", dict(paper))
+
+
+def test_enqueue_requires_auth_and_a_stored_paper(client, auth_headers):
+    assert client.post("/jobs/", json={"arxiv_id": "2401.00001", "output_type": "summary"}).status_code == 401
+    missing = client.post("/jobs/", json={"arxiv_id": "1999.99999", "output_type": "summary"}, headers=auth_headers)
+    assert missing.status_code == 404
+    invalid = client.post("/jobs/", json={"arxiv_id": "2401.00001", "output_type": "poem"}, headers=auth_headers)
+    assert invalid.status_code == 422
+
+
+def test_job_runs_and_streams_completion(client, auth_headers, papers, workers):
+    response = client.post("/jobs/", json={"arxiv_id": papers[0], "output_type": "summary", "regenerate": True},
+                           headers=auth_headers)
+    assert response.status_code == 202
+    job = response.json()
+    assert response.headers["location"] == f"/jobs/{job['id']}"
+
+    lines = _wait_until_finished(client, job["id"])
+
+    assert lines[-3] == "event: done"
+    done = json.loads(lines[-2][len("data: "):])
+    assert done["output"] == "We introduce a model. It is fast."
+    polled = client.get(f"/jobs/{job['id']}").json()
+    assert polled["status"] == "done" and polled["attempts"] == 1
+    assert client.get("/jobs/999999").status_code == 404
+
+
+def test_existing_output_is_reused_unless_regenerated(client, auth_headers, papers, workers):
+    body = {"arxiv_id": papers[1], "output_type": "key_points"}
+    first = client.post("/jobs/", json=body, headers=auth_headers).json()
+    _wait_until_finished(client, first["id"])
+
+    reused = client.post("/jobs/", json=body, headers=auth_headers).json()
+    regenerated = client.post("/jobs/", json=dict(body, regenerate=True), headers=auth_headers).json()
+    _wait_until_finished(client, regenerated["id"])
+
+    assert reused["status"] == "done" and reused["output"]
+    assert [call for call in workers.calls if call[0] == "key_points"] == [("key_points", [papers[1]])] * 2
+
+
+def test_claimed_batch_is_grouped_by_paper_and_output_type(client, papers):
+    backend = CountingBackend()
+
+    async def run():
+        async with session_scope() as db:
+            paper_ids = {paper.arxiv_id: paper.id for paper in await paper_store.get_papers_by_arxiv_ids(db, papers)}
+            job_ids = []
+            for arxiv_id, output_type in [(papers[0], "critique"), (papers[1], "critique"), (papers[2], "summary")]:
+                job_ids.append(await jobs.enqueue(db, paper_ids[arxiv_id], output_type, None, regenerate=True))
+            # enqueue coalesces duplicates of an active job, so insert one directly, as
+            # another process racing the same enqueue would
+            job_ids.append((await db.execute(
+                insert(models.LLMJob).values(paper_id=paper_ids[papers[0]], output_type="critique")
+                .returning(models.LLMJob.id)
+            )).scalar_one())
+            await db.commit()
+        pool = jobs.WorkerPool(backend, 0)
+        claimed = await pool.run_once()
+        async with session_scope() as db:
+            return job_ids, claimed, [await jobs.get_job(db, job_id) for job_id in job_ids]
+
+    job_ids, claimed, finished = client.portal.call(run)
+
+    assert len(set(job_ids)) == 4
+    assert claimed == 4
+    # The two critiques of papers[0] share one generation and one output
+    assert sorted(backend.calls) == [("critique", [papers[0], papers[1]]), ("summary", [papers[2]])]
+    assert all(job["status"] == "done" for job in finished)
+    assert finished[3]["output"] == finished[0]["output"]
+
+
+def test_failed_jobs_are_retried_then_marked_failed(client, papers, monkeypatch):
+    class Broken(jobs.LocalBackend):
+        async def generate(self, output_type, papers):
+            raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(jobs.settings, "llm_max_attempts", 2)
+
+    async def run():
+        async with session_scope() as db:
+            paper_id = (await paper_store.get_papers_by_arxiv_ids(db, [papers[2]]))[0].id
+            job_id = await jobs.enqueue(db, paper_id, "critique", None, regenerate=True)
+        pool = jobs.WorkerPool(Broken(), 0)
+        statuses = []
+        for _ in range(2):
+            await pool.run_once()
+            async with session_scope() as db:
+                statuses.append((await jobs.get_job(db, job_id))["status"])
+        return statuses, await pool.run_once()
+
+    statuses, claimed_after = client.portal.call(run)
+
+    assert statuses == ["queued", "failed"]
+    assert claimed_after == 0
+
+
+def test_only_the_latest_claim_finishes_a_reclaimed_job(client, papers, monkeypatch):
+    monkeypatch.setattr(jobs.settings, "llm_job_timeout_seconds", 0)
+
+    async def outputs(db, paper_id):
+        return (await db.execute(select(func.count()).select_from(models.LLMOutput).where(
+            models.LLMOutput.paper_id == paper_id, models.LLMOutput.output_type == "summary"))).scalar()
+
+    async def run():
+        async with session_scope() as db:
+            paper_id = (await paper_store.get_papers_by_arxiv_ids(db, [papers[0]]))[0].id
+            job_id = await jobs.enqueue(db, paper_id, "summary", None, regenerate=True)
+            before = await outputs(db, paper_id)
+            # A worker claims the job and stalls past the timeout; another reclaims it
+            stale = {job["id"]: job["attempts"] for job in await jobs.claim(db, 10) if job["id"] == job_id}
+            current = {job["id"]: job["attempts"] for job in await jobs.claim(db, 10) if job["id"] == job_id}
+        pool = jobs.WorkerPool(jobs.LocalBackend(), 0)
+        paper = {"id": paper_id, "arxiv_id": papers[0], "title": "T", "authors": ["A"], "abstract": ABSTRACT}
+        groups = {(paper_id, "summary"): [job_id]}
+
+        await pool._generate("summary", [paper], groups, current)
+        await pool._generate("summary", [paper], groups, stale)
+        await pool._fail(stale, "late failure")
+        async with session_scope() as db:
+            return stale, current, await jobs.get_job(db, job_id), await outputs(db, paper_id) - before, pool
+
+    stale, current, job, created, pool = client.portal.call(run)
+
+    assert list(stale.values()) == [1] and list(current.values()) == [2]
+    assert job["status"] == "done" and job["error"] is None and job["output"]
+    assert created == 1
+    assert pool.completed == 1
+
+
+def test_enqueue_without_a_backend_is_unavailable(client, auth_headers, papers, monkeypatch):
+    monkeypatch.setattr(jobs.settings, "llm_backend", None)
+
+    response = client.post("/jobs/", json={"arxiv_id": papers[0], "output_type": "summary"}, headers=auth_headers)
+
+    assert response.status_code == 503
+    with pytest.raises(ValueError):
+        jobs.create_llm_backend(None)
@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+from config import settings
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "lambda")
+
+
+def load_event(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def lambda_handler():
+    import database
+    from models import Base
+
+    # Fast start leaves the schema to the deploy step
+    Base.metadata.create_all(bind=database.engine)
+    import lambda_handler
+
+    return lambda_handler
+
+
+def test_handler_runs_its_own_fast_start_app(lambda_handler):
+    import main
+    import utils
+
+    assert lambda_handler.app is not main.app
+    assert lambda_handler.app.state.pdf_cache is None
+    assert settings.password_hash_workers == 0
+    assert lambda_handler.handler(load_event("http_api_v2_post_posts.json"))["statusCode"] == 201
+    assert utils._executor is None
+
+
+def test_keep_warm_ping_skips_the_app(lambda_handler, monkeypatch):
+    def fail(*args):
+        raise AssertionError("keep-warm ping reached the app")
+
+    monkeypatch.setattr(lambda_handler, "run_asgi", fail)
+
+    assert lambda_handler.handler(load_event("scheduled_keep_warm.json")) == {"warm": True}
+    assert lambda_handler.handler({"warmer": True}) == {"warm": True}
+
+
+def test_http_api_v2_post(lambda_handler):
+    response = lambda_handler.handler(load_event("http_api_v2_post_posts.json"))
+
+    assert response["statusCode"] == 201
+    assert response["isBase64Encoded"] is False
+    assert response["headers"]["content-type"] == "application/json"
+    assert json.loads(response["body"]) == [{"title": "lambda", "content": "from v2"}]
+
+
+def test_rest_api_v1_get_with_query(lambda_handler):
+    lambda_handler.handler(load_event("http_api_v2_post_posts.json"))
+    lambda_handler.handler(load_event("http_api_v2_post_posts.json"))
+    lambda_handler.handler(load_event("http_api_v2_post_posts.json"))
+
+    response = lambda_handler.handler(load_event("apigw_v1_get_posts.json"))
+
+    assert response["statusCode"] == 200
+    assert response["multiValueHeaders"]["content-type"] == ["application/json"]
+    assert len(json.loads(response["body"])) == 2
+    assert response["multiValueHeaders"]["x-next-cursor"]
+
+
+def test_function_url_error_passthrough(lambda_handler):
+    response = lambda_handler.handler(load_event("function_url_get_search.json"))
+
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"]) == {"detail": "Invalid cursor"}
+
+
+def test_warm_invocations_reuse_process_state(lambda_handler, monkeypatch):
+    app = lambda_handler.app
+    client = app.state.arxiv_client
+    assert client is not None  # created by the init-phase warm-up
+
+    def fail(*args):
+        raise AssertionError("per-process setup ran on a warm invocation")
+
+    monkeypatch.setattr(lambda_handler, "_start", fail)
+    monkeypatch.setattr(app.router, "lifespan_context", fail)
+
+    for _ in range(3):
+        assert lambda_handler.handler(load_event("apigw_v1_get_posts.json"))["statusCode"] == 200
+
+    assert app.state.arxiv_client is client
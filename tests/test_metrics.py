@@ -0,0 +1,24 @@
+def test_server_timing_reports_request_queries(client):
+    client.post("/posts/", json={"title": "t", "content": "c"})
+
+    response = client.put("/posts/1", json={"title": "t2", "content": "c2"})
+
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    assert 'desc="1 queries"' in timing
+    assert "total;dur=" in timing
+
+
+def test_metrics_exposition(client):
+    client.get("/posts/1")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/posts/{id}",status="200"}' in body
+    assert 'http_request_db_queries_bucket{route="/posts/{id}",le="1"}' in body
+    assert "db_query_duration_seconds_count" in body
+    assert 'http_requests_in_flight{method="GET"} 1' in body
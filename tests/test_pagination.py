@@ -0,0 +1,62 @@
+import base64
+import json
+
+import pytest
+
+from pagination import encode_cursor
+
+
+def _posts(client, count):
+    for i in range(count):
+        client.post("/posts/", json={"title": f"page {i}", "content": "c"})
+    rows = [json.loads(line) for line in client.get("/posts/", params={"format": "ndjson"}).text.splitlines()]
+    return rows[-count:]
+
+
+def test_pages_walk_every_post_in_id_order(client):
+    created = _posts(client, 7)
+    cursor, pages = encode_cursor([created[0]["id"] - 1]), []
+    while cursor is not None:
+        response = client.get("/posts/", params={"limit": 3, "cursor": cursor})
+        pages.append(response.json())
+        cursor = response.headers.get("x-next-cursor")
+
+    rows = [row for page in pages for row in page]
+    assert [len(page) for page in pages[:2]] == [3, 3]
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+    assert rows[:7] == created
+
+
+def test_stream_formats_match_the_pages(client):
+    created = _posts(client, 3)
+    cursor = encode_cursor([created[0]["id"] - 1])
+
+    page = client.get("/posts/", params={"limit": 3, "cursor": cursor}).json()
+    ndjson = client.get("/posts/", params={"format": "ndjson", "cursor": cursor})
+    array = client.get("/posts/", params={"format": "json-array", "cursor": cursor})
+
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in ndjson.text.splitlines()][:3] == page
+    assert array.json()[:3] == page
+    assert set(page[0]) == {"id", "title", "content"}
+
+
+def _raw_cursor(text):
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    _raw_cursor("not json"),
+    _raw_cursor('{"id": 1}'),
+    _raw_cursor("[1, 2]"),
+    _raw_cursor('["x"]'),
+    _raw_cursor("[true]"),
+    _raw_cursor("[1.5]"),
+])
+def test_invalid_cursors_are_rejected(client, cursor):
+    for fmt in ("json", "ndjson"):
+        response = client.get("/posts/", params={"cursor": cursor, "format": fmt})
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid cursor"}
@@ -0,0 +1,106 @@
+import os
+
+import httpx
+import pytest
+
+import paper_store
+from arxiv_api import ArxivClient
+from config import settings
+from database import session_scope
+from pagination import encode_cursor
+
+with open(os.path.join(os.path.dirname(__file__), "fixtures", "arxiv_query.xml"), "rb") as _f:
+    FEED = _f.read()
+
+
+def _entry(arxiv_id, title, summary):
+    return {"id": f"http://arxiv.org/abs/{arxiv_id}v1", "arxiv_id": arxiv_id, "title": title, "summary": summary,
+            "authors": ["Ada Lovelace"], "link": f"http://arxiv.org/abs/{arxiv_id}v1", "pdf_url": ""}
+
+
+@pytest.fixture(scope="module")
+def papers(client):
+    """Four papers on "quokka", the first mentioning it most."""
+    entries = [
+        _entry("2406.00001", "Quokka quokka quokka", "The quokka model, and quokka at scale."),
+        _entry("2406.00002", "A study of marsupials", "One quokka among <script>alert(1)</script> others & more."),
+        _entry("2406.00003", "Another study", "A quokka appears once in this long abstract about wombats."),
+        _entry("2406.00004", "Yet another study", "Wombats, and a quokka, in a much longer abstract than most."),
+    ]
+
+    async def seed():
+        async with session_scope() as db:
+            await paper_store.upsert_papers(db, entries)
+
+    client.portal.call(seed)
+    return [entry["arxiv_id"] for entry in entries]
+
+
+def _search(client, q, **params):
+    response = client.get("/papers/search", params=dict(q=q, **params))
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_results_are_ranked_by_relevance(client, papers):
+    page = _search(client, "quokka")
+
+    assert page["source"] == "local"
+    assert page["results"][0]["link"].endswith(f"{papers[0]}v1")
+    ranks = [hit["rank"] for hit in page["results"]]
+    assert ranks == sorted(ranks, reverse=True)
+
+
+def test_highlight_escapes_the_abstract(client, papers, monkeypatch):
+    monkeypatch.setattr(settings, "local_search_min_results", 1)
+    hit = next(hit for hit in _search(client, "marsupials quokka")["results"] if papers[1] in hit["link"])
+
+    assert "<b>quokka</b>" in hit["highlight"]
+    assert "&lt;script&gt;" in hit["highlight"] and "<script>" not in hit["highlight"]
+    assert "&amp;" in hit["highlight"]
+
+
+def test_cursor_pages_through_every_hit_once(client, papers):
+    first = _search(client, "quokka")["results"]
+    cursor, seen = None, []
+    while True:
+        page = _search(client, "quokka", limit=1, **({"cursor": cursor} if cursor else {}))
+        seen += page["results"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [hit["link"] for hit in seen] == [hit["link"] for hit in first]
+    assert len(seen) == len(papers)
+
+
+def test_invalid_cursor_is_rejected(client, papers):
+    assert client.get("/papers/search", params={"q": "quokka", "cursor": "nope"}).status_code == 400
+
+
+def test_thin_first_page_falls_back_to_arxiv(client, papers, monkeypatch):
+    requests = []
+
+    def upstream(request):
+        requests.append(request.url.params["search_query"])
+        return httpx.Response(200, content=FEED)
+
+    saved = client.app.state.arxiv_client
+    client.app.state.arxiv_client = ArxivClient(transport=httpx.MockTransport(upstream))
+    try:
+        monkeypatch.setattr(settings, "local_search_min_results", 4)
+        enough = _search(client, "quokka")
+        monkeypatch.setattr(settings, "local_search_min_results", 5)
+        thin = _search(client, "quokka", limit=5)
+        # Past the first page a short page is just the end of the results
+        after = encode_cursor([enough["results"][0]["rank"] + 1, 0])
+        later = _search(client, "quokka", limit=5, cursor=after)
+    finally:
+        client.app.state.arxiv_client = saved
+
+    assert enough["source"] == "local" and len(enough["results"]) == 4
+    assert thin["source"] == "arxiv" and thin["next_cursor"] is None
+    assert [hit["link"].rsplit("/", 1)[-1][:10] for hit in thin["results"]] == ["2503.10622", "1706.03762",
+                                                                                 "2010.11929"]
+    assert later["source"] == "local" and len(later["results"]) == 4
+    assert requests == ["all:quokka"]
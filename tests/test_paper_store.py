@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import delete, select
+
+import models
+import paper_store
+from database import session_scope
+
+IDS = ["2405.00001", "2405.00002", "2405.00003"]
+
+
+def _entry(arxiv_id, title="A paper", authors=("Ada Lovelace",), doi=None):
+    return {"id": f"http://arxiv.org/abs/{arxiv_id}v1", "arxiv_id": arxiv_id, "title": title, "summary": "",
+            "authors": list(authors), "link": f"http://arxiv.org/abs/{arxiv_id}v1", "pdf_url": "", "doi": doi}
+
+
+@pytest.fixture
+def store(client):
+    """Runs coroutines on the app's loop against a papers table without IDS."""
+    async def clear():
+        async with session_scope() as db:
+            await db.execute(delete(models.Paper).where(models.Paper.arxiv_id.in_(IDS)))
+            await db.commit()
+
+    def run(fn, *args):
+        async def scoped():
+            async with session_scope() as db:
+                return await fn(db, *args)
+        return client.portal.call(scoped)
+
+    client.portal.call(clear)
+    yield run
+    client.portal.call(clear)
+
+
+async def _stored(db):
+    result = await db.execute(select(models.Paper).where(models.Paper.arxiv_id.in_(IDS))
+                              .order_by(models.Paper.arxiv_id))
+    return {paper.arxiv_id: paper for paper in result.scalars()}
+
+
+def test_upsert_inserts_then_updates_in_place(store):
+    store(paper_store.upsert_papers, [_entry(IDS[0]), _entry(IDS[1])])
+    first = store(_stored)
+
+    store(paper_store.upsert_papers, [_entry(IDS[0], title="Revised", doi="10.1000/rev"), _entry(IDS[2])])
+    second = store(_stored)
+
+    assert sorted(first) == IDS[:2]
+    assert sorted(second) == IDS
+    assert second[IDS[0]].id == first[IDS[0]].id
+    assert (second[IDS[0]].title, second[IDS[0]].doi) == ("Revised", "10.1000/rev")
+    assert second[IDS[1]].title == "A paper"
+
+
+def test_authors_with_commas_round_trip(store):
+    authors = ["Smith, Jr., John", "Ada Lovelace"]
+    store(paper_store.upsert_papers, [_entry(IDS[0], authors=authors)])
+
+    paper = store(_stored)[IDS[0]]
+
+    assert paper_store.paper_to_result(paper)["authors"] == authors
+
+
+def test_doi_held_by_another_paper_is_dropped_not_the_chunk(store):
+    store(paper_store.upsert_papers, [_entry(IDS[0], doi="10.1000/shared")])
+
+    store(paper_store.upsert_papers, [_entry(IDS[1], doi="10.1000/shared"), _entry(IDS[2], doi="10.1000/other")])
+    stored = store(_stored)
+
+    assert {arxiv_id: paper.doi for arxiv_id, paper in stored.items()} == {
+        IDS[0]: "10.1000/shared", IDS[1]: None, IDS[2]: "10.1000/other"}
+
+
+def test_doi_repeated_within_a_batch_stays_on_the_first_paper(store):
+    store(paper_store.upsert_papers, [_entry(IDS[0], doi="10.1000/dup"), _entry(IDS[1], doi="10.1000/dup")])
+
+    stored = store(_stored)
+
+    assert {arxiv_id: paper.doi for arxiv_id, paper in stored.items()} == {IDS[0]: "10.1000/dup", IDS[1]: None}
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import httpx
+import pytest
+
+from arxiv_api import ArxivClient
+from pdf_cache import PdfCache, RangeNotSatisfiable, parse_range
+
+PDF = b"%PDF-1.7\n" + bytes(range(256)) * 400
+
+
+class Upstream:
+    """Mock arXiv PDF host counting the downloads it serves."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request.url.path)
+        if request.url.path.endswith("/0000.00000"):
+            return httpx.Response(404)
+        await asyncio.sleep(self.delay)
+        return httpx.Response(200, content=PDF, headers={"Content-Type": "application/pdf"})
+
+
+@pytest.fixture
+def upstream(client, tmp_path):
+    state = client.app.state
+    saved = state.arxiv_client, state.pdf_cache
+    mock = Upstream()
+    state.arxiv_client = ArxivClient(transport=httpx.MockTransport(mock))
+    state.pdf_cache = PdfCache(str(tmp_path), max_bytes=10 * len(PDF))
+    yield mock
+    state.arxiv_client, state.pdf_cache = saved
+
+
+def test_pdf_is_downloaded_once_then_served_from_disk(client, upstream):
+    first = client.get("/papers/2203.12345v2/pdf")
+    second = client.get("/papers/2203.12345v2/pdf")
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content == PDF
+    assert second.headers["content-type"] == "application/pdf"
+    assert second.headers["content-length"] == str(len(PDF))
+    assert "etag" in second.headers
+    assert upstream.requests == ["/pdf/2203.12345v2"]
+
+
+def test_pdf_range_requests(client, upstream):
+    client.get("/papers/2203.12345/pdf")
+
+    partial = client.get("/papers/2203.12345/pdf", headers={"Range": "bytes=100-199"})
+    suffix = client.get("/papers/2203.12345/pdf", headers={"Range": "bytes=-10"})
+    outside = client.get("/papers/2203.12345/pdf", headers={"Range": f"bytes={len(PDF)}-"})
+
+    assert partial.status_code == 206
+    assert partial.content == PDF[100:200]
+    assert partial.headers["content-range"] == f"bytes 100-199/{len(PDF)}"
+    assert suffix.content == PDF[-10:]
+    assert outside.status_code == 416
+    assert outside.headers["content-range"] == f"bytes */{len(PDF)}"
+
+
+def test_pdf_conditional_requests(client, upstream):
+    client.get("/papers/hep-th/9901001/pdf")
+    etag = client.get("/papers/hep-th/9901001/pdf").headers["etag"]
+
+    cached = client.get("/papers/hep-th/9901001/pdf", headers={"If-None-Match": etag})
+    stale_range = client.get("/papers/hep-th/9901001/pdf", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert stale_range.status_code == 200
+    assert stale_range.content == PDF
+
+
+def test_pdf_errors(client, upstream):
+    assert client.get("/papers/0000.00000/pdf").status_code == 404
+    assert client.get("/papers/not-an-id/pdf").status_code == 404
+    assert upstream.requests == ["/pdf/0000.00000"]
+
+
+def test_concurrent_first_requests_share_one_download(client, upstream):
+    upstream.delay = 0.05
+
+    async def fetch_all():
+        # A fresh client on this loop; the fixture's is bound to the TestClient's
+        client.app.state.arxiv_client = ArxivClient(transport=httpx.MockTransport(upstream))
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(http.get("/papers/1706.03762/pdf") for _ in range(5)))
+
+    responses = asyncio.run(fetch_all())
+
+    assert [response.content for response in responses] == [PDF] * 5
+    assert upstream.requests == ["/pdf/1706.03762"]
+    assert client.app.state.pdf_cache.stats()["coalesced"] == 4
+
+
+def test_least_recently_used_pdf_is_evicted(tmp_path):
+    cache = PdfCache(str(tmp_path), max_bytes=2 * len(PDF))
+    for key in ("a", "b"):
+        open(cache.path(key), "wb").write(PDF)
+        cache._add(key, len(PDF))
+    cache._open_cached("a").close()
+
+    open(cache.path("c"), "wb").write(PDF)
+    cache._add("c", len(PDF))
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.pdf", "c.pdf"]
+    assert cache.stats()["evictions"] == 1
+    assert list(PdfCache(str(tmp_path), max_bytes=2 * len(PDF))._files) == ["a", "c"]
+
+
+def test_only_part_files_of_exited_processes_are_cleared(tmp_path):
+    exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                            capture_output=True, text=True).stdout.strip()
+    sibling = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        for name in (f"{sibling.pid}-x.part", f"{exited}-x.part", "old.part"):
+            (tmp_path / name).write_bytes(b"%PDF")
+
+        PdfCache(str(tmp_path), max_bytes=len(PDF))
+
+        assert [p.name for p in tmp_path.iterdir()] == [f"{sibling.pid}-x.part"]
+    finally:
+        sibling.kill()
+        sibling.wait()
+
+
+def test_aclose_cancels_downloads_in_progress(tmp_path):
+    async def scenario():
+        cache = PdfCache(str(tmp_path), max_bytes=10 * len(PDF))
+        client = ArxivClient(transport=httpx.MockTransport(Upstream(delay=10)))
+        download = cache._download(client, "1706.03762")
+        await asyncio.sleep(0.01)
+        assert len(cache._tasks) == 1
+
+        await cache.aclose()
+        await client.aclose()
+        return cache, download
+
+    cache, download = asyncio.run(scenario())
+
+    assert download.done and isinstance(download.error, asyncio.CancelledError)
+    assert not cache._tasks and not cache._inflight
+    assert os.listdir(tmp_path) == []
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-0", 10) == (0, 0)
+    assert parse_range("bytes=5-", 10) == (5, 9)
+    assert parse_range("bytes=5-100", 10) == (5, 9)
+    assert parse_range("bytes=-3", 10) == (7, 9)
+    assert parse_range("bytes=0-1,4-5", 10) is None
+    assert parse_range("items=0-1", 10) is None
+    assert parse_range("bytes=abc", 10) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=10-", 10)
@@ -0,0 +1,55 @@
+import os
+
+import httpx
+from sqlalchemy import delete, select
+
+import models
+from arxiv_api import ArxivClient
+from database import session_scope
+
+with open(os.path.join(os.path.dirname(__file__), "fixtures", "arxiv_query.xml"), "rb") as _f:
+    FEED = _f.read()
+
+
+def _forget(client, arxiv_id):
+    async def forget():
+        async with session_scope() as db:
+            await db.execute(delete(models.Paper).where(models.Paper.arxiv_id == arxiv_id))
+            await db.commit()
+
+    client.portal.call(forget)
+
+
+def _stored(client, arxiv_id):
+    async def stored():
+        async with session_scope() as db:
+            return (await db.execute(select(models.Paper.id).where(models.Paper.arxiv_id == arxiv_id))).scalar()
+
+    return client.portal.call(stored)
+
+
+def _timeouts(client):
+    return sum(pool["timeouts"] for pool in client.get("/health/db").json().values())
+
+
+def test_arxiv_fallbacks_release_the_request_connection(client, one_connection_pool):
+    # The request's session must not sit on the only connection while the
+    # route waits on arXiv and upserts what it got through a session of its own
+    saved = client.app.state.arxiv_client
+    upstream = httpx.MockTransport(lambda request: httpx.Response(200, content=FEED))
+    client.app.state.arxiv_client = ArxivClient(transport=upstream)
+    try:
+        _forget(client, "2503.10622")
+        paper = client.get("/papers/2503.10622")
+        _forget(client, "1706.03762")
+        # No local hits for this one; the arXiv page is served and stored
+        search = client.get("/papers/search", params={"q": "poolfallbackquery"})
+    finally:
+        client.app.state.arxiv_client = saved
+
+    assert paper.status_code == 200
+    assert paper.json()["title"] == "Transformers without Normalization"
+    assert _stored(client, "2503.10622") is not None
+    assert search.status_code == 200 and search.json()["source"] == "arxiv"
+    assert _stored(client, "1706.03762") is not None
+    assert _timeouts(client) == 0
@@ -0,0 +1,89 @@
+import asyncio
+import sys
+import threading
+import time
+
+import pytest
+
+import profiling
+from config import settings
+from profiling import profiler
+
+
+@pytest.fixture
+def profiler_token(monkeypatch):
+    monkeypatch.setattr(settings, "profiler_token", "profile-secret")
+    return {"X-Profile-Token": "profile-secret"}
+
+
+def test_header_triggers_profile(client, profiler_token):
+    response = client.get("/posts/", headers=profiler_token)
+
+    profile_id = int(response.headers["x-profile-id"])
+    listing = client.get("/admin/profiles", headers=profiler_token).json()
+    assert listing[0]["id"] == profile_id
+    assert listing[0]["trigger"] == "header"
+    assert listing[0]["route"] == "/posts/"
+    assert "collapsed" not in listing[0]
+
+    download = client.get(f"/admin/profiles/{profile_id}", headers=profiler_token)
+    assert download.status_code == 200
+    assert download.text == profiler.get(profile_id)["collapsed"]
+
+
+def test_wrong_token_is_not_profiled(client, profiler_token):
+    response = client.get("/posts/", headers={"X-Profile-Token": "guess"})
+
+    assert "x-profile-id" not in response.headers
+    assert client.get("/admin/profiles", headers={"X-Profile-Token": "guess"}).status_code == 403
+
+
+def test_admin_endpoints_disabled_without_token(client):
+    assert client.get("/admin/profiles").status_code == 403
+
+
+def test_slow_requests_are_profiled(client, profiler_token, monkeypatch):
+    monkeypatch.setattr(settings, "profiler_slow_ms", 0.001)
+    before = len(profiler.profiles)
+
+    client.get("/posts/1")
+
+    assert len(profiler.profiles) == before + 1
+    assert profiler.profiles[-1]["trigger"] == "slow"
+
+
+def test_samples_are_attributed_to_the_running_task():
+    def sample_later(session, delay):
+        time.sleep(delay)
+        session.sample(sys._current_frames())
+
+    def spin(seconds):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+
+    async def neighbour():
+        spin(0.1)
+
+    async def request():
+        session = profiling.ProfileSession(1, {"method": "GET", "path": "/"}, "header")
+        # The request itself holds the loop
+        session.sample(sys._current_frames())
+        # Suspended while the loop is idle, then while a neighbour holds it
+        samplers = [threading.Thread(target=sample_later, args=(session, 0.02))]
+        samplers[0].start()
+        await asyncio.sleep(0.1)
+        samplers[0].join()
+        other = asyncio.ensure_future(neighbour())
+        samplers.append(threading.Thread(target=sample_later, args=(session, 0.05)))
+        samplers[1].start()
+        await other
+        samplers[1].join()
+        return session
+
+    stacks = list(asyncio.run(request()).stacks)
+
+    assert len(stacks) == 3
+    assert "request (test_profiling.py" in stacks[0] and not stacks[0].startswith("<")
+    assert stacks[1].startswith("<awaiting>;request (test_profiling.py")
+    assert stacks[2].startswith("<other task>;") and stacks[2].split(";")[-1].startswith("spin (")
@@ -0,0 +1,198 @@
+import json
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from sqlalchemy import delete
+
+import models
+import paper_store
+from arxiv_api import ArxivClient
+from config import settings
+from database import session_scope
+from reading_list import bibtex_entry
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _entry(arxiv_id, doi=None):
+    return {"id": f"http://arxiv.org/abs/{arxiv_id}v1", "arxiv_id": arxiv_id, "title": f"Paper {arxiv_id} & more",
+            "summary": "", "authors": ["Ada Lovelace", "Alan Turing"], "link": f"http://arxiv.org/abs/{arxiv_id}v1",
+            "pdf_url": "", "doi": doi, "published": "2024-01-15T00:00:00Z"}
+
+
+@pytest.fixture
+def papers(client):
+    ids = [f"2402.{n:05d}" for n in range(1, 6)]
+
+    async def seed():
+        async with session_scope() as db:
+            await paper_store.upsert_papers(db, [_entry(arxiv_id, doi=f"10.1000/test.{arxiv_id}")
+                                                 for arxiv_id in ids])
+
+    client.portal.call(seed)
+    return ids
+
+
+def _ndjson(*rows):
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+
+
+def _export(client, auth_headers, fmt="ndjson"):
+    return client.get("/reading-list/export", params={"format": fmt}, headers=auth_headers)
+
+
+def test_import_ndjson_reports_row_errors(client, auth_headers, papers):
+    body = _ndjson(
+        {"identifier": f"arXiv:{papers[0]}v2", "notes": "read first"},
+        {"arxiv_id": f"https://arxiv.org/abs/{papers[1]}"},
+        {"doi": f"https://doi.org/10.1000/TEST.{papers[2]}", "saved_at": "2024-02-01T10:00:00Z"},
+        {"identifier": papers[0]},
+        "{not json",
+        {"notes": "no identifier"},
+        {"identifier": "not an id"},
+        {"identifier": "2402.99999"},
+    )
+
+    response = client.post("/reading-list/import", params={"fetch_missing": False},
+                           content=body, headers=auth_headers)
+    exported = [json.loads(line) for line in _export(client, auth_headers).text.splitlines()]
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["received"], result["saved"], result["skipped"], result["failed"]) == (8, 3, 1, 4)
+    assert [(error["line"], error["error"]) for error in result["errors"]] == [
+        (5, "Invalid JSON"),
+        (6, "Missing identifier, arxiv_id or doi"),
+        (7, "Not an arXiv id or DOI"),
+        (8, "Paper is not stored; look it up under /papers first"),
+    ]
+    assert sorted(row["arxiv_id"] for row in exported) == papers[:3]
+    # The repeated row came last and has no notes
+    assert {row["arxiv_id"]: row["notes"] for row in exported}[papers[0]] is None
+
+
+def test_import_csv_skips_or_updates_existing(client, auth_headers, papers):
+    first = 'arxiv_id,notes\n{},"two\nlines, quoted"\n{},\n'.format(papers[0], papers[1])
+    again = "arxiv_id,notes\n{},changed\n{},\n".format(papers[0], papers[1])
+
+    client.post("/reading-list/import", content=first, headers=dict(auth_headers, **{"Content-Type": "text/csv"}))
+    skipped = client.post("/reading-list/import", params={"format": "csv"}, content=again, headers=auth_headers)
+    kept = {row["arxiv_id"]: row["notes"] for row in map(json.loads, _export(client, auth_headers).text.splitlines())}
+    updated = client.post("/reading-list/import", params={"format": "csv", "on_conflict": "update"},
+                          content=again, headers=auth_headers)
+    changed = {row["arxiv_id"]: row["notes"] for row in map(json.loads, _export(client, auth_headers).text.splitlines())}
+
+    assert (skipped.json()["saved"], skipped.json()["skipped"]) == (0, 2)
+    assert kept == {papers[0]: "two\nlines, quoted", papers[1]: None}
+    assert updated.json()["saved"] == 2
+    assert changed == {papers[0]: "changed", papers[1]: None}
+
+
+def test_import_is_saved_in_batches(client, auth_headers, papers, statements, monkeypatch):
+    monkeypatch.setattr(settings, "reading_list_import_batch_size", 2)
+
+    result = client.post("/reading-list/import", params={"fetch_missing": False},
+                         content=_ndjson(*({"identifier": arxiv_id} for arxiv_id in papers)),
+                         headers=auth_headers).json()
+
+    assert result["saved"] == 5
+    assert len([s for s in statements if s.startswith("INSERT INTO user_papers")]) == 3
+
+
+def _forget(client, arxiv_id):
+    async def forget():
+        # Other tests may have stored it from the same feed
+        async with session_scope() as db:
+            await db.execute(delete(models.Paper).where(models.Paper.arxiv_id == arxiv_id))
+            await db.commit()
+
+    client.portal.call(forget)
+
+
+def test_import_fetches_missing_papers_from_arxiv(client, auth_headers):
+    with open(os.path.join(FIXTURES, "arxiv_query.xml"), "rb") as f:
+        feed = f.read()
+    requests = []
+
+    def upstream(request):
+        requests.append(request.url.params["id_list"])
+        return httpx.Response(200, content=feed)
+
+    _forget(client, "1706.03762")
+    saved = client.app.state.arxiv_client
+    client.app.state.arxiv_client = ArxivClient(transport=httpx.MockTransport(upstream))
+    try:
+        result = client.post("/reading-list/import", content=_ndjson({"identifier": "1706.03762"}),
+                             headers=auth_headers).json()
+    finally:
+        client.app.state.arxiv_client = saved
+
+    assert requests == ["1706.03762"]
+    assert result["saved"] == 1
+    assert json.loads(_export(client, auth_headers).text)["arxiv_id"] == "1706.03762"
+
+
+def test_unexpected_fetch_failure_fails_its_rows_only(client, auth_headers, monkeypatch):
+    with open(os.path.join(FIXTURES, "arxiv_query.xml"), "rb") as f:
+        feed = f.read()
+
+    def upstream(request):
+        if request.url.params["id_list"] == "2407.00001":
+            raise RuntimeError("unexpected")
+        return httpx.Response(200, content=feed)
+
+    _forget(client, "1706.03762")
+    monkeypatch.setattr(settings, "arxiv_id_list_chunk_size", 1)
+    saved = client.app.state.arxiv_client
+    client.app.state.arxiv_client = ArxivClient(transport=httpx.MockTransport(upstream))
+    try:
+        response = client.post("/reading-list/import",
+                               content=_ndjson({"identifier": "2407.00001"}, {"identifier": "1706.03762"}),
+                               headers=auth_headers)
+    finally:
+        client.app.state.arxiv_client = saved
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["saved"], result["failed"]) == (1, 1)
+    assert result["errors"] == [{"line": 1, "identifier": "2407.00001", "error": "Error fetching from arXiv"}]
+
+
+def test_bibtex_escapes_text_but_not_links():
+    row = SimpleNamespace(arxiv_id="2401.00001", doi="10.1000/a%b#c", title="50% of A & B", authors="Ada Lovelace",
+                          publication_date=datetime(2024, 1, 1), journal=None, notes=None,
+                          url="https://example.org/paper?a=1&b=50%25#frag")
+
+    entry = bibtex_entry(row)
+
+    assert "  title = {50\\% of A \\& B},\n" in entry
+    assert "  doi = {10.1000/a%b#c},\n" in entry
+    assert "  eprint = {2401.00001},\n" in entry
+    assert "  url = {https://example.org/paper?a=1&b=50%25#frag}\n" in entry
+
+
+def test_export_csv_round_trips_and_bibtex(client, auth_headers, papers):
+    client.post("/reading-list/import", params={"fetch_missing": False},
+                content=_ndjson({"identifier": papers[3], "notes": "50% done, see #2"}), headers=auth_headers)
+
+    csv_export = _export(client, auth_headers, "csv")
+    bibtex = _export(client, auth_headers, "bibtex")
+    reimported = client.post("/reading-list/import", params={"format": "csv", "fetch_missing": False},
+                             content=csv_export.content, headers=auth_headers).json()
+
+    assert csv_export.headers["content-type"] == "text/csv; charset=utf-8"
+    assert csv_export.headers["content-disposition"] == 'attachment; filename="reading-list.csv"'
+    assert csv_export.text.splitlines()[0] == "arxiv_id,doi,title,authors,publication_date,journal,url,notes,saved_at"
+    assert (reimported["saved"], reimported["skipped"], reimported["failed"]) == (0, 1, 0)
+    assert bibtex.text.startswith(f"@misc{{lovelace2024_{papers[3]},\n")
+    assert f"  title = {{Paper {papers[3]} \\& more}},\n" in bibtex.text
+    assert "  author = {Ada Lovelace and Alan Turing},\n" in bibtex.text
+    assert "  note = {50\\% done, see \\#2}\n}" in bibtex.text
+
+
+def test_reading_list_requires_login(client):
+    assert client.get("/reading-list/export").status_code == 401
+    assert client.post("/reading-list/import", content="").status_code == 401
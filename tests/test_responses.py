@@ -0,0 +1,36 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+import responses
+from config import settings
+
+PAPER = {
+    "id": "http://arxiv.org/abs/2401.00001v2",
+    "title": "Équivariant models — a survey",
+    "summary": "Line one.\nLine \"two\".",
+    "authors": ["Ada Lovelace", "Smith, Jr., John"],
+    "link": "http://arxiv.org/abs/2401.00001v2",
+    "pdf_url": "",
+    "rank": 1.25,
+    "highlight": None,
+    "published": datetime(2024, 1, 15, 9, 30, 5, 120000, tzinfo=timezone.utc),
+    "updated": datetime(2024, 2, 1, 12, 0),
+}
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_trusted_json_matches_the_encoder_path(monkeypatch, fast):
+    if fast:
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(settings, "fast_json_responses", fast)
+
+    response = responses.trusted_json({"results": [PAPER], "next_cursor": None})
+
+    assert type(response) is responses.default_response_class()
+    assert json.loads(response.body) == {"results": [dict(
+        PAPER, published="2024-01-15T09:30:05.120000+00:00", updated="2024-02-01T12:00:00")], "next_cursor": None}
+    # Byte for byte what the jsonable_encoder path sends
+    reference = responses.JSONResponse(responses.jsonable_encoder({"results": [PAPER], "next_cursor": None}))
+    assert response.body == reference.body
@@ -1,20 +1,240 @@
+import asyncio
+import threading
+import time
+import uuid
+
 import pytest
+from fastapi import HTTPException
+from jose import jwt
+from sqlalchemy import update
 
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
-from main import app
-from database import get_db, Base
+import models
+import oauth2
+import utils
 from config import settings
-from oauth2 import create_access_token
-from models import *
+from database import session_scope
+
+
+def _email():
+    return f"{uuid.uuid4().hex[:12]}@example.com"
+
+
+def _login(client, email, password="secret"):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def test_create_user(client):
+    email = _email()
+
+    response = client.post("/user/", json={"email": email, "password": "secret", "name": "Ada"})
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body["email"] == email
+    assert body["name"] == "Ada"
+    assert "password" not in body
+    assert body["id"] and body["created_at"]
+
+
+def test_create_duplicate_user(client):
+    email = _email()
+    client.post("/user/", json={"email": email, "password": "secret"})
+
+    response = client.post("/user/", json={"email": email, "password": "other"})
+
+    assert response.status_code == 400
+
+
+def test_login(client):
+    email = _email()
+    client.post("/user/", json={"email": email, "password": "secret"})
+
+    response = _login(client, email)
+
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+
+
+def test_login_wrong_password(client):
+    email = _email()
+    client.post("/user/", json={"email": email, "password": "secret"})
+
+    assert _login(client, email, "wrong").status_code == 403
+    assert _login(client, _email()).status_code == 403
+
+
+def test_me_requires_token(client):
+    assert client.get("/user/me").status_code == 401
+    assert client.get("/user/me", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+
+def test_me(client):
+    email = _email()
+    client.post("/user/", json={"email": email, "password": "secret"})
+    token = _login(client, email).json()["access_token"]
+
+    response = client.get("/user/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert response.json()["email"] == email
+
+
+def test_update_user_is_visible_to_me(client, auth_headers):
+    email = _email()
+
+    client.put("/user/me", json={"email": email, "name": "Grace"}, headers=auth_headers)
+    response = client.get("/user/me", headers=auth_headers)
+
+    assert response.json()["email"] == email
+    assert response.json()["name"] == "Grace"
+
+
+def test_change_password(client):
+    email = _email()
+    client.post("/user/", json={"email": email, "password": "secret"})
+    headers = {"Authorization": f"Bearer {_login(client, email).json()['access_token']}"}
+
+    wrong = client.put("/user/me/password", json={"current_password": "nope", "new_password": "next"},
+                       headers=headers)
+    changed = client.put("/user/me/password", json={"current_password": "secret", "new_password": "next"},
+                         headers=headers)
+
+    assert wrong.status_code == 401
+    assert changed.status_code == 200
+    assert _login(client, email).status_code == 403
+    assert _login(client, email, "next").status_code == 200
+
+
+def test_delete_account(client, auth_headers):
+    assert client.delete("/user/me", params={"password": "wrong"}, headers=auth_headers).status_code == 401
+    assert client.delete("/user/me", params={"password": "secret"}, headers=auth_headers).status_code == 204
+    # The token outlives the account but no longer authenticates
+    assert client.get("/user/me", headers=auth_headers).status_code == 401
+
+
+def _user_id(client, headers):
+    return client.get("/user/me", headers=headers).json()["id"]
+
+
+def test_me_is_served_from_the_user_cache(client, auth_headers, statements):
+    response = client.get("/user/me", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert not [s for s in statements if "FROM users" in s]
+
+
+def test_cached_principal_holds_no_password_hash(client, auth_headers):
+    principal = client.portal.call(client.app.state.user_cache.get, str(_user_id(client, auth_headers)))
+
+    assert principal is not None
+    assert "password" not in principal
+
+
+def test_update_invalidates_cached_principal(client, auth_headers):
+    user_id = _user_id(client, auth_headers)
+
+    client.put("/user/me", json={"email": _email(), "name": "Hedy"}, headers=auth_headers)
+
+    assert client.portal.call(client.app.state.user_cache.get, str(user_id)) is None
+    assert client.get("/user/me", headers=auth_headers).json()["name"] == "Hedy"
+
+
+def test_password_checks_read_the_stored_hash(client, auth_headers):
+    user_id = _user_id(client, auth_headers)
+
+    async def set_password():
+        # As another worker would: the row changes, this worker's cache entry stays
+        async with session_scope() as db:
+            await db.execute(update(models.User).where(models.User.id == user_id)
+                             .values(password=utils.hash_password("rotated")))
+            await db.commit()
+
+    client.portal.call(set_password)
+    stale = client.put("/user/me/password", json={"current_password": "secret", "new_password": "x"},
+                       headers=auth_headers)
+    current = client.put("/user/me/password", json={"current_password": "rotated", "new_password": "x"},
+                         headers=auth_headers)
+
+    assert stale.status_code == 401
+    assert current.status_code == 200
+
+
+def test_cached_token_is_rejected_after_it_expires():
+    token_exp = int(time.time()) + 1
+    token = jwt.encode({"user_id": 1, "exp": token_exp}, settings.secret_key, algorithm=oauth2.ALGORITHM)
+    rejected = HTTPException(status_code=401)
+
+    assert oauth2.verify_access_token(token, rejected).id == 1
+    # exp has whole-second resolution and is checked against whole seconds
+    time.sleep(max(0.0, token_exp + 1.05 - time.time()))
+
+    with pytest.raises(HTTPException):
+        oauth2.verify_access_token(token, rejected)
+
+
+def test_cached_token_is_rejected_after_the_secret_rotates(client, auth_headers, monkeypatch):
+    user_id = _user_id(client, auth_headers)
+
+    monkeypatch.setattr(settings, "secret_key", "rotated-secret")
+    rotated = client.get("/user/me", headers=auth_headers)
+    fresh = {"Authorization": f"Bearer {oauth2.create_access_token({'user_id': user_id})}"}
+
+    assert rotated.status_code == 401
+    assert client.get("/user/me", headers=fresh).status_code == 200
+
+
+def test_hashing_sheds_load_past_max_pending(monkeypatch):
+    monkeypatch.setattr(settings, "password_hash_max_pending", 2)
+    release = threading.Event()
+
+    async def saturate():
+        held = [asyncio.ensure_future(utils._run_hashing(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        try:
+            with pytest.raises(HTTPException) as rejected:
+                await utils._run_hashing(utils.hash_password, "secret")
+            waited = time.perf_counter() - started
+        finally:
+            release.set()
+        await asyncio.gather(*held)
+        return rejected.value, waited
+
+    rejected, waited = asyncio.run(saturate())
+
+    # Rejected at once, not queued behind the busy hashes
+    assert rejected.status_code == 503 and rejected.headers["Retry-After"] == "1"
+    assert waited < 0.05
+    assert utils._pending == 0
+
+
+def test_login_when_hashing_is_saturated_is_503(client, monkeypatch):
+    email = _email()
+    client.post("/user/", json={"email": email, "password": "secret"})
+    monkeypatch.setattr(utils, "_pending", settings.password_hash_max_pending)
+
+    response = _login(client, email)
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_login_rehashes_an_outdated_hash(client, monkeypatch):
+    email = _email()
+    user_id = client.post("/user/", json={"email": email, "password": "secret"}).json()["id"]
 
-# Test database URL
-SQLALCHEMY_TEST_DATABASE_URL = f"postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}_test"
+    async def stored_hash():
+        async with session_scope() as db:
+            return await oauth2.password_hash(db, user_id)
 
-# Create test database engine
-engine = create_engine(SQLALCHEMY_TEST_DATABASE_URL)
+    old = client.portal.call(stored_hash)
+    # The deployment raised the bcrypt cost since the account was created
+    monkeypatch.setattr(settings, "password_bcrypt_rounds", settings.password_bcrypt_rounds + 1)
+    monkeypatch.setattr(utils, "_pwd_context", None)
 
-# Create TestingSessionLocal class
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    assert _login(client, email).status_code == 200
+    new = client.portal.call(stored_hash)
+    assert new != old
+    assert new.startswith(f"$2b${settings.password_bcrypt_rounds:02d}$")
+    assert _login(client, email).status_code == 200
+    assert client.portal.call(stored_hash) == new
@@ -0,0 +1,111 @@
+import json
+import uuid
+
+
+def _email():
+    return f"{uuid.uuid4().hex[:12]}@example.com"
+
+
+def _create_post(client):
+    client.post("/posts/", json={"title": "t", "content": "c"})
+    # The create response omits the id; the newest post is last in id order
+    return json.loads(client.get("/posts/", params={"format": "ndjson"}).text.splitlines()[-1])["id"]
+
+
+def test_create_post_is_one_statement(client, statements):
+    response = client.post("/posts/", json={"title": "t", "content": "c"})
+
+    assert response.status_code == 201
+    assert response.json() == [{"title": "t", "content": "c"}]
+    assert len(statements) == 1
+
+
+def test_update_post_is_one_statement(client, statements):
+    post_id = _create_post(client)
+    statements.clear()
+
+    response = client.put(f"/posts/{post_id}", json={"title": "t2", "content": "c2"})
+
+    assert response.status_code == 200
+    assert response.json() == {"title": "t2", "content": "c2"}
+    assert len(statements) == 1
+
+
+def test_update_missing_post_is_404(client, statements):
+    response = client.put("/posts/999999", json={"title": "t", "content": "c"})
+
+    assert response.status_code == 404
+    assert len(statements) == 1
+
+
+def test_delete_post_is_one_statement(client, statements):
+    post_id = _create_post(client)
+    statements.clear()
+
+    assert client.delete(f"/posts/{post_id}").status_code == 204
+    assert len(statements) == 1
+    assert client.delete(f"/posts/{post_id}").status_code == 400
+
+
+def test_create_user_is_one_statement(client, statements):
+    email = _email()
+
+    response = client.post("/user/", json={"email": email, "password": "secret"})
+
+    assert response.status_code == 201
+    assert response.json()["email"] == email
+    assert len(statements) == 1
+
+
+def test_create_duplicate_user_is_400(client, statements):
+    email = _email()
+    client.post("/user/", json={"email": email, "password": "secret"})
+    statements.clear()
+
+    response = client.post("/user/", json={"email": email, "password": "secret"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "User with this email already exists"
+    assert len(statements) == 1
+
+
+def test_update_user_is_one_statement(client, auth_headers, statements):
+    email = _email()
+
+    response = client.put("/user/me", json={"email": email, "name": "n"}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["email"] == email
+    assert response.json()["name"] == "n"
+    assert len(statements) == 1
+
+
+def test_update_user_to_taken_email_is_400(client, auth_headers, statements):
+    taken = _email()
+    client.post("/user/", json={"email": taken, "password": "secret"})
+    statements.clear()
+
+    response = client.put("/user/me", json={"email": taken}, headers=auth_headers)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already registered"
+    assert len(statements) == 1
+
+
+def test_change_password_reads_the_hash_then_writes_once(client, auth_headers, statements):
+    response = client.put("/user/me/password", json={"current_password": "secret", "new_password": "secret2"},
+                          headers=auth_headers)
+
+    assert response.status_code == 200
+    assert len(statements) == 2
+    assert statements[0].startswith("SELECT users.password")
+    assert statements[1].startswith("UPDATE users")
+
+
+def test_delete_account_reads_the_hash_then_writes_once(client, auth_headers, statements):
+    response = client.delete("/user/me", params={"password": "secret"}, headers=auth_headers)
+
+    assert response.status_code == 204
+    assert len(statements) == 2
+    assert statements[0].startswith("SELECT users.password")
+    assert statements[1].startswith("DELETE FROM users")
@@ -1,10 +1,81 @@
-from passlib.context import CryptContext
+import asyncio
+from typing import Optional, Tuple
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+# Password hashing; hashes below the configured cost are upgraded on login.
+# passlib is loaded on first use to keep it out of cold-start imports.
+_pwd_context = None
+
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=settings.password_bcrypt_rounds,
+            bcrypt__min_rounds=settings.password_bcrypt_rounds,
+        )
+    return _pwd_context
 
 def hash_password(password: str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """Verify a password, returning a replacement hash if the stored one is outdated."""
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
+
+
+# bcrypt runs on a dedicated process pool so a login burst cannot starve
+# the threadpool or the event loop. password_hash_workers=0 falls back to
+# the threadpool (e.g. on Lambda, where multiprocessing is unavailable).
+_executor = None
+_pending = 0
+
+def start_password_pool():
+    global _executor
+    if _executor is None and settings.password_hash_workers > 0:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+def shutdown_password_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def _run_hashing(fn, *args):
+    global _pending
+    if _pending >= settings.password_hash_max_pending:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry",
+            headers={"Retry-After": "1"}
+        )
+
+    _pending += 1
+    try:
+        if settings.password_hash_workers <= 0:
+            return await run_in_threadpool(fn, *args)
+        start_password_pool()
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _pending -= 1
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+async def verify_password_async(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """Async verify_and_update_password on the hashing pool."""
+    return await _run_hashing(verify_and_update_password, plain_password, hashed_password)